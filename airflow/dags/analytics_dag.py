@@ -12,6 +12,11 @@ import requests
 import os
 import json
 
+from kilig import http_client
+from kilig.http_client import log_http_metrics
+from kilig.paper_ids import count_paper_ids
+from kilig.pools import BACKEND_POOL, OPENSEARCH_POOL, REDIS_POOL, pool_args
+
 # Default arguments
 default_args = {
     'owner': 'kilig',
@@ -20,6 +25,8 @@ default_args = {
     'retries': 2,
     'retry_delay': timedelta(minutes=5),
     'execution_timeout': timedelta(hours=1),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
 }
 
 # Configuration
@@ -34,7 +41,7 @@ def collect_search_metrics(**context):
     """Collect search performance metrics from OpenSearch"""
     try:
         # Get index stats
-        response = requests.get(
+        response = http_client.get(
             f'{OPENSEARCH_URL}/_stats',
             timeout=30
         )
@@ -113,7 +120,7 @@ def collect_cache_metrics(**context):
 def collect_api_metrics(**context):
     """Collect API usage metrics from backend"""
     try:
-        response = requests.get(
+        response = http_client.get(
             f'{KILIG_BACKEND_URL}/api/admin/metrics',
             timeout=30
         )
@@ -164,7 +171,7 @@ def collect_paper_stats(**context):
     """Collect statistics about indexed papers"""
     try:
         # Get paper count by category
-        response = requests.post(
+        response = http_client.post(
             f'{OPENSEARCH_URL}/arxiv-papers-chunks/_search',
             json={
                 'size': 0,
@@ -175,11 +182,6 @@ def collect_paper_stats(**context):
                             'size': 20
                         }
                     },
-                    'unique_papers': {
-                        'cardinality': {
-                            'field': 'arxiv_id'
-                        }
-                    },
                     'total_chunks': {
                         'value_count': {
                             'field': 'chunk_index'
@@ -199,7 +201,8 @@ def collect_paper_stats(**context):
         }
         
         metrics = {
-            'unique_papers': aggs.get('unique_papers', {}).get('value', 0),
+            # Exact count, paged through a composite aggregation (cardinality is approximate)
+            'unique_papers': count_paper_ids(OPENSEARCH_URL, 'arxiv-papers-chunks'),
             'total_chunks': aggs.get('total_chunks', {}).get('value', 0),
             'by_category': category_counts,
         }
@@ -248,7 +251,7 @@ def generate_daily_report(**context):
                 f"• Redis memory: {cache.get('used_memory_human', 'N/A')}"
             )
             
-            requests.post(slack_webhook, json={'text': summary_text})
+            http_client.post(slack_webhook, json={'text': summary_text})
         except Exception as e:
             print(f"[Analytics] Slack notification failed: {e}")
     
@@ -269,18 +272,21 @@ with DAG(
     
     search_metrics = PythonOperator(
         task_id='collect_search_metrics',
+        **pool_args(OPENSEARCH_POOL),
         python_callable=collect_search_metrics,
         provide_context=True,
     )
     
     cache_metrics = PythonOperator(
         task_id='collect_cache_metrics',
+        **pool_args(REDIS_POOL),
         python_callable=collect_cache_metrics,
         provide_context=True,
     )
     
     api_metrics = PythonOperator(
         task_id='collect_api_metrics',
+        **pool_args(BACKEND_POOL),
         python_callable=collect_api_metrics,
         provide_context=True,
     )
@@ -293,6 +299,7 @@ with DAG(
     
     paper_stats = PythonOperator(
         task_id='collect_paper_stats',
+        **pool_args(OPENSEARCH_POOL),
         python_callable=collect_paper_stats,
         provide_context=True,
     )
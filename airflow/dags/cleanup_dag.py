@@ -12,6 +12,11 @@ import requests
 import os
 import json
 
+from kilig import http_client
+from kilig.http_client import log_http_metrics
+from kilig.paper_ids import count_paper_ids
+from kilig.pools import BACKEND_POOL, OPENSEARCH_POOL, REDIS_POOL, exclusive_pool_args, pool_args
+
 # Default arguments
 default_args = {
     'owner': 'kilig',
@@ -20,6 +25,8 @@ default_args = {
     'retries': 2,
     'retry_delay': timedelta(minutes=10),
     'execution_timeout': timedelta(hours=1),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
 }
 
 # Configuration
@@ -94,15 +101,28 @@ def cleanup_redis_cache(**context):
 def cleanup_old_papers(**context):
     """Remove papers older than retention period (optional - disabled by default)"""
     # This is a placeholder - actual implementation depends on business rules
-    # Most scientific papers should be retained indefinitely
+    # Most scientific papers should be retained indefinitely, so only report
+    # how many papers are past the retention period
+    index_name = os.getenv('OPENSEARCH_INDEX', 'arxiv-papers-chunks')
+    
+    try:
+        past_retention = count_paper_ids(
+            OPENSEARCH_URL,
+            index_name,
+            query={'range': {'published_date': {'lt': f'now-{PAPER_RETENTION_DAYS}d/d'}}},
+        )
+    except Exception as e:
+        print(f"[Cleanup] Papers: Could not count papers past retention: {e}")
+        past_retention = None
     
     result = {
         'action': 'skipped',
         'reason': 'Paper retention is set to indefinite by default',
         'retention_days': PAPER_RETENTION_DAYS,
+        'papers_past_retention': past_retention,
     }
     
-    print(f"[Cleanup] Papers: Skipped (retention={PAPER_RETENTION_DAYS} days)")
+    print(f"[Cleanup] Papers: Skipped (retention={PAPER_RETENTION_DAYS} days, {past_retention} papers past it)")
     context['ti'].xcom_push(key='paper_cleanup', value=result)
     return result
 
@@ -113,20 +133,20 @@ def optimize_opensearch_indices(**context):
     
     try:
         # Force merge to reduce segment count
-        response = requests.post(
+        response = http_client.post(
             f'{OPENSEARCH_URL}/{index_name}/_forcemerge',
             params={'max_num_segments': 1},
             timeout=300
         )
         
         # Clear field data cache
-        cache_response = requests.post(
+        cache_response = http_client.post(
             f'{OPENSEARCH_URL}/{index_name}/_cache/clear',
             timeout=30
         )
         
         # Get index stats after optimization
-        stats_response = requests.get(
+        stats_response = http_client.get(
             f'{OPENSEARCH_URL}/{index_name}/_stats',
             timeout=30
         )
@@ -152,7 +172,7 @@ def optimize_opensearch_indices(**context):
 def cleanup_temp_files(**context):
     """Clean up temporary files from paper parsing"""
     try:
-        response = requests.post(
+        response = http_client.post(
             f'{KILIG_BACKEND_URL}/api/admin/cleanup-temp',
             timeout=60
         )
@@ -169,6 +189,44 @@ def cleanup_temp_files(**context):
         return {'status': 'endpoint_not_available'}
 
 
+def cleanup_xcom_store(**context):
+    """Expire XCom rows of old DAG runs, then purge payloads no XCom row references"""
+    from kilig.xcom_backend import expire_xcom_rows, purge_offloaded_xcoms, XCOM_RETENTION_DAYS
+    
+    try:
+        rows_deleted = expire_xcom_rows(XCOM_RETENTION_DAYS)
+        result = purge_offloaded_xcoms(XCOM_RETENTION_DAYS)
+        result['xcom_rows_deleted'] = rows_deleted
+        result['retention_days'] = XCOM_RETENTION_DAYS
+        
+        print(f"[Cleanup] XCom store: Deleted {rows_deleted} XCom rows of expired runs, "
+              f"removed {result['files_removed']} unreferenced files "
+              f"({result['bytes_removed']} bytes), kept {result['files_kept']}")
+        context['ti'].xcom_push(key='xcom_cleanup', value=result)
+        return result
+        
+    except Exception as e:
+        print(f"[Cleanup] XCom store cleanup error: {e}")
+        return {'error': str(e)}
+
+
+def cleanup_paper_ledger(**context):
+    """Drop per-paper checkpoint rows older than the ledger retention window"""
+    from kilig.ledger import purge_ledger, LEDGER_RETENTION_DAYS
+    
+    try:
+        deleted = purge_ledger(LEDGER_RETENTION_DAYS)
+        result = {'rows_deleted': deleted, 'retention_days': LEDGER_RETENTION_DAYS}
+        
+        print(f"[Cleanup] Paper ledger: Deleted {deleted} rows older than {LEDGER_RETENTION_DAYS} days")
+        context['ti'].xcom_push(key='ledger_cleanup', value=result)
+        return result
+        
+    except Exception as e:
+        print(f"[Cleanup] Paper ledger cleanup error: {e}")
+        return {'error': str(e)}
+
+
 def send_cleanup_report(**context):
     """Generate and send cleanup summary report"""
     ti = context['ti']
@@ -178,6 +236,8 @@ def send_cleanup_report(**context):
         'redis_cleanup': ti.xcom_pull(key='redis_cleanup', task_ids='cleanup_redis'),
         'paper_cleanup': ti.xcom_pull(key='paper_cleanup', task_ids='cleanup_papers'),
         'opensearch_optimize': ti.xcom_pull(key='opensearch_optimize', task_ids='optimize_opensearch'),
+        'xcom_cleanup': ti.xcom_pull(key='xcom_cleanup', task_ids='cleanup_xcom'),
+        'ledger_cleanup': ti.xcom_pull(key='ledger_cleanup', task_ids='cleanup_ledger'),
     }
     
     print(f"[Cleanup] Report:\n{json.dumps(report, indent=2)}")
@@ -187,7 +247,7 @@ def send_cleanup_report(**context):
     if slack_webhook:
         try:
             redis_result = report.get('redis_cleanup', {})
-            requests.post(slack_webhook, json={
+            http_client.post(slack_webhook, json={
                 'text': f"🧹 *Cleanup Complete*\n• Redis keys deleted: {redis_result.get('keys_deleted', 'N/A')}\n• OpenSearch optimized: ✅"
             })
         except Exception as e:
@@ -210,28 +270,44 @@ with DAG(
     
     cleanup_redis = PythonOperator(
         task_id='cleanup_redis',
+        **pool_args(REDIS_POOL),
         python_callable=cleanup_redis_cache,
         provide_context=True,
     )
     
     cleanup_papers = PythonOperator(
         task_id='cleanup_papers',
+        **pool_args(OPENSEARCH_POOL),
         python_callable=cleanup_old_papers,
         provide_context=True,
     )
     
     optimize_opensearch = PythonOperator(
         task_id='optimize_opensearch',
+        **exclusive_pool_args(OPENSEARCH_POOL),
         python_callable=optimize_opensearch_indices,
         provide_context=True,
     )
     
     cleanup_temp = PythonOperator(
         task_id='cleanup_temp',
+        **pool_args(BACKEND_POOL),
         python_callable=cleanup_temp_files,
         provide_context=True,
     )
     
+    cleanup_xcom = PythonOperator(
+        task_id='cleanup_xcom',
+        python_callable=cleanup_xcom_store,
+        provide_context=True,
+    )
+    
+    cleanup_ledger = PythonOperator(
+        task_id='cleanup_ledger',
+        python_callable=cleanup_paper_ledger,
+        provide_context=True,
+    )
+    
     send_report = PythonOperator(
         task_id='send_report',
         python_callable=send_cleanup_report,
@@ -240,4 +316,4 @@ with DAG(
     )
     
     # Task dependencies - parallel cleanup tasks, then report
-    [cleanup_redis, cleanup_papers, optimize_opensearch, cleanup_temp] >> send_report
+    [cleanup_redis, cleanup_papers, optimize_opensearch, cleanup_temp, cleanup_xcom, cleanup_ledger] >> send_report
@@ -2,15 +2,38 @@
 Embedding Refresh DAG
 
 Re-generates embeddings for papers when embedding model is updated.
+By default only papers with chunks whose `embedding_model` differs from
+`new_model` are refreshed; `refresh_all` re-embeds everything.
+
+mode='in_place' re-embeds through /reindex on the live index. mode='blue_green'
+re-embeds every paper into a fresh versioned index, verifies it and then swaps
+the OPENSEARCH_INDEX alias to it, so queries never see a mixed-model index.
+mode='from_archive' rebuilds the same way but bulk-loads stored vectors and text
+from a local vector archive instead of re-embedding, for mapping or HNSW changes
+(`index_overrides`) that keep the model.
 Schedule: Manual trigger only (or monthly for incremental updates)
 """
-from datetime import datetime, timedelta
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from airflow import DAG
-from airflow.operators.python import PythonOperator
+from airflow.exceptions import AirflowException
+from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.utils.dates import days_ago
 import requests
 import os
 import json
+import time
+
+from kilig import http_client
+from kilig import index_versions
+from kilig import vector_archive
+from kilig.backend_jobs import BackendJobsOperator, SUCCEEDED
+from kilig.embedding_stats import VERIFY_MAX_ANOMALY_RATIO, embedding_stats, sample_chunks
+from kilig.http_client import log_http_metrics
+from kilig.pools import OPENSEARCH_POOL, index_write_pool_args, pool_args
+from kilig.ledger import PaperLedger, FAILED, INDEXED
+from kilig.paper_ids import iter_paper_ids
+from kilig.throttle import TokenBucket, get_limiter
 
 # Default arguments
 default_args = {
@@ -20,57 +43,150 @@ default_args = {
     'retries': 3,
     'retry_delay': timedelta(minutes=15),
     'execution_timeout': timedelta(hours=6),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
 }
 
 # Configuration
 KILIG_BACKEND_URL = os.getenv('KILIG_BACKEND_URL', 'http://kilig-backend:3000')
 OPENSEARCH_URL = os.getenv('OPENSEARCH_URL', 'http://opensearch:9200')
-BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '100'))
+OPENSEARCH_INDEX = os.getenv('OPENSEARCH_INDEX', 'arxiv-papers-chunks')  # Read/write alias in blue_green mode
+BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '100'))  # Papers between progress reports
+# Reindex pace in papers/minute (0 = as fast as the limiter allows). Progress reports
+# compare the achieved rate against it and against the rate needed to finish in time.
+REFRESH_TARGET_PAPERS_PER_MINUTE = float(os.getenv('REFRESH_TARGET_PAPERS_PER_MINUTE', '0'))
+# Adaptive (AIMD) in-flight reindex requests, from REINDEX_CONCURRENCY up to REINDEX_MAX_CONCURRENCY
+REINDEX_CONCURRENCY = int(os.getenv('REINDEX_CONCURRENCY', '1'))
+REINDEX_MAX_CONCURRENCY = int(os.getenv('REINDEX_MAX_CONCURRENCY', '8'))
+REINDEX_TARGET_P95_MS = int(os.getenv('REINDEX_TARGET_P95_MS', '90000'))  # Half the 180 s reindex timeout
+
+# 'sync' re-embeds from the worker, 'deferred' submits reindex jobs and waits in the triggerer
+REFRESH_EXECUTION_MODE = os.getenv('REFRESH_EXECUTION_MODE', 'sync')
+REFRESH_JOB_POLL_SECONDS = float(os.getenv('REFRESH_JOB_POLL_SECONDS', '30'))
+
+# Blue/green acceptance: share of live papers allowed to be missing from the new
+# index, and allowed relative drift in chunk count (chunking may legitimately change)
+BLUE_GREEN_MAX_MISSING_RATIO = float(os.getenv('BLUE_GREEN_MAX_MISSING_RATIO', '0'))
+BLUE_GREEN_MAX_DOC_DRIFT = float(os.getenv('BLUE_GREEN_MAX_DOC_DRIFT', '0.2'))
+
+# Modes that build a new index version and swap the alias to it
+REBUILD_MODES = ('blue_green', 'from_archive')
+# from_archive with archive='latest' exports a fresh archive if the newest is older than this
+VECTOR_ARCHIVE_MAX_AGE_HOURS = float(os.getenv('VECTOR_ARCHIVE_MAX_AGE_HOURS', '24'))
+
+REINDEX_LIMITER = get_limiter(
+    'reindex', initial=REINDEX_CONCURRENCY, max_limit=REINDEX_MAX_CONCURRENCY, target_p95_ms=REINDEX_TARGET_P95_MS,
+)
+
+
+def _resume_previous_run(ledger, embedding_model):
+    """
+    Remaining papers of the latest unfinished in-place refresh to the same model:
+    everything after its last completed batch that was not indexed. Failures in
+    its completed batches are carried over as failures of this run.
+    """
+    source = ledger.previous_run(match={'target_model': embedding_model, 'mode': 'in_place'}, incomplete_only=True)
+    if source is None:
+        return None, [], []
+    
+    previous = ledger.for_run(source)
+    cursor = previous.load_cursor()
+    all_ids = previous.all_ids()
+    states = previous.states(all_ids)
+    carried = set(cursor.get('carried_failures', []))
+    all_ids = [arxiv_id for arxiv_id in all_ids if arxiv_id not in carried]  # The run's own paper list
+    done = cursor['batches_done'] * cursor['batch_size']
+    
+    papers = [arxiv_id for arxiv_id in all_ids[done:] if states.get(arxiv_id) != INDEXED]
+    carried_failures = sorted(carried) + [arxiv_id for arxiv_id in all_ids[:done] if states.get(arxiv_id) == FAILED]
+    
+    # Hand the remaining work over so the same run is not resumed twice
+    previous.save_cursor({**cursor, 'resumed_by': ledger.run_id}, complete=True)
+    print(
+        f"[EmbeddingRefresh] Resuming run {source}: {cursor['batches_done']} batches done, "
+        f"{len(papers)} papers left, {len(carried_failures)} earlier failures carried over"
+    )
+    return source, papers, carried_failures
 
 
 def get_papers_to_refresh(**context):
-    """Get list of papers that need embedding refresh"""
+    """
+    Get list of papers that need embedding refresh.
+    
+    retry_failed re-embeds only the papers that failed in the latest refresh to
+    the same model. Without an explicit selection (arxiv_ids / refresh_all), an
+    unfinished earlier run is continued from its checkpoint instead of starting
+    over, unless resume is off.
+    """
     params = context.get('params', {})
     
     # Can be triggered with specific papers or refresh all
     specific_papers = params.get('arxiv_ids', [])
     refresh_all = params.get('refresh_all', False)
     embedding_model = params.get('new_model', 'text-embedding-004')
+    mode = params.get('mode') or 'in_place'
+    ledger = PaperLedger.for_context(context)
+    cursor = ledger.load_cursor()
+    source_run = None
+    carried_failures = []
     
     try:
-        if specific_papers:
+        if cursor is not None:
+            # Retry of this task: keep the paper list the run started with
+            source_run = cursor['source_run']
+            carried = set(cursor['carried_failures'])
+            papers = [arxiv_id for arxiv_id in ledger.all_ids() if arxiv_id not in carried]
+        elif mode in REBUILD_MODES:
+            # A new index version has to be filled with every paper
+            papers = list(iter_paper_ids(OPENSEARCH_URL, OPENSEARCH_INDEX))
+        elif params.get('retry_failed'):
+            # Only a run of the same mode: a rebuild's failures are not this index's
+            source_run = ledger.previous_run(match={'target_model': embedding_model, 'mode': mode})
+            papers = ledger.for_run(source_run).ids_in_state(FAILED) if source_run else []
+            print(f"[EmbeddingRefresh] Retrying {len(papers)} papers that failed in run {source_run}")
+        elif specific_papers:
             papers = specific_papers
         elif refresh_all:
-            # Get all paper IDs from OpenSearch
-            response = requests.post(
-                f'{OPENSEARCH_URL}/arxiv-papers-chunks/_search',
-                json={
-                    'size': 0,
-                    'aggs': {
-                        'unique_papers': {
-                            'terms': {
-                                'field': 'arxiv_id',
-                                'size': 10000
-                            }
-                        }
-                    }
-                },
-                timeout=60
-            )
-            data = response.json()
-            buckets = data.get('aggregations', {}).get('unique_papers', {}).get('buckets', [])
-            papers = [b['key'] for b in buckets]
+            # Page through every paper ID in OpenSearch (no 10k bucket cap)
+            papers = list(iter_paper_ids(OPENSEARCH_URL, OPENSEARCH_INDEX))
+        elif params.get('resume', True) and ledger.previous_run(
+            match={'target_model': embedding_model, 'mode': 'in_place'}, incomplete_only=True,
+        ):
+            source_run, papers, carried_failures = _resume_previous_run(ledger, embedding_model)
         else:
-            # Get papers embedded with old model version (if metadata tracked)
-            papers = []
+            # Papers with any chunk not embedded by the target model, including
+            # chunks indexed before embedding_model was recorded
+            papers = list(iter_paper_ids(
+                OPENSEARCH_URL,
+                OPENSEARCH_INDEX,
+                query={'bool': {'must_not': {'term': {'embedding_model': embedding_model}}}},
+            ))
+        
+        # Fixed order so batch checkpoints mean the same thing on every attempt
+        papers = sorted(set(papers))
         
         result = {
             'paper_count': len(papers),
             'papers': papers,
             'target_model': embedding_model,
+            'source_run': source_run,
         }
         
         print(f"[EmbeddingRefresh] Found {len(papers)} papers to refresh")
+        ledger.record_fetched(papers + carried_failures)
+        for arxiv_id in carried_failures:
+            ledger.mark(arxiv_id, FAILED, error=f'carried over from {source_run}')
+        if cursor is None:
+            ledger.save_cursor({
+                'target_model': embedding_model,
+                'mode': mode,
+                'source_run': source_run,
+                'papers_total': len(papers),
+                'batch_size': max(1, BATCH_SIZE),
+                'batches_done': 0,
+                'failed_ids': carried_failures,
+                'carried_failures': carried_failures,
+            })
         context['ti'].xcom_push(key='papers_to_refresh', value=result)
         return result
         
@@ -79,86 +195,440 @@ def get_papers_to_refresh(**context):
         return {'error': str(e), 'paper_count': 0, 'papers': []}
 
 
+def _reindex_paper(arxiv_id, ledger, target_index=None):
+    """Re-embed one paper through REINDEX_LIMITER (into `target_index` if given); returns True on success"""
+    body = {'force_embed': True}
+    if target_index:
+        body['target_index'] = target_index
+    
+    try:
+        response = http_client.post(
+            f'{KILIG_BACKEND_URL}/api/papers/{arxiv_id}/reindex',
+            json=body,
+            timeout=180,
+            limiter=REINDEX_LIMITER
+        )
+        
+        if response.status_code == 200:
+            ledger.mark(arxiv_id, INDEXED)
+            return True
+        
+        print(f"[EmbeddingRefresh] Failed {arxiv_id}: {response.status_code}")
+        ledger.mark(arxiv_id, FAILED, error=f'HTTP {response.status_code}')
+        
+    except requests.RequestException as e:
+        print(f"[EmbeddingRefresh] Error {arxiv_id}: {e}")
+        ledger.mark(arxiv_id, FAILED, error=str(e))
+    
+    return False
+
+
+def _report_progress(ti, done, failed, total, started, deadline, target_ppm):
+    """Log and publish (XCom 'refresh_progress') rate, ETA and whether the run will fit its window"""
+    elapsed = max(time.monotonic() - started, 1e-6)
+    rate_ppm = done / elapsed * 60
+    remaining = total - done
+    eta_seconds = remaining / rate_ppm * 60 if rate_ppm else None
+    left_seconds = deadline - time.monotonic()
+    needed_ppm = remaining / left_seconds * 60 if left_seconds > 0 else None
+    
+    progress = {
+        'done': done,
+        'failed': failed,
+        'total': total,
+        'rate_ppm': round(rate_ppm, 1),
+        'target_ppm': target_ppm or None,
+        'needed_ppm': round(needed_ppm, 1) if needed_ppm is not None else None,
+        'eta_minutes': round(eta_seconds / 60, 1) if eta_seconds is not None else None,
+        'concurrency': REINDEX_LIMITER.limit,
+        'on_track': remaining == 0 or (eta_seconds is not None and eta_seconds <= left_seconds),
+    }
+    
+    print(
+        f"[EmbeddingRefresh] Progress {done}/{total} ({failed} failed): {progress['rate_ppm']} papers/min, "
+        f"ETA {progress['eta_minutes']} min, concurrency {progress['concurrency']}"
+        + ('' if progress['on_track'] else f" - behind schedule, need {progress['needed_ppm']} papers/min")
+    )
+    ti.xcom_push(key='refresh_progress', value=progress)
+    return progress
+
+
+def _stream_reindex(context, papers, target_index=None, checkpoint=True):
+    """
+    Re-embed papers as a stream: up to REINDEX_LIMITER's limit in flight, paced
+    to REFRESH_TARGET_PAPERS_PER_MINUTE, with progress every BATCH_SIZE papers.
+    
+    With `checkpoint`, the run cursor records how many leading BATCH_SIZE batches
+    of `papers` are finished and which IDs failed, after every batch.
+    """
+    ti = context['ti']
+    processed = 0
+    failed = 0
+    
+    # Papers already reindexed in this run (earlier attempt of this task) are skipped
+    ledger = PaperLedger.for_context(context)
+    states = ledger.states(papers)
+    already_done = {arxiv_id for arxiv_id, state in states.items() if state == INDEXED}
+    if already_done:
+        print(f"[EmbeddingRefresh] Skipping {len(already_done)} papers already refreshed in this run")
+        processed += len(already_done)
+    
+    pending = [arxiv_id for arxiv_id in papers if arxiv_id not in already_done]
+    target_ppm = REFRESH_TARGET_PAPERS_PER_MINUTE
+    pacer = TokenBucket(target_ppm / 60, capacity=max(1, REINDEX_LIMITER.max_limit)) if target_ppm > 0 else None
+    timeout = context['task'].execution_timeout or default_args['execution_timeout']
+    started = time.monotonic()
+    deadline = started + timeout.total_seconds()
+    
+    print(
+        f"[EmbeddingRefresh] Reindexing {len(pending)} papers, up to {REINDEX_LIMITER.max_limit} in flight, "
+        f"target {target_ppm or 'unpaced'} papers/min, "
+        f"need {len(pending) / max(timeout.total_seconds() / 60, 1):.1f} papers/min to finish in {timeout}"
+    )
+    
+    # Unfinished papers per batch; batches_done is the count of leading batches at zero
+    batch_size = max(1, BATCH_SIZE)
+    cursor = (ledger.load_cursor() if checkpoint else None) or {}
+    batch_remaining = [0] * ((len(papers) + batch_size - 1) // batch_size)
+    batch_of = {}
+    for i, arxiv_id in enumerate(papers):
+        if arxiv_id not in already_done:
+            batch_of[arxiv_id] = i // batch_size
+            batch_remaining[i // batch_size] += 1
+    batches_done = 0
+    
+    def save_checkpoint(complete=False):
+        nonlocal batches_done
+        while batches_done < len(batch_remaining) and batch_remaining[batches_done] == 0:
+            batches_done += 1
+        if checkpoint:
+            cursor.update({'batches_done': batches_done, 'batch_size': batch_size, 'failed_ids': ledger.ids_in_state(FAILED)})
+            ledger.save_cursor(cursor, complete=complete)
+    
+    # Bounded submission window: no batch barrier, a slow paper never stalls the rest
+    workers = max(1, min(REINDEX_LIMITER.max_limit, len(pending)))
+    in_flight = {}
+    completed = 0
+    
+    def drain(return_when):
+        nonlocal processed, failed, completed
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            arxiv_id = in_flight.pop(future)
+            if future.result():
+                processed += 1
+            else:
+                failed += 1
+            completed += 1
+            batch_remaining[batch_of[arxiv_id]] -= 1
+            if completed % batch_size == 0 and completed < len(pending):
+                save_checkpoint()
+                _report_progress(ti, completed, failed, len(pending), started, deadline, target_ppm)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for arxiv_id in pending:
+            if len(in_flight) >= workers * 2:
+                drain(FIRST_COMPLETED)
+            if pacer is not None:
+                pacer.acquire()
+            in_flight[executor.submit(_reindex_paper, arxiv_id, ledger, target_index)] = arxiv_id
+        
+        if in_flight:
+            drain(ALL_COMPLETED)
+    
+    save_checkpoint(complete=True)
+    progress = _report_progress(ti, completed, failed, len(pending), started, deadline, target_ppm)
+    
+    return {
+        'processed': processed,
+        'failed': failed,
+        'total': len(papers),
+        'rate_ppm': progress['rate_ppm'],
+        'target_ppm': progress['target_ppm'],
+    }
+
+
+def _complete_cursor(ledger, papers):
+    """Mark this run's cursor finished so later runs never try to resume it"""
+    cursor = ledger.load_cursor()
+    if cursor is None:
+        return
+    batch_size = cursor.get('batch_size') or max(1, BATCH_SIZE)
+    cursor.update({
+        'batches_done': (len(papers) + batch_size - 1) // batch_size,
+        'failed_ids': ledger.ids_in_state(FAILED),
+    })
+    ledger.save_cursor(cursor, complete=True)
+
+
 def process_paper_batch(**context):
-    """Process papers in batches to avoid memory issues"""
+    """Re-embed the selected papers in place on the live index"""
     ti = context['ti']
     refresh_data = ti.xcom_pull(key='papers_to_refresh', task_ids='get_papers')
     
     papers = refresh_data.get('papers', [])
     if not papers:
         print("[EmbeddingRefresh] No papers to process")
+        _complete_cursor(PaperLedger.for_context(context), papers)
         return {'processed': 0, 'failed': 0}
     
-    processed = 0
-    failed = 0
+    result = _stream_reindex(context, papers)
+    ti.xcom_push(key='process_result', value=result)
+    return result
+
+
+def choose_refresh_mode(**context):
+    """Branch to the in-place or index rebuild path"""
+    if context['params'].get('mode') in REBUILD_MODES:
+        return 'create_shadow_index'
+    return 'process_batches'
+
+
+def create_shadow_index(**context):
+    """Create the next index version with bulk-load settings"""
+    overrides = context['params'].get('index_overrides') or None
+    shadow = index_versions.create_shadow_index(OPENSEARCH_URL, OPENSEARCH_INDEX, overrides=overrides)
+    context['ti'].xcom_push(key='shadow_index', value=shadow)
+    return shadow
+
+
+def _archive_for_rebuild(choice):
+    """Archive path for `choice` ('latest', 'fresh' or a path), exporting one when needed"""
+    path = choice if choice not in ('latest', 'fresh') else None
+    if choice == 'latest':
+        path = vector_archive.latest_archive(OPENSEARCH_INDEX)
+        if path is not None:
+            manifest, _ = vector_archive.open_archive(path)
+            age = datetime.now(timezone.utc) - datetime.fromisoformat(manifest['created_at'])
+            if age > timedelta(hours=VECTOR_ARCHIVE_MAX_AGE_HOURS):
+                print(f"[EmbeddingRefresh] Latest archive {path} is {age} old, exporting a fresh one")
+                path = None
     
-    # Process in batches
-    for i in range(0, len(papers), BATCH_SIZE):
-        batch = papers[i:i + BATCH_SIZE]
-        batch_num = (i // BATCH_SIZE) + 1
-        total_batches = (len(papers) + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        print(f"[EmbeddingRefresh] Processing batch {batch_num}/{total_batches}")
-        
-        for arxiv_id in batch:
-            try:
-                response = requests.post(
-                    f'{KILIG_BACKEND_URL}/api/papers/{arxiv_id}/reindex',
-                    json={'force_embed': True},
-                    timeout=180
-                )
-                
-                if response.status_code == 200:
-                    processed += 1
-                else:
-                    print(f"[EmbeddingRefresh] Failed {arxiv_id}: {response.status_code}")
-                    failed += 1
-                    
-            except requests.RequestException as e:
-                print(f"[EmbeddingRefresh] Error {arxiv_id}: {e}")
-                failed += 1
-        
-        print(f"[EmbeddingRefresh] Batch {batch_num} complete: {processed} processed, {failed} failed")
+    if path is None:
+        path = vector_archive.export_index(OPENSEARCH_URL, OPENSEARCH_INDEX)['path']
+    return path
+
+
+def _load_archive(context, shadow, papers):
+    """Bulk-load archived vectors and chunk text into the shadow index, without embedding calls"""
+    params = context['params']
+    path = _archive_for_rebuild(params.get('archive') or 'latest')
+    manifest, _ = vector_archive.open_archive(path)
+    
+    other_models = {model: n for model, n in manifest['embedding_models'].items() if model != params['new_model']}
+    if other_models:
+        raise AirflowException(
+            f"Archive {path} has chunks embedded with {other_models}, not {params['new_model']}; "
+            f"use mode='blue_green' to re-embed them"
+        )
     
-    result = {'processed': processed, 'failed': failed, 'total': len(papers)}
+    loaded = vector_archive.bulk_load_archive(OPENSEARCH_URL, shadow, path)
+    summary = {key: value for key, value in loaded.items() if key != 'failed_papers'}
+    print(f"[EmbeddingRefresh] Archive load: {json.dumps(summary)}")
+    
+    # Papers not in the archive (ingested after it was taken) are caught up by finalize_shadow_index
+    ledger = PaperLedger.for_context(context)
+    failed_papers = loaded['failed_papers']
+    archived = set(vector_archive.read_chunks(path, columns=['arxiv_id']).column('arxiv_id').unique().to_pylist())
+    for arxiv_id, error in failed_papers.items():
+        ledger.mark(arxiv_id, FAILED, error=f'bulk load: {error}')
+    ledger.mark_many([arxiv_id for arxiv_id in papers if arxiv_id in archived and arxiv_id not in failed_papers], INDEXED)
+    
+    processed = len(archived) - len(failed_papers)
+    return {
+        'processed': processed,
+        'failed': len(failed_papers),
+        'total': len(papers),
+        'rate_ppm': round(processed / max(loaded['seconds'] / 60, 1e-6), 1),
+        'target_ppm': None,
+        'archive': summary,
+    }
+
+
+def backfill_shadow_index(**context):
+    """
+    Fill the shadow index while the live index keeps serving: re-embed every
+    paper (blue_green) or bulk-load them from a vector archive (from_archive)
+    """
+    ti = context['ti']
+    shadow = ti.xcom_pull(key='shadow_index', task_ids='create_shadow_index')
+    refresh_data = ti.xcom_pull(key='papers_to_refresh', task_ids='get_papers') or {}
+    papers = refresh_data.get('papers', [])
+    
+    if context['params'].get('mode') == 'from_archive':
+        result = _load_archive(context, shadow, papers)
+    else:
+        result = _stream_reindex(context, papers, target_index=shadow)
     ti.xcom_push(key='process_result', value=result)
     return result
 
 
+def _missing_from(opensearch_url, source_index, target_index):
+    """IDs in source_index but not target_index, by merging their sorted ID streams"""
+    missing = []
+    target_ids = iter_paper_ids(opensearch_url, target_index)
+    target_id = next(target_ids, None)
+    
+    for arxiv_id in iter_paper_ids(opensearch_url, source_index):
+        while target_id is not None and target_id < arxiv_id:
+            target_id = next(target_ids, None)
+        if target_id != arxiv_id:
+            missing.append(arxiv_id)
+    
+    return missing
+
+
+def finalize_shadow_index(**context):
+    """
+    Catch up papers ingested into the live index during the backfill (or after
+    the archive was taken), drop papers deleted from it meanwhile, restore normal
+    index settings and verify the shadow before it may go live.
+    """
+    ti = context['ti']
+    params = context['params']
+    shadow = ti.xcom_pull(key='shadow_index', task_ids='create_shadow_index')
+    live = index_versions.live_index(OPENSEARCH_URL, OPENSEARCH_INDEX)
+    
+    # Refresh is off while bulk loading; make the backfill visible to the ID scans
+    index_versions.refresh_index(OPENSEARCH_URL, shadow)
+    removed = _missing_from(OPENSEARCH_URL, shadow, live)
+    if removed:
+        print(f"[EmbeddingRefresh] Dropping {len(removed)} papers no longer in {live} from {shadow}")
+        index_versions.delete_papers(OPENSEARCH_URL, shadow, removed)
+    
+    missing = _missing_from(OPENSEARCH_URL, live, shadow)
+    if missing:
+        print(f"[EmbeddingRefresh] Catching up {len(missing)} papers added to {live} during the backfill")
+        PaperLedger.for_context(context).record_fetched(missing)
+        _stream_reindex(context, missing, target_index=shadow, checkpoint=False)
+    
+    index_versions.finish_bulk_load(OPENSEARCH_URL, shadow, index_versions.replica_count(OPENSEARCH_URL, live))
+    
+    live_papers = sum(1 for _ in iter_paper_ids(OPENSEARCH_URL, live))
+    still_missing = len(_missing_from(OPENSEARCH_URL, live, shadow))
+    live_docs = index_versions.doc_count(OPENSEARCH_URL, live)
+    shadow_docs = index_versions.doc_count(OPENSEARCH_URL, shadow)
+    stale_docs = index_versions.doc_count(
+        OPENSEARCH_URL, shadow, query={'bool': {'must_not': {'term': {'embedding_model': params['new_model']}}}},
+    )
+    live_dimension = index_versions.vector_dimension(OPENSEARCH_URL, live)
+    sample = _sample_stats(shadow, params['new_model'])
+    
+    checks = {
+        'live_papers': live_papers,
+        'missing_papers': still_missing,
+        'removed_papers': len(removed),
+        'live_docs': live_docs,
+        'shadow_docs': shadow_docs,
+        'stale_docs': stale_docs,
+        'dimension': sample['dimension'],
+        'sample': sample,
+    }
+    print(f"[EmbeddingRefresh] Shadow {shadow} checks: {checks}")
+    ti.xcom_push(key='shadow_checks', value=checks)
+    
+    problems = []
+    if still_missing > BLUE_GREEN_MAX_MISSING_RATIO * live_papers:
+        problems.append(f'{still_missing}/{live_papers} papers missing')
+    if live_docs and abs(shadow_docs - live_docs) > BLUE_GREEN_MAX_DOC_DRIFT * live_docs:
+        problems.append(f'chunk count {shadow_docs} vs live {live_docs}')
+    if stale_docs:
+        problems.append(f"{stale_docs} chunks not embedded with {params['new_model']}")
+    if sample['dimension'] != live_dimension:
+        problems.append(f"vector dimension {sample['dimension']} (live {live_dimension})")
+    if not sample['sampled'] or sample['anomaly_ratio'] > VERIFY_MAX_ANOMALY_RATIO:
+        problems.append(f"{sample['anomalies']}/{sample['sampled']} sampled embeddings anomalous")
+    
+    if problems:
+        # The shadow stays in place for inspection; the alias is not touched
+        raise AirflowException(f"Shadow index {shadow} failed verification: {'; '.join(problems)}")
+    
+    return checks
+
+
+def swap_index_alias(**context):
+    """Atomically point the alias at the verified shadow and prune old versions"""
+    shadow = context['ti'].xcom_pull(key='shadow_index', task_ids='create_shadow_index')
+    previous = index_versions.swap_alias(OPENSEARCH_URL, OPENSEARCH_INDEX, shadow)
+    pruned = index_versions.prune_versions(OPENSEARCH_URL, OPENSEARCH_INDEX)
+    
+    result = {'alias': OPENSEARCH_INDEX, 'index': shadow, 'previous': previous, 'pruned': pruned}
+    context['ti'].xcom_push(key='alias_swap', value=result)
+    return result
+
+
+def _reindex_jobs(context):
+    """One reindex job per paper not yet refreshed in this run"""
+    refresh_data = context['ti'].xcom_pull(key='papers_to_refresh', task_ids='get_papers') or {}
+    papers = refresh_data.get('papers', [])
+    states = PaperLedger.for_context(context).states(papers)
+    return [
+        (arxiv_id, {'arxiv_id': arxiv_id, 'force_embed': True})
+        for arxiv_id in papers if states.get(arxiv_id) != INDEXED
+    ]
+
+
+def _complete_reindex_jobs(context, results):
+    """Checkpoint reindex job outcomes and publish the same result as process_paper_batch"""
+    ti = context['ti']
+    refresh_data = ti.xcom_pull(key='papers_to_refresh', task_ids='get_papers') or {}
+    papers = refresh_data.get('papers', [])
+    ledger = PaperLedger.for_context(context)
+    
+    for arxiv_id, outcome in results.items():
+        if outcome['status'] == SUCCEEDED:
+            ledger.mark(arxiv_id, INDEXED)
+        else:
+            print(f"[EmbeddingRefresh] Failed {arxiv_id}: {outcome['status']} {outcome.get('error') or ''}")
+            ledger.mark(arxiv_id, FAILED, error=f"reindex job {outcome['status']}")
+    
+    # Every job is terminal here, so the run has nothing left to resume
+    _complete_cursor(ledger, papers)
+    
+    states = ledger.states(papers)
+    processed = sum(1 for arxiv_id in papers if states.get(arxiv_id) == INDEXED)
+    
+    result = {'processed': processed, 'failed': len(papers) - processed, 'total': len(papers)}
+    ti.xcom_push(key='process_result', value=result)
+    return result
+
+
+def _sample_stats(index_name, expected_model, query=None):
+    """Statistical check of a stratified random sample of stored embeddings"""
+    dimension = index_versions.vector_dimension(OPENSEARCH_URL, index_name)
+    rows = sample_chunks(OPENSEARCH_URL, index_name, query=query)
+    stats = embedding_stats(rows, dimension, expected_model)
+    stats['dimension'] = dimension
+    return stats
+
+
 def verify_embeddings(**context):
-    """Verify that embeddings were updated correctly"""
+    """Verify refreshed embeddings on a sample; fails the run if too many are anomalous"""
     ti = context['ti']
     process_result = ti.xcom_pull(key='process_result', task_ids='process_batches')
+    refresh_data = ti.xcom_pull(key='papers_to_refresh', task_ids='get_papers') or {}
     
     if not process_result or process_result.get('processed', 0) == 0:
         return {'status': 'skipped', 'reason': 'No papers processed'}
     
-    # Verify by checking a sample paper's embedding dimension
-    try:
-        response = requests.get(
-            f'{OPENSEARCH_URL}/arxiv-papers-chunks/_search',
-            params={'size': 1},
-            timeout=30
+    # Sample the refreshed papers only (terms lookups are capped at 65536 values)
+    papers = refresh_data.get('papers', [])
+    query = {'terms': {'arxiv_id': papers}} if len(papers) <= 65536 else None
+    
+    stats = _sample_stats(OPENSEARCH_INDEX, context['params']['new_model'], query=query)
+    stats['status'] = 'no_data' if stats['sampled'] == 0 else 'verified'
+    if stats['anomaly_ratio'] > VERIFY_MAX_ANOMALY_RATIO:
+        stats['status'] = 'anomalous'
+    
+    print(f"[EmbeddingRefresh] Verification: {json.dumps(stats)}")
+    ti.xcom_push(key='verification', value=stats)
+    
+    if stats['status'] == 'anomalous':
+        raise AirflowException(
+            f"{stats['anomalies']}/{stats['sampled']} sampled embeddings anomalous "
+            f"(> {VERIFY_MAX_ANOMALY_RATIO:.2%}): {stats}"
         )
-        
-        data = response.json()
-        hits = data.get('hits', {}).get('hits', [])
-        
-        if hits:
-            # Check if embedding exists and has correct dimension
-            result = {
-                'status': 'verified',
-                'sample_checked': True,
-                'processed_count': process_result.get('processed', 0),
-            }
-        else:
-            result = {'status': 'no_data'}
-        
-        print(f"[EmbeddingRefresh] Verification: {result['status']}")
-        return result
-        
-    except Exception as e:
-        return {'status': 'error', 'error': str(e)}
+    return stats
 
 
 def send_refresh_report(**context):
@@ -166,7 +636,11 @@ def send_refresh_report(**context):
     ti = context['ti']
     
     refresh_data = ti.xcom_pull(key='papers_to_refresh', task_ids='get_papers') or {}
-    process_result = ti.xcom_pull(key='process_result', task_ids='process_batches') or {}
+    process_result = (
+        ti.xcom_pull(key='process_result', task_ids='process_batches')
+        or ti.xcom_pull(key='process_result', task_ids='backfill_shadow_index')
+        or {}
+    )
     
     report = {
         'dag_id': 'embedding_refresh_dag',
@@ -174,7 +648,13 @@ def send_refresh_report(**context):
         'total_papers': refresh_data.get('paper_count', 0),
         'processed': process_result.get('processed', 0),
         'failed': process_result.get('failed', 0),
+        'rate_ppm': process_result.get('rate_ppm'),
         'target_model': refresh_data.get('target_model', 'unknown'),
+        'mode': context['params'].get('mode', 'in_place'),
+        'archive': process_result.get('archive'),
+        'alias_swap': ti.xcom_pull(key='alias_swap', task_ids='swap_index_alias'),
+        'verification': ti.xcom_pull(key='verification', task_ids='verify_embeddings'),
+        'ledger': PaperLedger.for_context(context).summary(),
     }
     
     print(f"[EmbeddingRefresh] Report:\n{json.dumps(report, indent=2)}")
@@ -183,7 +663,7 @@ def send_refresh_report(**context):
     slack_webhook = os.getenv('SLACK_WEBHOOK_URL')
     if slack_webhook:
         try:
-            requests.post(slack_webhook, json={
+            http_client.post(slack_webhook, json={
                 'text': f"🔄 *Embedding Refresh Complete*\n• Processed: {report['processed']}/{report['total_papers']}\n• Failed: {report['failed']}\n• Model: {report['target_model']}"
             })
         except Exception as e:
@@ -206,27 +686,82 @@ with DAG(
         'arxiv_ids': [],  # Specific papers to refresh
         'refresh_all': False,  # Refresh all papers
         'new_model': 'text-embedding-004',  # Target embedding model
+        'mode': 'in_place',  # 'in_place', 'blue_green' (re-embed into a new index, then swap alias) or 'from_archive'
+        'archive': 'latest',  # from_archive: 'latest', 'fresh' (export first) or an archive path
+        'index_overrides': {},  # from_archive/blue_green: merged over the copied index, e.g. {'mappings': {'properties': {'embedding': {'method': {'parameters': {'m': 32}}}}}}
+        'resume': True,  # Continue the latest unfinished in-place refresh to new_model, if any
+        'retry_failed': False,  # Only re-embed papers that failed in the latest refresh to new_model
     },
 ) as dag:
     
     get_papers = PythonOperator(
         task_id='get_papers',
+        **pool_args(OPENSEARCH_POOL),
         python_callable=get_papers_to_refresh,
         provide_context=True,
     )
     
-    process_batches = PythonOperator(
-        task_id='process_batches',
-        python_callable=process_paper_batch,
-        provide_context=True,
+    choose_mode = BranchPythonOperator(
+        task_id='choose_mode',
+        python_callable=choose_refresh_mode,
     )
     
+    if REFRESH_EXECUTION_MODE == 'deferred':
+        process_batches = BackendJobsOperator(
+            task_id='process_batches',
+            **index_write_pool_args(),
+            backend_url=KILIG_BACKEND_URL,
+            job_type='reindex',
+            build_jobs=_reindex_jobs,
+            on_complete=_complete_reindex_jobs,
+            fallback=process_paper_batch,
+            poll_interval=REFRESH_JOB_POLL_SECONDS,
+            job_timeout=default_args['execution_timeout'],
+        )
+    else:
+        process_batches = PythonOperator(
+            task_id='process_batches',
+            **index_write_pool_args(),
+            python_callable=process_paper_batch,
+            provide_context=True,
+        )
+    
     verify = PythonOperator(
         task_id='verify_embeddings',
+        **pool_args(OPENSEARCH_POOL),
         python_callable=verify_embeddings,
         provide_context=True,
     )
     
+    create_shadow = PythonOperator(
+        task_id='create_shadow_index',
+        **pool_args(OPENSEARCH_POOL),
+        python_callable=create_shadow_index,
+        provide_context=True,
+    )
+    
+    backfill_shadow = PythonOperator(
+        task_id='backfill_shadow_index',
+        **index_write_pool_args(),  # Backend reindex or, from_archive, direct parallel _bulk
+        python_callable=backfill_shadow_index,
+        provide_context=True,
+    )
+    
+    finalize_shadow = PythonOperator(
+        task_id='finalize_shadow_index',
+        **index_write_pool_args(),  # Delete-by-query, verification scans, catch-up writes
+        python_callable=finalize_shadow_index,
+        provide_context=True,
+    )
+    
+    swap_alias = PythonOperator(
+        task_id='swap_index_alias',
+        **pool_args(OPENSEARCH_POOL),
+        python_callable=swap_index_alias,
+        provide_context=True,
+        retries=0,  # Never re-run a swap blindly
+    )
+    
     send_report = PythonOperator(
         task_id='send_report',
         python_callable=send_refresh_report,
@@ -235,4 +770,6 @@ with DAG(
     )
     
     # Task dependencies
-    get_papers >> process_batches >> verify >> send_report
+    get_papers >> choose_mode
+    choose_mode >> process_batches >> verify >> send_report
+    choose_mode >> create_shadow >> backfill_shadow >> finalize_shadow >> swap_alias >> send_report
@@ -9,10 +9,12 @@ from airflow import DAG
 from airflow.operators.python import PythonOperator, BranchPythonOperator
 from airflow.operators.empty import EmptyOperator
 from airflow.utils.dates import days_ago
-import requests
 import os
 import json
 
+from kilig import http_client
+from kilig.http_client import log_http_metrics
+
 # Default arguments
 default_args = {
     'owner': 'kilig',
@@ -21,6 +23,8 @@ default_args = {
     'retries': 1,
     'retry_delay': timedelta(minutes=1),
     'execution_timeout': timedelta(minutes=5),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
 }
 
 # Configuration
@@ -33,7 +37,7 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
 def check_backend_health(**context):
     """Check Kilig backend API health"""
     try:
-        response = requests.get(f'{KILIG_BACKEND_URL}/health', timeout=10)
+        response = http_client.get(f'{KILIG_BACKEND_URL}/health', timeout=10, retry=False)
         is_healthy = response.status_code == 200
         
         result = {
@@ -57,7 +61,7 @@ def check_backend_health(**context):
 def check_opensearch_health(**context):
     """Check OpenSearch cluster health"""
     try:
-        response = requests.get(f'{OPENSEARCH_URL}/_cluster/health', timeout=10)
+        response = http_client.get(f'{OPENSEARCH_URL}/_cluster/health', timeout=10, retry=False)
         data = response.json()
         
         # Consider yellow (single node) or green as healthy
@@ -117,7 +121,7 @@ def check_langfuse_health(**context):
     langfuse_url = os.getenv('LANGFUSE_URL', 'http://langfuse:3000')
     
     try:
-        response = requests.get(f'{langfuse_url}/api/public/health', timeout=10)
+        response = http_client.get(f'{langfuse_url}/api/public/health', timeout=10, retry=False)
         is_healthy = response.status_code == 200
         
         result = {
@@ -190,7 +194,7 @@ def send_health_alert(**context):
     if slack_webhook:
         try:
             unhealthy = ', '.join(summary.get('unhealthy_services', []))
-            requests.post(slack_webhook, json={
+            http_client.post(slack_webhook, json={
                 'text': f"🚨 *Health Alert*: Unhealthy services: {unhealthy}",
                 'attachments': [{
                     'color': 'danger',
@@ -219,6 +223,8 @@ with DAG(
     max_active_runs=1,
 ) as dag:
     
+    # Probes stay out of the kilig pools: a force merge holding the whole
+    # OpenSearch pool must not stop health checks from running
     check_backend = PythonOperator(
         task_id='check_backend',
         python_callable=check_backend_health,
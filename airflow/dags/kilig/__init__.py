@@ -0,0 +1,6 @@
+"""
+Kilig Airflow helpers
+
+Shared modules used by the DAGs in this folder. Listed in .airflowignore so the
+scheduler does not parse them as DAG files.
+"""
@@ -0,0 +1,169 @@
+"""
+Backend Async Jobs
+
+Submit-then-poll protocol for long backend calls (indexing, re-embedding), so a
+task does not hold a worker slot while the backend works:
+
+    POST {backend}/api/jobs           {"type": ..., "payload": {...}}
+        -> 202 {"job_id": "..."}
+    GET  {backend}/api/jobs/{job_id}
+        -> 200 {"job_id": "...", "status": "queued|running|succeeded|failed",
+                "result": {...}, "error": "..."}
+
+BackendJobsOperator submits one job per item, then defers to BackendJobTrigger,
+which polls from the triggerer until every job is terminal (or the deadline
+passes) and hands the statuses back to the operator on a worker. Deferred tasks
+release both their executor slot and their pool slots.
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+from airflow.models import BaseOperator
+from airflow.triggers.base import BaseTrigger, TriggerEvent
+import requests
+
+from kilig import http_client
+
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+TERMINAL_STATUSES = {SUCCEEDED, FAILED}
+
+
+class JobsUnsupported(Exception):
+    """The backend does not expose the /api/jobs endpoints"""
+
+
+def submit_job(backend_url, job_type, payload, timeout=30):
+    """Submit one job; returns its job_id"""
+    response = http_client.post(
+        f'{backend_url}/api/jobs',
+        json={'type': job_type, 'payload': payload},
+        timeout=timeout
+    )
+    if response.status_code in (404, 405, 501):
+        raise JobsUnsupported(f'POST /api/jobs returned {response.status_code}')
+    response.raise_for_status()
+    return response.json()['job_id']
+
+
+def get_job(backend_url, job_id, timeout=30):
+    """Current job document, or a failed placeholder if it cannot be read"""
+    try:
+        response = http_client.get(f'{backend_url}/api/jobs/{job_id}', timeout=timeout)
+        if response.status_code == 404:
+            return {'job_id': job_id, 'status': FAILED, 'error': 'job not found'}
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        return {'job_id': job_id, 'status': 'unknown', 'error': str(e)}  # Poll again
+
+
+class BackendJobTrigger(BaseTrigger):
+    """Poll backend jobs until all are terminal or `deadline` (ISO UTC) passes"""
+    
+    def __init__(self, backend_url, job_ids, deadline, poll_interval=15.0):
+        super().__init__()
+        self.backend_url = backend_url
+        self.job_ids = list(job_ids)
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+    
+    def serialize(self):
+        return ('kilig.backend_jobs.BackendJobTrigger', {
+            'backend_url': self.backend_url,
+            'job_ids': self.job_ids,
+            'deadline': self.deadline,
+            'poll_interval': self.poll_interval,
+        })
+    
+    async def run(self):
+        deadline = datetime.fromisoformat(self.deadline)
+        results = {}
+        pending = list(self.job_ids)
+        
+        while pending:
+            # Blocking HTTP runs in threads so the triggerer's event loop stays free
+            docs = await asyncio.gather(*(asyncio.to_thread(get_job, self.backend_url, job_id) for job_id in pending))
+            for doc in docs:
+                if doc.get('status') in TERMINAL_STATUSES:
+                    results[doc['job_id']] = {k: doc.get(k) for k in ('status', 'result', 'error')}
+            pending = [job_id for job_id in pending if job_id not in results]
+            
+            if not pending:
+                break
+            if datetime.now(timezone.utc) >= deadline:
+                for job_id in pending:
+                    results[job_id] = {'status': TIMED_OUT, 'result': None, 'error': 'deadline exceeded'}
+                break
+            
+            self.log.info("%d/%d backend jobs finished", len(results), len(self.job_ids))
+            await asyncio.sleep(self.poll_interval)
+        
+        yield TriggerEvent({'results': results})
+
+
+class BackendJobsOperator(BaseOperator):
+    """
+    Submit one backend job per item and wait for them in the triggerer.
+    
+    build_jobs(context) returns a list of (key, payload); on_complete(context,
+    {key: {'status', 'result', 'error'}}) records the outcome and its return
+    value becomes the task's return value. If the backend has no job API,
+    `fallback(**context)` runs the synchronous path instead.
+    """
+    
+    def __init__(self, *, backend_url, job_type, build_jobs, on_complete, fallback=None,
+                 poll_interval=15.0, job_timeout=timedelta(hours=2), **kwargs):
+        super().__init__(**kwargs)
+        self.backend_url = backend_url
+        self.job_type = job_type
+        self.build_jobs = build_jobs
+        self.on_complete = on_complete
+        self.fallback = fallback
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+    
+    def execute(self, context):
+        jobs = self.build_jobs(context)
+        if not jobs:
+            return self.on_complete(context, {})
+        
+        submitted = {}
+        errors = {}
+        for key, payload in jobs:
+            try:
+                submitted[submit_job(self.backend_url, self.job_type, payload)] = key
+            except JobsUnsupported:
+                if submitted or self.fallback is None:
+                    raise
+                print(f"[Jobs] Backend has no job API, running {self.task_id} synchronously")
+                return self.fallback(**context)
+            except (requests.RequestException, KeyError, ValueError) as e:
+                print(f"[Jobs] Submit failed for {key}: {e}")
+                errors[key] = {'status': FAILED, 'result': None, 'error': f'submit: {e}'}
+        
+        print(f"[Jobs] Submitted {len(submitted)} {self.job_type} jobs, deferring")
+        context['ti'].xcom_push(key='job_keys', value=submitted)
+        context['ti'].xcom_push(key='job_submit_errors', value=errors)
+        
+        if not submitted:
+            return self.on_complete(context, errors)
+        
+        deadline = datetime.now(timezone.utc) + self.job_timeout
+        self.defer(
+            trigger=BackendJobTrigger(self.backend_url, list(submitted), deadline.isoformat(), self.poll_interval),
+            method_name='execute_complete',
+        )
+    
+    def execute_complete(self, context, event=None):
+        ti = context['ti']
+        keys = ti.xcom_pull(key='job_keys', task_ids=self.task_id) or {}
+        results = dict(ti.xcom_pull(key='job_submit_errors', task_ids=self.task_id) or {})
+        
+        for job_id, outcome in (event or {}).get('results', {}).items():
+            results[keys.get(job_id, job_id)] = outcome
+        
+        succeeded = sum(1 for outcome in results.values() if outcome['status'] == SUCCEEDED)
+        print(f"[Jobs] {self.job_type}: {succeeded}/{len(results)} jobs succeeded")
+        return self.on_complete(context, results)
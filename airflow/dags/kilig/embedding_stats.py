@@ -0,0 +1,102 @@
+"""
+Embedding Verification
+
+Statistical check of stored chunk embeddings. A random sample is read through
+sliced scroll (one slice per shard, a fixed quota each) with at most a few
+chunks per paper, so it is stratified across shards and papers. Vectors are
+stacked into one NumPy matrix and checked for dimension, non-finite values,
+zero or outlying L2 norms, and the `embedding_model` tag.
+"""
+import os
+import random
+
+import numpy as np
+
+from kilig.sliced_scroll import primary_shards, scan_slices
+
+VERIFY_SAMPLE_SIZE = int(os.getenv('VERIFY_SAMPLE_SIZE', '2000'))
+VERIFY_MAX_PER_PAPER = int(os.getenv('VERIFY_MAX_PER_PAPER', '3'))
+VERIFY_MAX_ANOMALY_RATIO = float(os.getenv('VERIFY_MAX_ANOMALY_RATIO', '0.01'))
+VERIFY_NORM_MAX_ROBUST_Z = float(os.getenv('VERIFY_NORM_MAX_ROBUST_Z', '6'))
+
+
+def sample_chunks(opensearch_url, index_name, query=None, sample_size=VERIFY_SAMPLE_SIZE,
+                  max_per_paper=VERIFY_MAX_PER_PAPER, seed=None):
+    """Random stratified sample of (arxiv_id, embedding_model, embedding) tuples"""
+    seed = seed if seed is not None else random.randrange(2 ** 31)
+    body = {
+        '_source': ['arxiv_id', 'embedding_model', 'embedding'],
+        'query': {
+            'function_score': {
+                'query': query or {'match_all': {}},
+                'random_score': {'seed': seed, 'field': '_seq_no'},
+                'boost_mode': 'replace',
+            }
+        },
+    }
+    max_slices = primary_shards(opensearch_url, index_name)
+    quota = max(1, -(-sample_size // max_slices))  # Equal quota per slice (shard), rounded up
+    
+    def take(slice_id, pages):
+        per_paper = {}
+        rows = []
+        for hits in pages:
+            for hit in hits:
+                source = hit.get('_source', {})
+                arxiv_id = source.get('arxiv_id')
+                if per_paper.get(arxiv_id, 0) >= max_per_paper:
+                    continue
+                per_paper[arxiv_id] = per_paper.get(arxiv_id, 0) + 1
+                rows.append((arxiv_id, source.get('embedding_model'), source.get('embedding')))
+                if len(rows) >= quota:
+                    return rows
+        return rows
+    
+    slices = scan_slices(opensearch_url, index_name, body, take, max_slices=max_slices, page_size=min(500, quota * 2))
+    return [row for rows in slices for row in rows][:sample_size]
+
+
+def embedding_stats(rows, dimension, expected_model=None):
+    """Vectorised checks over sampled rows; returns counts, norm stats and the anomaly ratio"""
+    total = len(rows)
+    if total == 0:
+        return {'sampled': 0, 'anomalies': 0, 'anomaly_ratio': 0.0}
+    
+    lengths = np.array([len(vector) if vector else 0 for _, _, vector in rows])
+    wrong_dimension = lengths != dimension
+    
+    # Only well-shaped vectors can be stacked into the matrix
+    matrix = np.array([vector for (_, _, vector), bad in zip(rows, wrong_dimension) if not bad], dtype=np.float32)
+    matrix = matrix.reshape(-1, dimension)
+    non_finite = ~np.isfinite(matrix).all(axis=1)
+    norms = np.linalg.norm(np.nan_to_num(matrix), axis=1)
+    zero_norm = norms < 1e-6
+    
+    # Robust z-score (median/MAD) of the norm flags vectors off the usual scale
+    finite_norms = norms[~non_finite & ~zero_norm]
+    median = float(np.median(finite_norms)) if finite_norms.size else 0.0
+    mad = float(np.median(np.abs(finite_norms - median))) if finite_norms.size else 0.0
+    robust_z = np.abs(norms - median) / (1.4826 * mad) if mad > 0 else np.zeros_like(norms)
+    norm_outlier = (robust_z > VERIFY_NORM_MAX_ROBUST_Z) & ~zero_norm & ~non_finite
+    
+    models = np.array([model or '' for _, model, _ in rows])
+    wrong_model = (models != expected_model) if expected_model else np.zeros(total, dtype=bool)
+    
+    vector_anomaly = np.zeros(total, dtype=bool)
+    vector_anomaly[~wrong_dimension] = non_finite | zero_norm | norm_outlier
+    anomalies = int((wrong_dimension | vector_anomaly | wrong_model).sum())
+    
+    return {
+        'sampled': total,
+        'papers': len({arxiv_id for arxiv_id, _, _ in rows}),
+        'wrong_dimension': int(wrong_dimension.sum()),
+        'non_finite': int(non_finite.sum()),
+        'zero_norm': int(zero_norm.sum()),
+        'norm_outliers': int(norm_outlier.sum()),
+        'wrong_model': int(wrong_model.sum()),
+        'norm_median': round(median, 4),
+        'norm_p01': round(float(np.percentile(norms, 1)), 4) if norms.size else None,
+        'norm_p99': round(float(np.percentile(norms, 99)), 4) if norms.size else None,
+        'anomalies': anomalies,
+        'anomaly_ratio': round(anomalies / total, 4),
+    }
@@ -0,0 +1,201 @@
+"""
+Shared HTTP Client
+
+Pooled, keep-alive requests Sessions (one per base URL) used by every DAG for
+calls to the Kilig backend, OpenSearch, Langfuse and Slack. Retries connection
+errors and 429/5xx responses with jittered exponential backoff and records a
+per-endpoint latency histogram that is logged when a task finishes. Callers
+may pass an AdaptiveLimiter to gate each attempt and feed it latency and
+overload (429/503/504/timeout) signals.
+"""
+from urllib.parse import urlsplit
+import os
+import random
+import re
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+import requests
+
+from kilig.throttle import limiter_snapshot
+
+# Configuration
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))  # >= max threads sharing one host
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))  # Seconds
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+OVERLOAD_STATUSES = {429, 503, 504}  # Tell an AdaptiveLimiter to back off
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 180000]
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_session(url):
+    """Return the pooled Session for the URL's scheme://host:port"""
+    parts = urlsplit(url)
+    base = f'{parts.scheme}://{parts.netloc}'
+    
+    with _sessions_lock:
+        session = _sessions.get(base)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=0,  # Retries handled below so they are jittered and measured
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[base] = session
+    
+    return session
+
+
+def _endpoint_label(method, url):
+    """METHOD /path with ID-like segments collapsed, to keep histogram cardinality low"""
+    parts = urlsplit(url)
+    path = '/'.join('{id}' if re.search(r'\d', seg) else seg for seg in parts.path.split('/'))
+    return f'{method.upper()} {parts.netloc}{path}'
+
+
+def _backoff(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring Retry-After when present"""
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _record(endpoint, elapsed_ms, outcome):
+    with _stats_lock:
+        stats = _stats.get(endpoint)
+        if stats is None:
+            stats = {'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'outcomes': {}}
+            _stats[endpoint] = stats
+        
+        stats['count'] += 1
+        stats['sum_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+        stats['buckets'][bucket] += 1
+        stats['outcomes'][str(outcome)] = stats['outcomes'].get(str(outcome), 0) + 1
+
+
+def _send(session, method, url, limiter, **kwargs):
+    """One attempt, holding a limiter slot for its duration when given"""
+    if limiter is None:
+        return session.request(method, url, **kwargs)
+    
+    with limiter.slot() as slot:
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.Timeout:
+            slot.overload()
+            raise
+        if response.status_code in OVERLOAD_STATUSES:
+            slot.overload()
+        return response
+
+
+def request(method, url, *, endpoint=None, retry=True, limiter=None, **kwargs):
+    """
+    Send a request through the pooled session for the URL's host.
+    
+    Retries connection errors and RETRY_STATUSES up to HTTP_MAX_RETRIES times.
+    Read timeouts are not retried since the server may have processed the call.
+    Streaming (iterator) bodies are sent once because they cannot be replayed.
+    With `limiter`, each attempt waits for an in-flight slot (not held during
+    backoff sleeps); for stream=True the slot covers only the response headers.
+    """
+    endpoint = endpoint or _endpoint_label(method, url)
+    session = get_session(url)
+    
+    data = kwargs.get('data')
+    replayable = not (data is not None and hasattr(data, '__next__'))
+    max_attempts = HTTP_MAX_RETRIES + 1 if retry and replayable else 1
+    
+    for attempt in range(max_attempts):
+        start = time.monotonic()
+        try:
+            response = _send(session, method, url, limiter, **kwargs)
+        except requests.ConnectionError as e:
+            _record(endpoint, (time.monotonic() - start) * 1000, type(e).__name__)
+            if attempt + 1 >= max_attempts:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        except requests.RequestException as e:
+            _record(endpoint, (time.monotonic() - start) * 1000, type(e).__name__)
+            raise
+        
+        _record(endpoint, (time.monotonic() - start) * 1000, response.status_code)
+        
+        if response.status_code in RETRY_STATUSES and attempt + 1 < max_attempts:
+            delay = _backoff(attempt, response.headers.get('Retry-After'))
+            print(f"[HTTP] {endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+            continue
+        
+        return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def _percentile(stats, q):
+    """Approximate percentile (upper bucket bound) from the histogram"""
+    target = q * stats['count']
+    seen = 0
+    for i, count in enumerate(stats['buckets']):
+        seen += count
+        if seen >= target and count:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else stats['max_ms']
+    return stats['max_ms']
+
+
+def latency_snapshot():
+    """Copy of the per-endpoint latency stats with derived mean/p50/p95"""
+    with _stats_lock:
+        snapshot = {}
+        for endpoint, stats in _stats.items():
+            snapshot[endpoint] = {
+                'count': stats['count'],
+                'mean_ms': round(stats['sum_ms'] / stats['count'], 1),
+                'p50_ms': _percentile(stats, 0.50),
+                'p95_ms': _percentile(stats, 0.95),
+                'max_ms': round(stats['max_ms'], 1),
+                'buckets_ms': dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ['+Inf'], stats['buckets'])),
+                'outcomes': dict(stats['outcomes']),
+            }
+        return snapshot
+
+
+def log_http_metrics(context=None):
+    """Task callback: print the latency histogram summary collected in this task process"""
+    for endpoint, stats in sorted(latency_snapshot().items()):
+        print(
+            f"[HTTP] {endpoint}: n={stats['count']} mean={stats['mean_ms']}ms "
+            f"p50<={stats['p50_ms']}ms p95<={stats['p95_ms']}ms max={stats['max_ms']}ms "
+            f"outcomes={stats['outcomes']}"
+        )
+    
+    for name, stats in sorted(limiter_snapshot().items()):
+        print(
+            f"[Limiter] {name}: final={stats['limit']} range={stats['min']}-{stats['max']} "
+            f"changes={stats['changes']}"
+        )
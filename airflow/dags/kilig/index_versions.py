@@ -0,0 +1,217 @@
+"""
+Versioned OpenSearch Indices
+
+Blue/green helpers for rebuilding the chunk index out of band: a shadow index
+`{alias}-v{timestamp}` is created from the live index's mapping with bulk-load
+settings, filled while queries keep hitting the live index, then published by
+atomically pointing the read/write alias at it. Previous versions are kept for
+rollback and pruned later.
+"""
+from datetime import datetime, timezone
+import os
+
+from kilig import http_client
+
+INDEX_KEEP_PREVIOUS_VERSIONS = int(os.getenv('INDEX_KEEP_PREVIOUS_VERSIONS', '1'))
+
+# Applied while a shadow index is being filled, reverted by finish_bulk_load()
+BULK_LOAD_SETTINGS = {
+    'index.refresh_interval': '-1',
+    'index.number_of_replicas': 0,
+    'index.translog.durability': 'async',
+}
+
+# Flat setting prefixes copied from the live index (everything else is per-index state)
+_COPIED_SETTINGS = ('index.number_of_shards', 'index.knn', 'index.analysis.', 'index.similarity.')
+
+
+def _json(response):
+    response.raise_for_status()
+    return response.json()
+
+
+def alias_targets(opensearch_url, alias):
+    """Indices currently behind `alias` ([] if it is not an alias)"""
+    response = http_client.get(f'{opensearch_url}/_alias/{alias}', timeout=30)
+    if response.status_code == 404:
+        return []
+    return sorted(_json(response))
+
+
+def live_index(opensearch_url, alias):
+    """Concrete index serving `alias`: its target, or the name itself for a legacy concrete index"""
+    targets = alias_targets(opensearch_url, alias)
+    return targets[0] if targets else alias
+
+
+def index_exists(opensearch_url, index_name):
+    return http_client.request('HEAD', f'{opensearch_url}/{index_name}', timeout=30).status_code == 200
+
+
+def _deep_merge(base, overrides):
+    merged = dict(base)
+    for key, value in overrides.items():
+        merged[key] = _deep_merge(merged[key], value) if isinstance(value, dict) and isinstance(merged.get(key), dict) else value
+    return merged
+
+
+def create_shadow_index(opensearch_url, alias, overrides=None):
+    """
+    Create an empty `{alias}-v{timestamp}` index shaped like the live one; returns its name.
+    
+    `overrides` ({'settings': {flat keys}, 'mappings': {...}}) is merged over the
+    copied definition, e.g. to change HNSW parameters of the embedding field.
+    """
+    source = live_index(opensearch_url, alias)
+    shadow = f"{alias}-v{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    
+    mappings = _json(http_client.get(f'{opensearch_url}/{source}/_mapping', timeout=30))[source]['mappings']
+    flat = _json(http_client.get(
+        f'{opensearch_url}/{source}/_settings', params={'flat_settings': 'true'}, timeout=30
+    ))[source]['settings']
+    
+    settings = {key: value for key, value in flat.items() if key.startswith(_COPIED_SETTINGS)}
+    if overrides:
+        settings.update(overrides.get('settings', {}))
+        mappings = _deep_merge(mappings, overrides.get('mappings', {}))
+    settings.update(BULK_LOAD_SETTINGS)
+    
+    _json(http_client.request(
+        'PUT', f'{opensearch_url}/{shadow}', json={'settings': settings, 'mappings': mappings}, timeout=60
+    ))
+    print(f"[IndexVersions] Created shadow index {shadow} from {source}")
+    return shadow
+
+
+def finish_bulk_load(opensearch_url, index_name, replicas):
+    """Restore normal refresh/durability, add replicas and make everything searchable"""
+    _json(http_client.request('PUT', f'{opensearch_url}/{index_name}/_settings', json={
+        'index.refresh_interval': None,  # Back to the cluster default
+        'index.translog.durability': None,
+        'index.number_of_replicas': replicas,
+    }, timeout=60))
+    refresh_index(opensearch_url, index_name)
+
+
+def refresh_index(opensearch_url, index_name):
+    """Make everything written so far searchable (also works with refresh_interval -1)"""
+    _json(http_client.post(f'{opensearch_url}/{index_name}/_refresh', timeout=300))
+
+
+def replica_count(opensearch_url, index_name):
+    flat = _json(http_client.get(
+        f'{opensearch_url}/{index_name}/_settings', params={'flat_settings': 'true'}, timeout=30
+    ))
+    return int(next(iter(flat.values()))['settings'].get('index.number_of_replicas', 1))
+
+
+def doc_count(opensearch_url, index_name, query=None):
+    body = {'query': query} if query is not None else None
+    return _json(http_client.post(f'{opensearch_url}/{index_name}/_count', json=body, timeout=60))['count']
+
+
+def delete_papers(opensearch_url, index_name, arxiv_ids, batch_size=10000):
+    """Delete every chunk of the given papers; returns the number of chunks deleted"""
+    deleted = 0
+    for start in range(0, len(arxiv_ids), batch_size):
+        result = _json(http_client.post(
+            f'{opensearch_url}/{index_name}/_delete_by_query',
+            params={'refresh': 'true', 'conflicts': 'proceed'},
+            json={'query': {'terms': {'arxiv_id': arxiv_ids[start:start + batch_size]}}},
+            timeout=600,
+        ))
+        deleted += result.get('deleted', 0)
+    return deleted
+
+
+def vector_dimension(opensearch_url, index_name, field='embedding'):
+    """Dimension declared for the knn_vector field in the index mapping"""
+    mapping = _json(http_client.get(f'{opensearch_url}/{index_name}/_mapping/field/{field}', timeout=30))
+    return next(iter(mapping.values()))['mappings'][field]['mapping'][field]['dimension']
+
+
+def _set_write_block(opensearch_url, index_name, blocked):
+    _json(http_client.request(
+        'PUT', f'{opensearch_url}/{index_name}/_settings', json={'index.blocks.write': True if blocked else None}, timeout=60
+    ))
+
+
+def preserve_legacy_index(opensearch_url, index_name):
+    """
+    Clone a legacy concrete index to `{index_name}-v{creation time}` so it can be
+    replaced by an alias without losing it; returns the clone's name.
+    
+    The source stays write-blocked afterwards (the caller removes it); the clone
+    is writable and ages out through prune_versions like any other version.
+    """
+    flat = _json(http_client.get(
+        f'{opensearch_url}/{index_name}/_settings', params={'flat_settings': 'true'}, timeout=30
+    ))[index_name]['settings']
+    created = datetime.fromtimestamp(int(flat['index.creation_date']) / 1000, tz=timezone.utc)
+    clone = f"{index_name}-v{created:%Y%m%d%H%M%S}"
+    
+    # _clone requires a write-blocked source; segments are hard-linked, not copied
+    _set_write_block(opensearch_url, index_name, True)
+    try:
+        _json(http_client.post(
+            f'{opensearch_url}/{index_name}/_clone/{clone}', params={'wait_for_active_shards': '1'}, timeout=600
+        ))
+    except Exception:
+        _set_write_block(opensearch_url, index_name, False)
+        raise
+    _set_write_block(opensearch_url, clone, False)
+    
+    print(f"[IndexVersions] Cloned legacy index {index_name} to {clone}")
+    return clone
+
+
+def swap_alias(opensearch_url, alias, new_index):
+    """
+    Atomically point `alias` at `new_index` and nothing else; returns the indices
+    it pointed at before.
+    
+    A legacy concrete index named `alias` must be removed in the same request,
+    since an alias cannot share its name, so it is first cloned to a versioned
+    name that is kept for rollback.
+    """
+    actions = [{'add': {'index': new_index, 'alias': alias, 'is_write_index': True}}]
+    previous = alias_targets(opensearch_url, alias)
+    legacy = False
+    
+    if previous:
+        actions.extend({'remove': {'index': index, 'alias': alias}} for index in previous if index != new_index)
+    elif index_exists(opensearch_url, alias):
+        print(f"[IndexVersions] Replacing concrete index {alias} with an alias")
+        previous = [preserve_legacy_index(opensearch_url, alias)]
+        actions.append({'remove_index': {'index': alias}})
+        legacy = True
+    
+    try:
+        _json(http_client.post(f'{opensearch_url}/_aliases', json={'actions': actions}, timeout=60))
+    except Exception:
+        if legacy:
+            # Leave the legacy index serving writes again; the clone is harmless
+            _set_write_block(opensearch_url, alias, False)
+        raise
+    
+    print(f"[IndexVersions] Alias {alias} -> {new_index} (was {previous or alias})")
+    return previous
+
+
+def prune_versions(opensearch_url, alias, keep=INDEX_KEEP_PREVIOUS_VERSIONS):
+    """Delete `{alias}-v*` indices older than the live one plus `keep` predecessors"""
+    response = http_client.get(f'{opensearch_url}/_cat/indices/{alias}-v*', params={'format': 'json', 'h': 'index'}, timeout=30)
+    if response.status_code == 404:
+        return []
+    
+    live = set(alias_targets(opensearch_url, alias))
+    versions = sorted((row['index'] for row in _json(response)), reverse=True)  # Timestamp suffix sorts by age
+    newest_live = next((i for i, name in enumerate(versions) if name in live), None)
+    if newest_live is None:
+        return []
+    
+    doomed = [name for name in versions[newest_live + 1 + keep:] if name not in live]
+    for name in doomed:
+        http_client.request('DELETE', f'{opensearch_url}/{name}', timeout=60).raise_for_status()
+        print(f"[IndexVersions] Deleted old index version {name}")
+    return doomed
@@ -0,0 +1,193 @@
+"""
+Indexed arXiv ID Set
+
+Local membership index of papers already present in OpenSearch, so the
+ingestion DAG can filter fetched papers in memory instead of asking the backend
+about every ID. A Bloom filter answers most "not indexed" lookups without
+touching the exact sorted ID list; both are persisted on the Airflow volume and
+periodically reconciled against the index with a paged composite aggregation.
+"""
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import fcntl
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+
+from kilig.paper_ids import iter_paper_ids
+
+# Configuration
+INDEXED_IDS_PATH = os.getenv('INDEXED_IDS_PATH', '/opt/airflow/data/indexed_ids')
+INDEXED_IDS_RECONCILE_HOURS = int(os.getenv('INDEXED_IDS_RECONCILE_HOURS', '24'))
+BLOOM_CAPACITY = int(os.getenv('BLOOM_CAPACITY', '1000000'))
+BLOOM_ERROR_RATE = float(os.getenv('BLOOM_ERROR_RATE', '0.001'))
+
+BLOOM_HEADER = struct.Struct('<QI')  # bit count, hash count
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest"""
+    
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+    
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+    
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+    
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+    
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+    
+    def to_bytes(self):
+        return BLOOM_HEADER.pack(self.num_bits, self.num_hashes) + bytes(self.bits)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        num_bits, num_hashes = BLOOM_HEADER.unpack_from(data)
+        return cls(num_bits, num_hashes, bytearray(data[BLOOM_HEADER.size:]))
+
+
+class IndexedIdSet:
+    """Bloom filter in front of an exact sorted list of indexed arXiv IDs"""
+    
+    def __init__(self, ids=(), reconciled_at=None):
+        self.ids = sorted(set(ids))
+        self.reconciled_at = reconciled_at
+        capacity = max(BLOOM_CAPACITY, len(self.ids) * 2)
+        self.bloom = BloomFilter.for_capacity(capacity, BLOOM_ERROR_RATE)
+        for arxiv_id in self.ids:
+            self.bloom.add(arxiv_id)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, arxiv_id):
+        if arxiv_id not in self.bloom:
+            return False
+        i = bisect_left(self.ids, arxiv_id)
+        return i < len(self.ids) and self.ids[i] == arxiv_id
+    
+    def add_many(self, arxiv_ids):
+        added = 0
+        for arxiv_id in arxiv_ids:
+            if arxiv_id not in self:
+                insort(self.ids, arxiv_id)
+                self.bloom.add(arxiv_id)
+                added += 1
+        return added
+    
+    def is_stale(self, max_age_hours=INDEXED_IDS_RECONCILE_HOURS):
+        if not self.reconciled_at:
+            return True
+        reconciled = datetime.fromisoformat(self.reconciled_at)
+        return datetime.utcnow() - reconciled > timedelta(hours=max_age_hours)
+    
+    def save(self, path=INDEXED_IDS_PATH):
+        """Atomically write the sorted IDs and the Bloom filter bits"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {'count': len(self.ids), 'reconciled_at': self.reconciled_at}
+        _atomic_write(f'{path}.ids', (json.dumps(meta) + '\n' + '\n'.join(self.ids)).encode('utf-8'))
+        _atomic_write(f'{path}.bloom', self.bloom.to_bytes())
+    
+    @classmethod
+    def load(cls, path=INDEXED_IDS_PATH):
+        """Load a persisted set, or return None if nothing has been saved yet"""
+        try:
+            with open(f'{path}.ids', 'r', encoding='utf-8') as f:
+                meta = json.loads(f.readline())
+                ids = [line for line in f.read().split('\n') if line]
+        except FileNotFoundError:
+            return None
+        
+        instance = cls.__new__(cls)
+        instance.ids = ids
+        instance.reconciled_at = meta.get('reconciled_at')
+        
+        try:
+            with open(f'{path}.bloom', 'rb') as f:
+                instance.bloom = BloomFilter.from_bytes(f.read())
+        except FileNotFoundError:
+            # Filter lost: rebuild from the exact set
+            return cls(ids, meta.get('reconciled_at'))
+        
+        return instance
+
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def _locked(path=INDEXED_IDS_PATH):
+    """Serialise read-modify-write cycles across tasks sharing the volume"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def fetch_indexed_ids(opensearch_url, index_name):
+    """List every arxiv_id in the index"""
+    return list(iter_paper_ids(opensearch_url, index_name))
+
+
+def reconcile(opensearch_url, index_name, path=INDEXED_IDS_PATH):
+    """Rebuild the local set from OpenSearch and persist it"""
+    ids = fetch_indexed_ids(opensearch_url, index_name)
+    
+    with _locked(path):
+        id_set = IndexedIdSet(ids, reconciled_at=datetime.utcnow().isoformat())
+        id_set.save(path)
+    
+    print(f"[IndexedIds] Reconciled {len(id_set)} IDs from {index_name}")
+    return id_set
+
+
+def load_or_reconcile(opensearch_url, index_name, path=INDEXED_IDS_PATH):
+    """Load the local set, reconciling first if it is missing or stale"""
+    id_set = IndexedIdSet.load(path)
+    if id_set is None or id_set.is_stale():
+        id_set = reconcile(opensearch_url, index_name, path)
+    return id_set
+
+
+def record_indexed(arxiv_ids, path=INDEXED_IDS_PATH):
+    """Add newly indexed IDs to the persisted set"""
+    if not arxiv_ids:
+        return 0
+    
+    with _locked(path):
+        id_set = IndexedIdSet.load(path) or IndexedIdSet()
+        added = id_set.add_many(arxiv_ids)
+        if added:
+            id_set.save(path)
+    
+    return added
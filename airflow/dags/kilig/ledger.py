@@ -0,0 +1,228 @@
+"""
+Paper State Ledger
+
+Durable per-paper checkpoints (fetched → parsed → indexed, or failed) stored in
+SQLite on the Airflow data volume. Tasks consult the ledger before doing work so
+a retried or cleared task only redoes papers that have not completed in that
+DAG run. Parsed payloads are kept alongside the state so a parse retry can
+re-emit earlier results without calling Docling again. A per-run JSON cursor
+lets a later run of the same pipeline pick up where an unfinished one stopped.
+"""
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+import sqlite3
+import threading
+
+# Configuration
+LEDGER_PATH = os.getenv('PAPER_LEDGER_PATH', '/opt/airflow/data/paper_ledger.sqlite')
+LEDGER_RETENTION_DAYS = int(os.getenv('PAPER_LEDGER_RETENTION_DAYS', '30'))
+
+FETCHED = 'fetched'
+PARSED = 'parsed'
+INDEXED = 'indexed'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_state (
+    pipeline TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    arxiv_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    payload BLOB,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (pipeline, run_id, arxiv_id)
+)
+"""
+
+_CURSOR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_cursor (
+    pipeline TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    cursor TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (pipeline, run_id)
+)
+"""
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _connection(path):
+    """
+    This process's (connection, lock) for a ledger file, opened and migrated on
+    first use. Keyed by PID so a forked task never reuses its parent's handle.
+    """
+    key = (os.getpid(), path)
+    with _connections_lock:
+        if key not in _connections:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(_SCHEMA)
+                conn.execute(_CURSOR_SCHEMA)
+            _connections[key] = (conn, threading.Lock())
+        return _connections[key]
+
+
+class PaperLedger:
+    """Ledger scoped to one pipeline (DAG id) and one DAG run"""
+    
+    def __init__(self, pipeline, run_id, path=LEDGER_PATH):
+        self.pipeline = pipeline
+        self.run_id = run_id
+        self.path = path
+        # Shared by every ledger and thread in the process; all access goes through the lock
+        self._conn, self._lock = _connection(path)
+    
+    @classmethod
+    def for_context(cls, context):
+        """Ledger for the DAG run of an Airflow task context"""
+        return cls(context['dag'].dag_id, context['run_id'])
+    
+    def for_run(self, run_id):
+        """Ledger for another run of the same pipeline"""
+        return PaperLedger(self.pipeline, run_id, self.path)
+    
+    def _select_in(self, columns, arxiv_ids, extra=''):
+        """Rows for the given IDs in this run, batched under SQLite's parameter limit"""
+        arxiv_ids = list(arxiv_ids)
+        rows = []
+        with self._lock:
+            for i in range(0, len(arxiv_ids), 500):
+                batch = arxiv_ids[i:i + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT {columns} FROM paper_state WHERE pipeline = ? AND run_id = ? "
+                    f"AND arxiv_id IN ({','.join('?' * len(batch))}){extra}",
+                    [self.pipeline, self.run_id, *batch],
+                ).fetchall())
+        return rows
+    
+    def states(self, arxiv_ids):
+        """Map of arxiv_id → state for the IDs already recorded in this run"""
+        return dict(self._select_in('arxiv_id, state', arxiv_ids))
+    
+    def ids_in_state(self, *states):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT arxiv_id FROM paper_state WHERE pipeline = ? AND run_id = ? "
+                f"AND state IN ({','.join('?' * len(states))})",
+                [self.pipeline, self.run_id, *states],
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def record_fetched(self, arxiv_ids):
+        """Register papers without downgrading any that already progressed"""
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO paper_state (pipeline, run_id, arxiv_id, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(self.pipeline, self.run_id, arxiv_id, FETCHED, now) for arxiv_id in arxiv_ids],
+            )
+    
+    def mark(self, arxiv_id, state, error=None, payload=None):
+        """Set a paper's state; failures increment the attempt counter"""
+        blob = gzip.compress(json.dumps(payload).encode('utf-8')) if payload is not None else None
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO paper_state (pipeline, run_id, arxiv_id, state, attempts, error, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (pipeline, run_id, arxiv_id) DO UPDATE SET "
+                "state = excluded.state, attempts = attempts + excluded.attempts, error = excluded.error, "
+                "payload = COALESCE(excluded.payload, payload), updated_at = excluded.updated_at",
+                (self.pipeline, self.run_id, arxiv_id, state, 1 if state == FAILED else 0, error, blob, now),
+            )
+    
+    def mark_many(self, arxiv_ids, state, error=None):
+        for arxiv_id in arxiv_ids:
+            self.mark(arxiv_id, state, error=error)
+    
+    def load_payloads(self, arxiv_ids):
+        """Stored parsed payloads for the given IDs (those that have one)"""
+        rows = self._select_in('arxiv_id, payload', arxiv_ids, ' AND payload IS NOT NULL')
+        return {arxiv_id: json.loads(gzip.decompress(blob)) for arxiv_id, blob in rows}
+    
+    def all_ids(self):
+        """Every paper recorded in this run, sorted"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT arxiv_id FROM paper_state WHERE pipeline = ? AND run_id = ? ORDER BY arxiv_id",
+                (self.pipeline, self.run_id),
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def save_cursor(self, cursor, complete=False):
+        """Persist this run's progress cursor (any JSON-serialisable dict)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO run_cursor (pipeline, run_id, cursor, complete, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (pipeline, run_id) DO UPDATE SET "
+                "cursor = excluded.cursor, complete = excluded.complete, updated_at = excluded.updated_at",
+                (self.pipeline, self.run_id, json.dumps(cursor), int(complete), datetime.utcnow().isoformat()),
+            )
+    
+    def load_cursor(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor FROM run_cursor WHERE pipeline = ? AND run_id = ?",
+                (self.pipeline, self.run_id),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def previous_run(self, match=None, incomplete_only=False):
+        """
+        Most recently updated other run of this pipeline whose cursor contains
+        every key/value in `match`; None if there is none.
+        """
+        query = "SELECT run_id, cursor FROM run_cursor WHERE pipeline = ? AND run_id != ?"
+        if incomplete_only:
+            query += " AND complete = 0"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY updated_at DESC", (self.pipeline, self.run_id)).fetchall()
+        
+        for run_id, cursor in rows:
+            cursor = json.loads(cursor)
+            if all(cursor.get(key) == value for key, value in (match or {}).items()):
+                return run_id
+        return None
+    
+    def summary(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM paper_state WHERE pipeline = ? AND run_id = ? GROUP BY state",
+                (self.pipeline, self.run_id),
+            ).fetchall()
+        return dict(rows)
+    
+    def close(self):
+        """Close the process's connection to this ledger file (reopened on next use)"""
+        with _connections_lock:
+            _connections.pop((os.getpid(), self.path), None)
+        with self._lock:
+            self._conn.close()
+
+
+def purge_ledger(retention_days=LEDGER_RETENTION_DAYS, path=LEDGER_PATH):
+    """Delete ledger rows not updated within the retention window"""
+    if not os.path.exists(path):
+        return 0
+    
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            deleted = conn.execute("DELETE FROM paper_state WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.execute(_CURSOR_SCHEMA)
+            conn.execute("DELETE FROM run_cursor WHERE updated_at < ?", (cutoff,))
+        conn.execute('VACUUM')
+        return deleted
+    finally:
+        conn.close()
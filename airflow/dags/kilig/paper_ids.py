@@ -0,0 +1,61 @@
+"""
+Indexed Paper Enumeration
+
+Streams every distinct arxiv_id (or any composite key) in an OpenSearch index
+with a composite aggregation paged by `after_key`. Unlike a terms aggregation it
+has no bucket cap and the coordinating node only ever builds one page, so the
+refresh, analytics and cleanup DAGs can walk the whole corpus in constant memory.
+"""
+import os
+import re
+
+from kilig import http_client
+
+COMPOSITE_PAGE_SIZE = int(os.getenv('COMPOSITE_PAGE_SIZE', '1000'))
+
+_VERSION_SUFFIX = re.compile(r'v\d+$')
+
+
+def normalize_arxiv_id(arxiv_id):
+    """
+    The unversioned form every paper is keyed by: '2401.01234v2' -> '2401.01234',
+    'hep-th/9901001v1' -> 'hep-th/9901001'. OAI-PMH already emits this form, the
+    arXiv API's entry_id carries the version.
+    """
+    return _VERSION_SUFFIX.sub('', arxiv_id.strip())
+
+
+def iter_composite_buckets(opensearch_url, index_name, sources, query=None, page_size=COMPOSITE_PAGE_SIZE, timeout=60):
+    """
+    Yield composite aggregation buckets ({'key': {...}, 'doc_count': n}) page by page.
+    
+    `sources` is the composite `sources` list, e.g. [{'arxiv_id': {'terms': {'field': 'arxiv_id'}}}].
+    """
+    composite = {'size': page_size, 'sources': sources}
+    body = {'size': 0, 'aggs': {'keys': {'composite': composite}}}
+    if query is not None:
+        body['query'] = query
+    
+    while True:
+        response = http_client.post(f'{opensearch_url}/{index_name}/_search', json=body, timeout=timeout)
+        response.raise_for_status()
+        agg = response.json().get('aggregations', {}).get('keys', {})
+        
+        yield from agg.get('buckets', [])
+        
+        after_key = agg.get('after_key')
+        if not after_key or not agg.get('buckets'):
+            return
+        composite['after'] = after_key
+
+
+def iter_paper_ids(opensearch_url, index_name, query=None, page_size=COMPOSITE_PAGE_SIZE):
+    """Lazily yield every distinct arxiv_id (in sorted order) matching `query`"""
+    sources = [{'arxiv_id': {'terms': {'field': 'arxiv_id'}}}]
+    for bucket in iter_composite_buckets(opensearch_url, index_name, sources, query=query, page_size=page_size):
+        yield bucket['key']['arxiv_id']
+
+
+def count_paper_ids(opensearch_url, index_name, query=None):
+    """Exact number of distinct arxiv_ids matching `query` (cardinality is approximate)"""
+    return sum(1 for _ in iter_paper_ids(opensearch_url, index_name, query=query))
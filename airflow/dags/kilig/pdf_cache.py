@@ -0,0 +1,169 @@
+"""
+PDF Download Cache
+
+Local content-addressed cache of arXiv PDFs keyed by arXiv ID + version.
+Versioned IDs (e.g. 2401.01234v2) are immutable and served straight from disk;
+unversioned keys are revalidated with conditional GETs (ETag/Last-Modified).
+Blobs are stored once per SHA-256 and evicted least-recently-used when the
+cache exceeds its size budget.
+"""
+from datetime import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+from kilig import http_client
+
+# Configuration
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', '/opt/airflow/data/pdf-cache')
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+_VERSIONED_ID = re.compile(r'v\d+$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdf_entries (
+    cache_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    last_access TEXT NOT NULL
+)
+"""
+
+
+class PdfCache:
+    """Content-addressed PDF store with an LRU size budget"""
+    
+    def __init__(self, root=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(_SCHEMA)
+    
+    def _blob_path(self, sha256):
+        return os.path.join(self.root, 'objects', f'{sha256}.pdf')
+    
+    def _lookup(self, cache_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, etag, last_modified FROM pdf_entries WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        if row and os.path.exists(self._blob_path(row[0])):
+            return {'sha256': row[0], 'etag': row[1], 'last_modified': row[2]}
+        return None
+    
+    def _touch(self, cache_key):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pdf_entries SET last_access = ? WHERE cache_key = ?",
+                (datetime.utcnow().isoformat(), cache_key),
+            )
+    
+    def get_path(self, arxiv_id, url, timeout=60):
+        """
+        Return a local path to the PDF for arxiv_id, downloading only when needed.
+        
+        Raises requests.RequestException (or an HTTP error) if a download is
+        required and fails.
+        """
+        cache_key = arxiv_id
+        entry = self._lookup(cache_key)
+        
+        if entry and _VERSIONED_ID.search(arxiv_id):
+            # A specific arXiv version never changes: no network at all
+            self._touch(cache_key)
+            return self._blob_path(entry['sha256'])
+        
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        response = http_client.get(url, headers=headers, timeout=timeout, stream=True)
+        
+        if entry and response.status_code == 304:
+            response.close()
+            self._touch(cache_key)
+            return self._blob_path(entry['sha256'])
+        
+        response.raise_for_status()
+        
+        # Stream to a temp file while hashing, then move into place by digest
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'objects'), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            sha256 = digest.hexdigest()
+            os.replace(tmp_path, self._blob_path(sha256))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_entries (cache_key, sha256, size, etag, last_modified, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, sha256, size, response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), datetime.utcnow().isoformat()),
+            )
+        
+        self.evict(keep=cache_key)
+        return self._blob_path(sha256)
+    
+    def evict(self, keep=None):
+        """Drop least-recently-used entries (except keep) until the stored blobs fit the budget"""
+        removed = 0
+        with self._lock, self._conn:
+            # Blob size counted once even if several keys share it
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT sha256, MAX(size) AS size FROM pdf_entries GROUP BY sha256)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            
+            rows = self._conn.execute(
+                "SELECT cache_key, sha256, size FROM pdf_entries ORDER BY last_access ASC"
+            ).fetchall()
+            for cache_key, sha256, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if cache_key == keep:
+                    continue
+                self._conn.execute("DELETE FROM pdf_entries WHERE cache_key = ?", (cache_key,))
+                still_used = self._conn.execute(
+                    "SELECT 1 FROM pdf_entries WHERE sha256 = ? LIMIT 1", (sha256,)
+                ).fetchone()
+                if not still_used:
+                    try:
+                        os.remove(self._blob_path(sha256))
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                removed += 1
+        
+        if removed:
+            print(f"[PdfCache] Evicted {removed} entries to stay under {self.max_bytes} bytes")
+        return removed
+    
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pdf_entries"
+            ).fetchone()
+        return {'entries': count, 'bytes': size, 'max_bytes': self.max_bytes}
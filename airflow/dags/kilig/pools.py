@@ -0,0 +1,66 @@
+"""
+Airflow Pools
+
+Named pools that cap concurrent load on each external system the DAGs talk to.
+Every task hitting the backend, OpenSearch or Redis is assigned to the matching
+pool with a slot weight (health checks excepted, so they keep running while a
+pool is saturated): light queries take one slot, ingestion/refresh work
+takes HEAVY_TASK_SLOTS, and an OpenSearch force merge takes the whole pool so it
+never overlaps with other OpenSearch work. Tasks that bulk-write the chunk index
+(embedding refresh) hold OpenSearch rather than backend slots for that reason. The one-slot arXiv pool serialises
+fetches across DAG runs, since each run's rate limiter only spaces its own requests.
+
+Bootstrap (run by airflow-init):
+    PYTHONPATH=/opt/airflow/dags python -c "from kilig.pools import ensure_pools; ensure_pools()"
+"""
+import os
+
+BACKEND_POOL = 'kilig_backend'
+OPENSEARCH_POOL = 'kilig_opensearch'
+REDIS_POOL = 'kilig_redis'
+ARXIV_POOL = 'kilig_arxiv'
+
+BACKEND_POOL_SIZE = int(os.getenv('BACKEND_POOL_SLOTS', '8'))
+OPENSEARCH_POOL_SIZE = int(os.getenv('OPENSEARCH_POOL_SLOTS', '8'))
+REDIS_POOL_SIZE = int(os.getenv('REDIS_POOL_SLOTS', '4'))
+ARXIV_POOL_SIZE = int(os.getenv('ARXIV_POOL_SLOTS', '1'))
+
+POOLS = {
+    BACKEND_POOL: (BACKEND_POOL_SIZE, 'Kilig backend API (parse, index, reindex, admin)'),
+    OPENSEARCH_POOL: (OPENSEARCH_POOL_SIZE, 'OpenSearch queries, stats and maintenance'),
+    REDIS_POOL: (REDIS_POOL_SIZE, 'Redis scans and stats'),
+    ARXIV_POOL: (ARXIV_POOL_SIZE, 'arXiv API and OAI-PMH fetches (polite-use limit)'),
+}
+
+# Slot weights
+LIGHT_TASK_SLOTS = 1
+HEAVY_TASK_SLOTS = int(os.getenv('HEAVY_TASK_SLOTS', '4'))
+
+
+def pool_args(pool, slots=LIGHT_TASK_SLOTS):
+    """Operator kwargs placing a task in `pool`, clamped so it can always be scheduled"""
+    size = POOLS[pool][0] if pool in POOLS else slots
+    return {'pool': pool, 'pool_slots': max(1, min(slots, size))}
+
+
+def exclusive_pool_args(pool):
+    """Operator kwargs for a task that must run alone in `pool`"""
+    return pool_args(pool, POOLS[pool][0])
+
+
+def index_write_pool_args(slots=HEAVY_TASK_SLOTS):
+    """
+    Operator kwargs for a task that bulk-writes the chunk index. A task holds a
+    single pool, so these take OpenSearch slots: the force merge's exclusive
+    claim on that pool then never overlaps them.
+    """
+    return pool_args(OPENSEARCH_POOL, slots)
+
+
+def ensure_pools():
+    """Create or resize every pool to its configured size"""
+    from airflow.models.pool import Pool
+    
+    for name, (slots, description) in POOLS.items():
+        Pool.create_or_update_pool(name, slots=slots, description=description, include_deferred=False)
+        print(f"[Pools] {name}: {slots} slots")
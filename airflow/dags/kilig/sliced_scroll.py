@@ -0,0 +1,79 @@
+"""
+Sliced Scroll
+
+Reads an OpenSearch index as `max_slices` independent scroll slices in parallel
+threads. With no more slices than primary shards each slice maps onto shard
+boundaries, so readers do not contend for the same segments.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from kilig import http_client
+
+SCROLL_KEEP_ALIVE = os.getenv('SCROLL_KEEP_ALIVE', '2m')
+SCROLL_PAGE_SIZE = int(os.getenv('SCROLL_PAGE_SIZE', '500'))
+
+
+def primary_shards(opensearch_url, index_name):
+    """Number of primary shards behind an index or alias"""
+    response = http_client.get(
+        f'{opensearch_url}/{index_name}/_settings/index.number_of_shards', params={'flat_settings': 'true'}, timeout=30
+    )
+    response.raise_for_status()
+    return int(next(iter(response.json().values()))['settings']['index.number_of_shards'])
+
+
+def iter_slice(opensearch_url, index_name, slice_id, max_slices, body, page_size=SCROLL_PAGE_SIZE,
+               keep_alive=SCROLL_KEEP_ALIVE):
+    """Yield pages (lists of hits) of one scroll slice; the scroll is cleared when the generator closes"""
+    search = dict(body, size=page_size)
+    if max_slices > 1:
+        search['slice'] = {'id': slice_id, 'max': max_slices}
+    
+    response = http_client.post(
+        f'{opensearch_url}/{index_name}/_search', params={'scroll': keep_alive}, json=search, timeout=120
+    )
+    response.raise_for_status()
+    data = response.json()
+    scroll_id = data.get('_scroll_id')
+    
+    try:
+        while True:
+            hits = data.get('hits', {}).get('hits', [])
+            if not hits:
+                return
+            yield hits
+            
+            response = http_client.post(
+                f'{opensearch_url}/_search/scroll', json={'scroll': keep_alive, 'scroll_id': scroll_id}, timeout=120
+            )
+            response.raise_for_status()
+            data = response.json()
+            scroll_id = data.get('_scroll_id', scroll_id)
+    finally:
+        if scroll_id:
+            try:
+                http_client.request(
+                    'DELETE', f'{opensearch_url}/_search/scroll', json={'scroll_id': [scroll_id]}, timeout=30, retry=False
+                )
+            except Exception as e:
+                print(f"[SlicedScroll] Could not clear scroll for slice {slice_id}: {e}")
+
+
+def scan_slices(opensearch_url, index_name, body, handle_slice, max_slices=None, page_size=SCROLL_PAGE_SIZE):
+    """
+    Run `handle_slice(slice_id, pages)` for every slice in parallel, where `pages`
+    is that slice's page iterator; returns the handlers' results in slice order.
+    Defaults to one slice per primary shard.
+    """
+    max_slices = max_slices or primary_shards(opensearch_url, index_name)
+    
+    def run(slice_id):
+        pages = iter_slice(opensearch_url, index_name, slice_id, max_slices, body, page_size=page_size)
+        try:
+            return handle_slice(slice_id, pages)
+        finally:
+            pages.close()  # Clear the scroll even if the handler stopped early
+    
+    with ThreadPoolExecutor(max_workers=max_slices) as executor:
+        return list(executor.map(run, range(max_slices)))
@@ -0,0 +1,157 @@
+"""
+Request Throttling
+
+Thread-safe token bucket shared by concurrent workers that must stay within a
+combined request budget (e.g. arXiv's one-request-per-three-seconds policy),
+and an AIMD concurrency limiter that sizes in-flight backend requests from
+observed latency and overload responses.
+"""
+import math
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/second, holding at most `capacity`"""
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on in-flight requests to one downstream endpoint.
+    
+    After every `window` completed requests the limit grows by one if their p95
+    latency stayed under `target_p95_ms` (and the limit was actually reached),
+    or shrinks by one if it did not. An overload signal (429/503/timeout)
+    multiplies the limit by `decrease`. Only requests started under the current
+    limit count, so one burst of failures cuts the limit once, not per request.
+    """
+    
+    def __init__(self, name, initial, max_limit, min_limit=1, target_p95_ms=30000, window=10, decrease=0.5):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_p95_ms = target_p95_ms
+        self.window = max(1, window)
+        self.decrease = decrease
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.history = [(time.time(), self.limit, 'initial')]
+        self._in_flight = 0
+        self._peak = 0
+        self._samples = []
+        self._generation = 0
+        self._cond = threading.Condition()
+    
+    def slot(self):
+        """Context manager holding one in-flight slot; call .overload() on 429/503/timeout"""
+        return _LimiterSlot(self)
+    
+    def _acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+            return self._generation
+    
+    def _release(self, generation, elapsed_ms, overloaded):
+        with self._cond:
+            self._in_flight -= 1
+            
+            if generation == self._generation:
+                if overloaded:
+                    self._set_limit(math.floor(self.limit * self.decrease), 'overload')
+                else:
+                    self._samples.append(elapsed_ms)
+                    if len(self._samples) >= self.window:
+                        p95 = sorted(self._samples)[math.ceil(0.95 * len(self._samples)) - 1]
+                        if p95 > self.target_p95_ms:
+                            self._set_limit(self.limit - 1, f'p95 {p95:.0f}ms > {self.target_p95_ms}ms')
+                        elif self._peak >= self.limit:
+                            self._set_limit(self.limit + 1, f'p95 {p95:.0f}ms')
+                        else:
+                            self._samples = []  # Under-used: no evidence either way
+                            self._peak = self._in_flight
+            
+            self._cond.notify_all()
+    
+    def _set_limit(self, limit, reason):
+        limit = min(self.max_limit, max(self.min_limit, limit))
+        self._samples = []
+        self._peak = self._in_flight
+        self._generation += 1
+        
+        if limit != self.limit:
+            print(f"[Limiter] {self.name}: limit {self.limit} -> {limit} ({reason})")
+            self.limit = limit
+            self.history.append((time.time(), limit, reason))
+    
+    def snapshot(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'min': min(limit for _, limit, _ in self.history),
+                'max': max(limit for _, limit, _ in self.history),
+                'changes': len(self.history) - 1,
+            }
+
+
+class _LimiterSlot:
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._overloaded = False
+    
+    def overload(self):
+        self._overloaded = True
+    
+    def __enter__(self):
+        self._generation = self._limiter._acquire()
+        self._start = time.monotonic()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.monotonic() - self._start) * 1000
+        self._limiter._release(self._generation, elapsed_ms, self._overloaded)
+        return False
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, **kwargs):
+    """Process-wide AdaptiveLimiter for `name`, created with `kwargs` on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(name, **kwargs)
+            _limiters[name] = limiter
+        return limiter
+
+
+def limiter_snapshot():
+    with _limiters_lock:
+        return {name: limiter.snapshot() for name, limiter in _limiters.items()}
@@ -0,0 +1,377 @@
+"""
+Vector Archive
+
+Bulk export of the chunk index for offline analysis and rebuilds. Parallel
+sliced scroll streams every chunk; vectors are written into a preallocated
+float32 matrix through np.memmap, everything else into Parquet parts keyed by
+matrix row:
+
+    {VECTOR_ARCHIVE_DIR}/{index}-{timestamp}/
+        manifest.json               index, dimension, rows, embedding models
+        vectors.f32                 raw float32, shape (rows, dimension), row-major
+        chunks/part-NNN.parquet     row, doc_id, arxiv_id, chunk_index, chunk_text, ...
+
+Archives are written under a `.partial` name and renamed once complete, so
+readers only ever see finished ones. Loading is an mmap plus a columnar read:
+no JSON parsing of vectors.
+
+bulk_load_archive() goes the other way: it streams an archive straight into an
+index through parallel `_bulk` requests, so a rebuild (mapping or HNSW change)
+costs indexing time only, with no embedding calls.
+"""
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from kilig import http_client
+from kilig import index_versions
+from kilig.sliced_scroll import primary_shards, scan_slices
+from kilig.throttle import get_limiter
+
+VECTOR_ARCHIVE_DIR = os.getenv('VECTOR_ARCHIVE_DIR', '/opt/airflow/data/vector-archive')
+VECTOR_ARCHIVE_KEEP = int(os.getenv('VECTOR_ARCHIVE_KEEP', '2'))
+VECTOR_EXPORT_SLICES = int(os.getenv('VECTOR_EXPORT_SLICES', '0'))  # 0 = one per primary shard
+VECTOR_EXPORT_PAGE_SIZE = int(os.getenv('VECTOR_EXPORT_PAGE_SIZE', '1000'))
+
+# Bulk loading: docs per _bulk request (capped so a body stays under VECTOR_BULK_MAX_MB),
+# and up to VECTOR_BULK_WORKERS requests in flight, backing off adaptively on 429s
+VECTOR_BULK_DOCS = int(os.getenv('VECTOR_BULK_DOCS', '2000'))
+VECTOR_BULK_MAX_MB = float(os.getenv('VECTOR_BULK_MAX_MB', '25'))
+VECTOR_BULK_WORKERS = int(os.getenv('VECTOR_BULK_WORKERS', '4'))
+VECTOR_BULK_TARGET_P95_MS = int(os.getenv('VECTOR_BULK_TARGET_P95_MS', '30000'))
+BULK_ITEM_RETRIES = 3
+
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.f32'
+CHUNKS_DIR = 'chunks'
+
+# Room over the pre-export count for chunks indexed before the scrolls open
+CAPACITY_HEADROOM = 0.01
+
+CHUNK_SCHEMA = pa.schema([
+    ('row', pa.int64()),
+    ('doc_id', pa.string()),
+    ('arxiv_id', pa.string()),
+    ('paper_id', pa.string()),
+    ('chunk_index', pa.int32()),
+    ('section_title', pa.string()),
+    ('chunk_text', pa.string()),
+    ('title', pa.string()),
+    ('abstract', pa.string()),
+    ('categories', pa.list_(pa.string())),
+    ('published_date', pa.string()),
+    ('word_count', pa.int32()),
+    ('embedding_model', pa.string()),
+    ('metadata', pa.string()),  # JSON-encoded object
+])
+
+# _source fields copied as-is into their Parquet column
+SOURCE_COLUMNS = ('arxiv_id', 'paper_id', 'chunk_index', 'section_title', 'chunk_text', 'title',
+                  'abstract', 'published_date', 'word_count', 'embedding_model')
+
+
+class _RowAllocator:
+    """Hands out disjoint row ranges of the preallocated matrix to slice threads"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.next_row = 0
+        self._lock = threading.Lock()
+    
+    def reserve(self, count):
+        with self._lock:
+            start = self.next_row
+            if start + count > self.capacity:
+                raise RuntimeError(f'Index grew past the export capacity of {self.capacity} rows; re-run the export')
+            self.next_row += count
+            return start
+
+
+class _VectorFile:
+    """Preallocated float32 matrix the slice threads write their rows into"""
+    
+    def __init__(self, path, capacity, dimension):
+        self.path = path
+        self.dimension = dimension
+        self._vectors = np.memmap(path, dtype=np.float32, mode='w+', shape=(capacity, dimension))
+    
+    def write(self, start, vectors):
+        self._vectors[start:start + len(vectors)] = np.asarray(vectors, dtype=np.float32)
+    
+    def close(self, rows):
+        """Flush, drop the mapping and cut the file down to the `rows` written"""
+        self._vectors.flush()
+        self._vectors = None
+        os.truncate(self.path, rows * self.dimension * np.dtype(np.float32).itemsize)
+
+
+def _chunk_record(doc_id, source):
+    record = {name: source.get(name) for name in SOURCE_COLUMNS}
+    categories = source.get('categories')
+    record['categories'] = [categories] if isinstance(categories, str) else categories
+    metadata = source.get('metadata')
+    record['metadata'] = json.dumps(metadata) if metadata is not None else None
+    record['doc_id'] = doc_id
+    return record
+
+
+def export_index(opensearch_url, index_name, archive_dir=VECTOR_ARCHIVE_DIR, max_slices=None,
+                 page_size=VECTOR_EXPORT_PAGE_SIZE):
+    """Export every chunk of `index_name` into a new archive; returns its manifest"""
+    dimension = index_versions.vector_dimension(opensearch_url, index_name)
+    expected = index_versions.doc_count(opensearch_url, index_name)
+    max_slices = max_slices or VECTOR_EXPORT_SLICES or primary_shards(opensearch_url, index_name)
+    
+    name = f"{index_name}-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    final_path = os.path.join(archive_dir, name)
+    path = f'{final_path}.partial'
+    os.makedirs(os.path.join(path, CHUNKS_DIR))
+    
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    capacity = expected + int(expected * CAPACITY_HEADROOM) + page_size
+    allocator = _RowAllocator(capacity)
+    vectors = _VectorFile(vectors_path, capacity, dimension)
+    
+    def export_slice(slice_id, pages):
+        writer = pq.ParquetWriter(os.path.join(path, CHUNKS_DIR, f'part-{slice_id:03d}.parquet'), CHUNK_SCHEMA)
+        stats = {'exported': 0, 'skipped': 0, 'models': {}}
+        try:
+            for hits in pages:
+                records = []
+                page_vectors = []
+                for hit in hits:
+                    source = hit.get('_source', {})
+                    vector = source.get('embedding')
+                    if not vector or len(vector) != dimension:
+                        stats['skipped'] += 1
+                        continue
+                    page_vectors.append(vector)
+                    records.append(_chunk_record(hit['_id'], source))
+                if not records:
+                    continue
+                
+                start = allocator.reserve(len(records))
+                vectors.write(start, page_vectors)
+                for offset, record in enumerate(records):
+                    record['row'] = start + offset
+                    model = record['embedding_model'] or 'unknown'
+                    stats['models'][model] = stats['models'].get(model, 0) + 1
+                writer.write_table(pa.Table.from_pylist(records, schema=CHUNK_SCHEMA))
+                stats['exported'] += len(records)
+        finally:
+            writer.close()
+        print(f"[VectorArchive] Slice {slice_id}/{max_slices}: {stats['exported']} chunks")
+        return stats
+    
+    try:
+        body = {'query': {'match_all': {}}, 'sort': ['_doc']}
+        slices = scan_slices(opensearch_url, index_name, body, export_slice, max_slices=max_slices, page_size=page_size)
+        
+        rows = allocator.next_row
+        vectors.close(rows)
+        
+        models = {}
+        for stats in slices:
+            for model, count in stats['models'].items():
+                models[model] = models.get(model, 0) + count
+        
+        manifest = {
+            'index': index_name,
+            'source_index': index_versions.live_index(opensearch_url, index_name),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'dimension': dimension,
+            'dtype': 'float32',
+            'rows': rows,
+            'expected_rows': expected,
+            'skipped': sum(stats['skipped'] for stats in slices),
+            'slices': max_slices,
+            'embedding_models': models,
+        }
+        with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(path, final_path)
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    
+    manifest['path'] = final_path
+    print(f"[VectorArchive] Exported {rows} vectors ({dimension}d) from {index_name} to {final_path}")
+    return manifest
+
+
+def list_archives(index_name, archive_dir=VECTOR_ARCHIVE_DIR):
+    """Finished archives of `index_name`, oldest first"""
+    pattern = re.compile(rf'^{re.escape(index_name)}-\d{{14}}$')
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(archive_dir, name) for name in names
+        if pattern.match(name) and os.path.exists(os.path.join(archive_dir, name, MANIFEST_FILE))
+    )
+
+
+def latest_archive(index_name, archive_dir=VECTOR_ARCHIVE_DIR):
+    archives = list_archives(index_name, archive_dir)
+    return archives[-1] if archives else None
+
+
+def open_archive(path):
+    """(manifest, read-only float32 memmap of shape (rows, dimension))"""
+    with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    shape = (manifest['rows'], manifest['dimension'])
+    if manifest['rows'] == 0:
+        return manifest, np.empty(shape, dtype=np.float32)  # mmap cannot map an empty file
+    return manifest, np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode='r', shape=shape)
+
+
+def iter_chunk_batches(path, columns=None, batch_size=10000):
+    """Stream the chunk table as pyarrow RecordBatches, one part file after another"""
+    chunks_dir = os.path.join(path, CHUNKS_DIR)
+    for name in sorted(os.listdir(chunks_dir)):
+        yield from pq.ParquetFile(os.path.join(chunks_dir, name)).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def read_chunks(path, columns=None):
+    """Whole chunk table (optionally only `columns`) as a pyarrow Table"""
+    return pq.read_table(os.path.join(path, CHUNKS_DIR), columns=columns, schema=CHUNK_SCHEMA)
+
+
+def prune_archives(index_name, archive_dir=VECTOR_ARCHIVE_DIR, keep=VECTOR_ARCHIVE_KEEP):
+    """Delete all but the newest `keep` finished archives"""
+    doomed = list_archives(index_name, archive_dir)[:-keep] if keep > 0 else list_archives(index_name, archive_dir)
+    for path in doomed:
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"[VectorArchive] Deleted old archive {path}")
+    return doomed
+
+
+def _bulk_docs_per_request(dimension):
+    # A float32 serialises to ~20 bytes of JSON; allow ~4 KB for text and metadata
+    doc_bytes = dimension * 20 + 4096
+    return max(1, min(VECTOR_BULK_DOCS, int(VECTOR_BULK_MAX_MB * 1024 * 1024 // doc_bytes)))
+
+
+def _bulk_action(index_name, record, vector):
+    source = {key: value for key, value in record.items() if key not in ('row', 'doc_id') and value is not None}
+    if 'metadata' in source:
+        source['metadata'] = json.loads(source['metadata'])
+    source['embedding'] = vector.tolist()
+    return json.dumps({'index': {'_index': index_name, '_id': record['doc_id']}}) + '\n' + json.dumps(source) + '\n'
+
+
+def _send_bulk(opensearch_url, index_name, records, vectors, limiter):
+    """
+    Index one batch with a single _bulk request, re-sending items rejected for
+    back-pressure (429). Returns (indexed, [(arxiv_id, error), ...]).
+    """
+    pending = list(zip(records, (_bulk_action(index_name, r, v) for r, v in zip(records, vectors))))
+    indexed = 0
+    errors = []
+    
+    for attempt in range(BULK_ITEM_RETRIES + 1):
+        response = http_client.post(
+            f'{opensearch_url}/_bulk',
+            data=''.join(action for _, action in pending).encode('utf-8'),
+            headers={'Content-Type': 'application/x-ndjson'},
+            timeout=300,
+            limiter=limiter,
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get('errors'):
+            return indexed + len(pending), errors
+        
+        rejected = []
+        for (record, action), item in zip(pending, result['items']):
+            outcome = next(iter(item.values()))
+            status = outcome.get('status', 500)
+            if status < 300:
+                indexed += 1
+            elif status == 429 and attempt < BULK_ITEM_RETRIES:
+                rejected.append((record, action))
+            else:
+                errors.append((record['arxiv_id'], str(outcome.get('error'))[:500]))
+        if not rejected:
+            break
+        pending = rejected
+        time.sleep(2 ** attempt)
+    
+    return indexed, errors
+
+
+def bulk_load_archive(opensearch_url, index_name, path, workers=VECTOR_BULK_WORKERS):
+    """
+    Index every chunk of the archive at `path` into `index_name` (keeping doc IDs),
+    then refresh it. Returns counts plus the arxiv_ids with chunks that failed.
+    """
+    manifest, vectors = open_archive(path)
+    docs_per_request = _bulk_docs_per_request(manifest['dimension'])
+    limiter = get_limiter(
+        'opensearch_bulk', initial=max(1, workers // 2), max_limit=workers, target_p95_ms=VECTOR_BULK_TARGET_P95_MS,
+    )
+    print(
+        f"[VectorArchive] Loading {manifest['rows']} chunks from {path} into {index_name}: "
+        f"{docs_per_request} docs/request, up to {workers} requests in flight"
+    )
+    
+    indexed = 0
+    failed_papers = {}
+    in_flight = set()
+    requests_done = 0
+    started = time.monotonic()
+    
+    def collect(return_when):
+        nonlocal indexed, requests_done
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            in_flight.discard(future)
+            done, errors = future.result()
+            indexed += done
+            for arxiv_id, error in errors:
+                failed_papers.setdefault(arxiv_id, error)
+            requests_done += 1
+            if requests_done % 50 == 0:
+                rate = indexed / max(time.monotonic() - started, 1e-6)
+                print(f"[VectorArchive] {indexed}/{manifest['rows']} chunks indexed ({rate:.0f} docs/s)")
+    
+    # Bounded window: the reader stays at most a few batches ahead of the bulk workers
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in iter_chunk_batches(path, batch_size=docs_per_request):
+            records = batch.to_pylist()
+            rows = np.fromiter((record['row'] for record in records), dtype=np.int64, count=len(records))
+            if len(in_flight) >= workers * 2:
+                collect(FIRST_COMPLETED)
+            in_flight.add(executor.submit(_send_bulk, opensearch_url, index_name, records, vectors[rows], limiter))
+        
+        if in_flight:
+            collect(ALL_COMPLETED)
+    
+    index_versions.refresh_index(opensearch_url, index_name)
+    elapsed = time.monotonic() - started
+    
+    result = {
+        'archive': path,
+        'archive_created_at': manifest['created_at'],
+        'rows': manifest['rows'],
+        'indexed': indexed,
+        'failed_papers': failed_papers,
+        'docs_per_request': docs_per_request,
+        'workers': workers,
+        'seconds': round(elapsed, 1),
+        'docs_per_sec': round(indexed / max(elapsed, 1e-6), 1),
+    }
+    print(f"[VectorArchive] Loaded {indexed}/{manifest['rows']} chunks into {index_name} in {elapsed:.0f}s")
+    return result
@@ -0,0 +1,176 @@
+"""
+Offloaded XCom Backend
+
+Stores large XCom values (parsed paper payloads with full_text/sections) as
+gzip-compressed, content-addressed files on a shared volume and keeps only a
+short reference in the Airflow metadata DB. A payload lives as long as an XCom
+row references it: the cleanup first deletes the XCom rows of DAG runs that ended
+more than XCOM_RETENTION_DAYS ago, then the purge removes files no row points at
+any more.
+
+Enable with:
+    AIRFLOW__CORE__XCOM_BACKEND=kilig.xcom_backend.OffloadedXComBackend
+"""
+from datetime import datetime, timedelta
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from airflow.models.xcom import BaseXCom
+from airflow.utils.json import XComDecoder, XComEncoder
+
+# Configuration
+XCOM_STORAGE_PATH = os.getenv('XCOM_STORAGE_PATH', '/opt/airflow/xcom-store')
+XCOM_OFFLOAD_THRESHOLD_BYTES = int(os.getenv('XCOM_OFFLOAD_THRESHOLD_BYTES', str(64 * 1024)))
+# Grace period for unreferenced payloads, covering tasks that wrote one but have not committed its XCom row yet
+XCOM_RETENTION_DAYS = int(os.getenv('XCOM_RETENTION_DAYS', '7'))
+
+REF_PREFIX = 'kilig-xcom://'
+
+
+class OffloadedXComMissing(Exception):
+    """An XCom row references a payload that is no longer in the store"""
+
+
+def _object_path(digest):
+    """Path of a stored payload, sharded by the first two hex digits"""
+    return os.path.join(XCOM_STORAGE_PATH, digest[:2], f'{digest}.json.gz')
+
+
+def write_payload(data):
+    """Write encoded bytes to the store (deduplicated by content) and return a reference"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(digest)
+    
+    if os.path.exists(path):
+        # Same content already stored: refresh mtime so retention counts from the latest use
+        os.utime(path, None)
+        return f'{REF_PREFIX}{digest}'
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    # Write to a temp file and rename so readers never see a partial object
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return f'{REF_PREFIX}{digest}'
+
+
+def read_payload(ref):
+    """Read the bytes behind a reference; raises OffloadedXComMissing if the object is gone"""
+    path = _object_path(ref[len(REF_PREFIX):])
+    
+    try:
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read())
+    except FileNotFoundError:
+        # Never hand downstream tasks a silent None ("no papers") for a lost value
+        raise OffloadedXComMissing(f'Offloaded XCom value {ref} not found under {XCOM_STORAGE_PATH}') from None
+
+
+def is_reference(value):
+    """Whether an XCom value is a reference to an offloaded payload"""
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+def referenced_digests():
+    """Digests of every payload still referenced by an XCom row in the metadata DB"""
+    from airflow.utils.session import create_session
+    
+    # serialize_value stores the reference as a JSON string
+    marker = json.dumps(REF_PREFIX)[:-1].encode('utf-8')
+    digests = set()
+    with create_session() as session:
+        for (value,) in session.query(BaseXCom.value).yield_per(1000):
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            if value and value.startswith(marker):
+                digests.add(value[len(marker):].rstrip(b'"').decode('utf-8'))
+    return digests
+
+
+def expire_xcom_rows(retention_days=XCOM_RETENTION_DAYS):
+    """
+    Delete the XCom rows of DAG runs that ended more than `retention_days` ago, so
+    their payloads become unreferenced. Returns the number of rows deleted.
+    """
+    from airflow.models.dagrun import DagRun
+    from airflow.utils import timezone
+    from airflow.utils.session import create_session
+    
+    cutoff = timezone.utcnow() - timedelta(days=retention_days)
+    with create_session() as session:
+        # Runs still going have no end_date and keep their rows
+        expired_runs = session.query(DagRun.id).filter(DagRun.end_date < cutoff)
+        return session.query(BaseXCom).filter(
+            BaseXCom.dag_run_id.in_(expired_runs.scalar_subquery())
+        ).delete(synchronize_session=False)
+
+
+def purge_offloaded_xcoms(retention_days=XCOM_RETENTION_DAYS, referenced=None):
+    """
+    Remove stored payloads that no XCom row references any more, once they are
+    older than the grace period. `referenced` defaults to referenced_digests().
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).timestamp()
+    
+    result = {'files_removed': 0, 'bytes_removed': 0, 'files_kept': 0}
+    
+    if not os.path.isdir(XCOM_STORAGE_PATH):
+        return result
+    
+    if referenced is None:
+        referenced = referenced_digests()
+    
+    for root, _dirs, files in os.walk(XCOM_STORAGE_PATH):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith('.json.gz') and name[:-len('.json.gz')] in referenced:
+                result['files_kept'] += 1
+                continue
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime < cutoff:
+                    os.remove(path)
+                    result['files_removed'] += 1
+                    result['bytes_removed'] += stat.st_size
+                else:
+                    result['files_kept'] += 1
+            except FileNotFoundError:
+                # Removed concurrently
+                continue
+    
+    return result
+
+
+class OffloadedXComBackend(BaseXCom):
+    """XCom backend that moves values above a size threshold to the shared store"""
+    
+    @staticmethod
+    def serialize_value(value, *, key=None, task_id=None, dag_id=None, run_id=None, map_index=None, **kwargs):
+        data = json.dumps(value, cls=XComEncoder).encode('utf-8')
+        
+        if len(data) > XCOM_OFFLOAD_THRESHOLD_BYTES:
+            value = write_payload(data)
+        
+        return BaseXCom.serialize_value(
+            value, key=key, task_id=task_id, dag_id=dag_id, run_id=run_id, map_index=map_index
+        )
+    
+    @staticmethod
+    def deserialize_value(result):
+        value = BaseXCom.deserialize_value(result)
+        
+        if is_reference(value):
+            return json.loads(read_payload(value), cls=XComDecoder)
+        
+        return value
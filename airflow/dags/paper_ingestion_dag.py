@@ -4,16 +4,32 @@ Paper Ingestion DAG
 Automated pipeline for fetching, parsing, and indexing scientific papers from ArXiv.
 Schedule: Daily at 2 AM UTC
 """
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
+from airflow.models.baseoperator import chain
 from airflow.utils.dates import days_ago
 from airflow.models import Variable
 import requests
 import arxiv
 import json
 import os
+import queue
+import threading
+import zlib
+
+from kilig import http_client
+from kilig.backend_jobs import BackendJobsOperator, SUCCEEDED
+from kilig.http_client import log_http_metrics
+from kilig.indexed_ids import load_or_reconcile, record_indexed
+from kilig.ledger import PaperLedger, FAILED, INDEXED, PARSED
+from kilig.oai_harvester import OaiError, OaiHarvester
+from kilig.paper_ids import normalize_arxiv_id
+from kilig.pdf_cache import PdfCache
+from kilig.pools import ARXIV_POOL, BACKEND_POOL, HEAVY_TASK_SLOTS, OPENSEARCH_POOL, pool_args
+from kilig.throttle import TokenBucket, get_limiter
 
 # Default arguments
 default_args = {
@@ -24,69 +40,439 @@ default_args = {
     'retries': 3,
     'retry_delay': timedelta(minutes=5),
     'execution_timeout': timedelta(hours=2),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
 }
 
 # Configuration
 KILIG_BACKEND_URL = os.getenv('KILIG_BACKEND_URL', 'http://kilig-backend:3000')
+OPENSEARCH_URL = os.getenv('OPENSEARCH_URL', 'http://opensearch:9200')
+OPENSEARCH_INDEX = os.getenv('OPENSEARCH_INDEX', 'arxiv-papers-chunks')
 ARXIV_CATEGORIES = ['cs.AI', 'cs.CL', 'cs.LG', 'cs.CV', 'cs.NE']
 MAX_PAPERS_PER_RUN = int(os.getenv('MAX_PAPERS_PER_RUN', '50'))
+PARSE_CONCURRENCY = int(os.getenv('PARSE_CONCURRENCY', '4'))  # Initial in-flight parse requests
+PAPER_SHARD_SIZE = int(os.getenv('PAPER_SHARD_SIZE', '10'))  # Papers per mapped parse/index task
+MAX_ACTIVE_SHARDS = int(os.getenv('MAX_ACTIVE_SHARDS', '4'))
+# Existing-paper check: 'local' uses the on-disk indexed-ID set, 'backend' asks the API per run
+EXISTING_CHECK_MODE = os.getenv('EXISTING_CHECK_MODE', 'local')
+# Index submission: 'single' posts one paper per request, 'batch' streams gzip NDJSON batches
+# (needs a backend exposing /api/papers/index-batch)
+INDEX_SUBMIT_MODE = os.getenv('INDEX_SUBMIT_MODE', 'single')
+INDEX_BATCH_SIZE = int(os.getenv('INDEX_BATCH_SIZE', '20'))
+# Ingest mode: 'staged' runs parse_papers then index_papers, 'pipelined' overlaps
+# them in a single ingest_papers task joined by a bounded queue
+INGEST_MODE = os.getenv('INGEST_MODE', 'staged')
+INDEX_CONCURRENCY = int(os.getenv('INDEX_CONCURRENCY', '2'))  # Initial in-flight index requests
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '8'))  # Parsed papers waiting to be indexed
+# Staged index_papers execution: 'sync' calls the backend per paper/batch from the
+# worker, 'deferred' submits index jobs and waits for them in the triggerer
+INDEX_EXECUTION_MODE = os.getenv('INDEX_EXECUTION_MODE', 'sync')
+INDEX_JOB_POLL_SECONDS = float(os.getenv('INDEX_JOB_POLL_SECONDS', '15'))
 
+# Adaptive concurrency: in-flight parse/index requests start at *_CONCURRENCY and
+# move (AIMD) between 1 and *_MAX_CONCURRENCY, growing while p95 latency stays
+# under target and halving on 429/503/timeouts. Set MAX to 1 for serial requests.
+PARSE_MAX_CONCURRENCY = int(os.getenv('PARSE_MAX_CONCURRENCY', '16'))
+PARSE_TARGET_P95_MS = int(os.getenv('PARSE_TARGET_P95_MS', '60000'))  # Half the 120 s parse timeout
+INDEX_MAX_CONCURRENCY = int(os.getenv('INDEX_MAX_CONCURRENCY', '8'))
+INDEX_TARGET_P95_MS = int(os.getenv('INDEX_TARGET_P95_MS', '90000'))  # Half the 180 s index timeout
 
-def fetch_new_papers(**context):
-    """Fetch recent papers from ArXiv API"""
-    client = arxiv.Client()
+PARSE_LIMITER = get_limiter(
+    'parse', initial=PARSE_CONCURRENCY, max_limit=PARSE_MAX_CONCURRENCY, target_p95_ms=PARSE_TARGET_P95_MS,
+)
+INDEX_LIMITER = get_limiter(
+    'index', initial=INDEX_CONCURRENCY, max_limit=INDEX_MAX_CONCURRENCY, target_p95_ms=INDEX_TARGET_P95_MS,
+)
+
+# Local PDF cache: parse requests upload cached bytes instead of making the backend re-download
+# (needs a backend that accepts multipart PDF uploads on /api/papers/parse)
+PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'false').lower() == 'true'
+
+_PIPELINE_DONE = object()
+_batch_index_unsupported = threading.Event()  # Set once the backend 404s the batch endpoint
+_pdf_upload_unsupported = threading.Event()  # Set once the backend answers a PDF upload with 415
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+# Fetch mode: 'latest' takes the newest MAX_PAPERS_PER_RUN submissions,
+# 'incremental' pages through everything submitted since the stored cursor,
+# 'oai' streams the OAI-PMH feed from the stored harvest position (bulk/backfill)
+ARXIV_FETCH_MODE = os.getenv('ARXIV_FETCH_MODE', 'latest')
+ARXIV_CURSOR_VARIABLE = os.getenv('ARXIV_CURSOR_VARIABLE', 'arxiv_ingestion_cursor')
+ARXIV_PAGE_SIZE = int(os.getenv('ARXIV_PAGE_SIZE', '100'))
+INCREMENTAL_MAX_PAPERS = int(os.getenv('INCREMENTAL_MAX_PAPERS', '0'))  # 0 = no cap
+INCREMENTAL_LOOKBACK_HOURS = int(os.getenv('INCREMENTAL_LOOKBACK_HOURS', '24'))  # First run without a cursor
+FETCH_RETRY_MAX_ATTEMPTS = int(os.getenv('FETCH_RETRY_MAX_ATTEMPTS', '3'))  # Runs a failed paper is re-queued for
+# Query each category concurrently, sharing one token bucket across all of them
+ARXIV_PARALLEL_FETCH = os.getenv('ARXIV_PARALLEL_FETCH', 'false').lower() == 'true'
+ARXIV_REQUESTS_PER_SECOND = float(os.getenv('ARXIV_REQUESTS_PER_SECOND', str(1 / 3)))  # arXiv polite-use limit
+OAI_BASE_URL = os.getenv('OAI_BASE_URL', 'https://oaipmh.arxiv.org/oai')
+OAI_SET = os.getenv('OAI_SET', 'cs')
+OAI_FROM_DATE = os.getenv('OAI_FROM_DATE')  # YYYY-MM-DD start for the first harvest
+OAI_MAX_RECORDS_PER_RUN = int(os.getenv('OAI_MAX_RECORDS_PER_RUN', '500'))
+ARXIV_OAI_STATE_VARIABLE = os.getenv('ARXIV_OAI_STATE_VARIABLE', 'arxiv_oai_harvest_state')
+
+# Backfill: one DAG run per submission-date partition, parse/index capped by the backend pool
+BACKFILL_START_DATE = os.getenv('BACKFILL_START_DATE', '2024-01-01')
+BACKFILL_MAX_ACTIVE_PARTITIONS = int(os.getenv('BACKFILL_MAX_ACTIVE_PARTITIONS', '4'))
+BACKFILL_MAX_PAPERS = int(os.getenv('BACKFILL_MAX_PAPERS', '0'))  # Per partition, 0 = no cap
+BACKFILL_POOL = os.getenv('BACKFILL_POOL', BACKEND_POOL)
+
+
+def _result_to_paper(result):
+    """Convert an arxiv.Result into the paper dict passed between tasks"""
+    return {
+        'arxiv_id': normalize_arxiv_id(result.get_short_id()),
+        'title': result.title,
+        'abstract': result.summary,
+        'authors': [author.name for author in result.authors],
+        'categories': result.categories,
+        'published_date': result.published.isoformat(),
+        'pdf_url': result.pdf_url,
+        'primary_category': result.primary_category,
+    }
+
+
+class _ThrottledSession(requests.Session):
+    """Session that takes a token from the shared bucket before every HTTP request"""
+    
+    def __init__(self, bucket):
+        super().__init__()
+        self.bucket = bucket
+    
+    def send(self, request, **kwargs):
+        self.bucket.acquire()
+        return super().send(request, **kwargs)
+
+
+class RateLimitedArxivClient:
+    """
+    Wraps arxiv.Client and takes a token from a shared bucket for every request
+    it actually sends: each page, and each retry of an empty or failed page.
+    Short or final pages are not charged for requests that never happen.
+    """
+    
+    def __init__(self, bucket, page_size=ARXIV_PAGE_SIZE, **kwargs):
+        # Spacing comes from the shared bucket instead of the per-client delay
+        self.client = arxiv.Client(page_size=page_size, delay_seconds=0, **kwargs)
+        self.client._session = _ThrottledSession(bucket)
+        self.bucket = bucket
+    
+    def results(self, search):
+        return self.client.results(search)
+
+
+def _category_query():
+    """Search query matching any of the configured categories"""
+    return ' OR '.join([f'cat:{cat}' for cat in ARXIV_CATEGORIES])
+
+
+def _search(build_query, max_results, sort_order):
+    """
+    Run a submitted-date-sorted search across ARXIV_CATEGORIES.
+    
+    build_query wraps a category clause into the full query. In parallel mode
+    each category is paged concurrently and the results are merged, de-duplicated
+    by arXiv ID (cross-listed papers) and re-sorted before applying max_results.
+    """
+    def run(client, category_clause):
+        search = arxiv.Search(
+            query=build_query(category_clause),
+            max_results=max_results,
+            sort_by=arxiv.SortCriterion.SubmittedDate,
+            sort_order=sort_order
+        )
+        return list(client.results(search))
+    
+    if not ARXIV_PARALLEL_FETCH:
+        return run(arxiv.Client(page_size=ARXIV_PAGE_SIZE), _category_query())
     
-    # Build search query for multiple categories
-    query = ' OR '.join([f'cat:{cat}' for cat in ARXIV_CATEGORIES])
+    bucket = TokenBucket(rate=ARXIV_REQUESTS_PER_SECOND, capacity=1)
     
-    search = arxiv.Search(
-        query=query,
-        max_results=MAX_PAPERS_PER_RUN,
-        sort_by=arxiv.SortCriterion.SubmittedDate,
-        sort_order=arxiv.SortOrder.Descending
+    def run_category(category):
+        client = RateLimitedArxivClient(bucket, page_size=ARXIV_PAGE_SIZE)
+        results = run(client, f'cat:{category}')
+        print(f"[Airflow] {category}: {len(results)} results")
+        return results
+    
+    with ThreadPoolExecutor(max_workers=len(ARXIV_CATEGORIES)) as executor:
+        per_category = list(executor.map(run_category, ARXIV_CATEGORIES))
+    
+    merged = {}
+    for results in per_category:
+        for result in results:
+            merged.setdefault(result.entry_id, result)
+    
+    ordered = sorted(
+        merged.values(),
+        key=lambda r: r.published,
+        reverse=sort_order == arxiv.SortOrder.Descending
+    )
+    return ordered[:max_results] if max_results else ordered
+
+
+def _fetch_latest():
+    """Fetch the newest MAX_PAPERS_PER_RUN submissions"""
+    results = _search(lambda clause: clause, MAX_PAPERS_PER_RUN, arxiv.SortOrder.Descending)
+    return [_result_to_paper(result) for result in results], None
+
+
+def _drain_retries(papers, cursor):
+    """Prepend the papers a previous run failed to parse/index (kept in the cursor)"""
+    retry = [p for p in (cursor or {}).get('retry', []) if p['arxiv_id'] not in {q['arxiv_id'] for q in papers}]
+    if retry:
+        print(f"[Airflow] Retrying {len(retry)} papers that failed in earlier runs")
+    return retry + papers
+
+
+def _hold_failed(context, next_cursor):
+    """
+    Carry this run's papers that did not reach INDEXED into the cursor's retry
+    list, so advancing the watermark or harvest position past them does not
+    drop them. Papers that failed FETCH_RETRY_MAX_ATTEMPTS runs in a row are
+    given up on.
+    """
+    papers = context['ti'].xcom_pull(key='new_papers', task_ids='filter_papers') or []
+    states = PaperLedger.for_context(context).states(p['arxiv_id'] for p in papers)
+    attempts = next_cursor.get('retry_attempts', {})
+    
+    retry, retry_attempts = [], {}
+    for paper in papers:
+        arxiv_id = paper['arxiv_id']
+        if states.get(arxiv_id) == INDEXED:
+            continue
+        count = attempts.get(arxiv_id, 0) + 1
+        if count >= FETCH_RETRY_MAX_ATTEMPTS:
+            print(f"[Airflow] Giving up on {arxiv_id} after {count} failed runs")
+            continue
+        retry.append(paper)
+        retry_attempts[arxiv_id] = count
+    
+    return {**next_cursor, 'retry': retry, 'retry_attempts': retry_attempts}
+
+
+def _fetch_incremental():
+    """Fetch every submission newer than the stored cursor, oldest first"""
+    cursor = Variable.get(ARXIV_CURSOR_VARIABLE, default_var=None, deserialize_json=True)
+    now = datetime.now(timezone.utc)
+    
+    if cursor:
+        since = datetime.fromisoformat(cursor['published'])
+        seen_ids = set(cursor.get('ids', []))
+    else:
+        since = now - timedelta(hours=INCREMENTAL_LOOKBACK_HOURS)
+        seen_ids = set()
+    
+    # submittedDate has minute resolution, so the window start is inclusive and
+    # papers at exactly the cursor timestamp are de-duplicated via seen_ids
+    date_clause = f"submittedDate:[{since:%Y%m%d%H%M} TO {now:%Y%m%d%H%M}]"
+    results = _search(
+        lambda clause: f"({clause}) AND {date_clause}",
+        INCREMENTAL_MAX_PAPERS or None,
+        arxiv.SortOrder.Ascending
     )
     
     papers = []
-    for result in client.results(search):
-        paper = {
-            'arxiv_id': result.entry_id.split('/')[-1],
-            'title': result.title,
-            'abstract': result.summary,
-            'authors': [author.name for author in result.authors],
-            'categories': result.categories,
-            'published_date': result.published.isoformat(),
-            'pdf_url': result.pdf_url,
-            'primary_category': result.primary_category,
-        }
+    for result in results:
+        if result.published < since:
+            continue
+        paper = _result_to_paper(result)
+        if result.published == since and paper['arxiv_id'] in seen_ids:
+            continue
         papers.append(paper)
     
+    print(f"[Airflow] Incremental fetch since {since.isoformat()}: {len(papers)} papers")
+    
+    # Attempt counts travel with the cursor; commit_cursor rebuilds the retry list
+    retry_attempts = (cursor or {}).get('retry_attempts', {})
+    
+    if not papers:
+        # Anchor the window so the next run does not fall back to the lookback
+        anchor = {'published': cursor['published'], 'ids': cursor.get('ids', [])} if cursor else {'published': since.isoformat(), 'ids': []}
+        return _drain_retries(papers, cursor), {**anchor, 'retry_attempts': retry_attempts}
+    
+    # Advance to the newest timestamp seen, remembering all IDs at that instant
+    latest = max(p['published_date'] for p in papers)
+    latest_ids = {p['arxiv_id'] for p in papers if p['published_date'] == latest}
+    if datetime.fromisoformat(latest) == since:
+        latest_ids |= seen_ids
+    
+    return _drain_retries(papers, cursor), {'published': latest, 'ids': sorted(latest_ids), 'retry_attempts': retry_attempts}
+
+
+def _fetch_oai():
+    """Harvest the next slice of the OAI-PMH feed from the persisted harvest position"""
+    state = Variable.get(ARXIV_OAI_STATE_VARIABLE, default_var=None, deserialize_json=True)
+    if not state:
+        start = OAI_FROM_DATE or (datetime.now(timezone.utc) - timedelta(hours=INCREMENTAL_LOOKBACK_HOURS)).date().isoformat()
+        state = {'from': start, 'resumption_token': None, 'skip': 0, 'last_datestamp': None}
+    
+    categories = set(ARXIV_CATEGORIES)
+    papers = []
+    last_datestamp = state.get('last_datestamp')
+    # Attempt counts travel with the state; commit_cursor rebuilds the retry list
+    retry_attempts = state.get('retry_attempts', {})
+    harvester = OaiHarvester(OAI_BASE_URL, set_spec=OAI_SET)
+    
+    try:
+        records = harvester.iter_records(
+            from_date=state['from'],
+            resumption_token=state.get('resumption_token'),
+            skip=state.get('skip', 0)
+        )
+        for record in records:
+            last_datestamp = max(filter(None, [last_datestamp, record['datestamp']]), default=None)
+            if not categories.intersection(record['categories']):
+                continue
+            arxiv_id = normalize_arxiv_id(record['arxiv_id'])
+            papers.append({
+                'arxiv_id': arxiv_id,
+                'title': record['title'],
+                'abstract': record['abstract'],
+                'authors': record['authors'],
+                'categories': record['categories'],
+                'published_date': record['created'],
+                'pdf_url': f"https://arxiv.org/pdf/{arxiv_id}",
+                'primary_category': record['categories'][0] if record['categories'] else None,
+            })
+            if len(papers) >= OAI_MAX_RECORDS_PER_RUN:
+                break
+    except OaiError as e:
+        if e.code != 'badResumptionToken':
+            raise
+        # Token expired between runs: restart the list from the last datestamp seen
+        print(f"[Airflow] OAI resumption token expired, restarting from {last_datestamp or state['from']}")
+        return _drain_retries(papers, state), {
+            'from': last_datestamp or state['from'], 'resumption_token': None, 'skip': 0,
+            'last_datestamp': last_datestamp, 'retry_attempts': retry_attempts,
+        }
+    
+    if harvester.complete:
+        # Caught up: the next run asks for everything from the newest datestamp on
+        next_state = {'from': last_datestamp or state['from'], 'resumption_token': None, 'skip': 0, 'last_datestamp': last_datestamp}
+    else:
+        next_state = {
+            'from': state['from'],
+            'resumption_token': harvester.page_token,
+            'skip': harvester.page_offset,
+            'last_datestamp': last_datestamp,
+        }
+    
+    print(f"[Airflow] OAI harvest from {state['from']}: {len(papers)} papers (complete={harvester.complete})")
+    return _drain_retries(papers, state), {**next_state, 'retry_attempts': retry_attempts}
+
+
+def fetch_new_papers(**context):
+    """Fetch recent papers from ArXiv API"""
+    if ARXIV_FETCH_MODE in ('incremental', 'oai'):
+        papers, next_cursor = _fetch_oai() if ARXIV_FETCH_MODE == 'oai' else _fetch_incremental()
+        # Only committed by commit_cursor once the run has indexed the papers
+        context['ti'].xcom_push(key='next_cursor', value=next_cursor)
+    else:
+        papers, _ = _fetch_latest()
+    
     print(f"[Airflow] Fetched {len(papers)} papers from ArXiv")
     
+    PaperLedger.for_context(context).record_fetched(p['arxiv_id'] for p in papers)
+    
     # Push to XCom for downstream tasks
     context['ti'].xcom_push(key='fetched_papers', value=papers)
     return len(papers)
 
 
-def filter_new_papers(**context):
-    """Filter out papers that are already indexed"""
-    ti = context['ti']
-    papers = ti.xcom_pull(key='fetched_papers', task_ids='fetch_papers')
+def _partition_window(context):
+    """[start, end) submission window: DAG params when given, else the run's data interval"""
+    params = context.get('params') or {}
+    start = params.get('start') or context['data_interval_start']
+    end = params.get('end') or context['data_interval_end']
     
-    if not papers:
-        print("[Airflow] No papers to filter")
-        return 0
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start)
+    if isinstance(end, str):
+        end = datetime.fromisoformat(end)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    
+    return start, end
+
+
+def fetch_partition_papers(**context):
+    """Fetch every paper submitted in this run's [start, end) window (backfill)"""
+    start, end = _partition_window(context)
+    
+    # arXiv date ranges are inclusive at minute resolution, so stop one minute early
+    # and drop anything outside the half-open window
+    last_minute = end - timedelta(minutes=1)
+    date_clause = f"submittedDate:[{start:%Y%m%d%H%M} TO {last_minute:%Y%m%d%H%M}]"
+    results = _search(
+        lambda clause: f"({clause}) AND {date_clause}",
+        BACKFILL_MAX_PAPERS or None,
+        arxiv.SortOrder.Ascending
+    )
+    papers = [_result_to_paper(r) for r in results if start <= r.published < end]
+    
+    print(f"[Airflow] Partition [{start.isoformat()}, {end.isoformat()}): {len(papers)} papers")
     
-    # Check which papers already exist in OpenSearch via backend API
+    PaperLedger.for_context(context).record_fetched(p['arxiv_id'] for p in papers)
+    
+    context['ti'].xcom_push(key='partition_window', value=[start.isoformat(), end.isoformat()])
+    context['ti'].xcom_push(key='fetched_papers', value=papers)
+    return len(papers)
+
+
+def commit_fetch_cursor(**context):
+    """Persist the incremental high-watermark / OAI harvest position after papers were indexed"""
+    next_cursor = context['ti'].xcom_pull(key='next_cursor', task_ids='fetch_papers')
+    
+    if not next_cursor:
+        print("[Airflow] No cursor to commit")
+        return None
+    
+    next_cursor = _hold_failed(context, next_cursor)
+    
+    variable = ARXIV_OAI_STATE_VARIABLE if ARXIV_FETCH_MODE == 'oai' else ARXIV_CURSOR_VARIABLE
+    Variable.set(variable, next_cursor, serialize_json=True)
+    print(f"[Airflow] Cursor advanced: {json.dumps({k: v for k, v in next_cursor.items() if k != 'retry'})} "
+          f"({len(next_cursor.get('retry', []))} papers held for retry)")
+    return next_cursor
+
+
+def _check_existing_backend(papers):
+    """Ask the backend which of the fetched papers are already indexed"""
     try:
-        response = requests.post(
+        response = http_client.post(
             f'{KILIG_BACKEND_URL}/api/papers/check-existing',
             json={'arxiv_ids': [p['arxiv_id'] for p in papers]},
             timeout=30
         )
-        existing_ids = response.json().get('existing_ids', [])
+        return set(response.json().get('existing_ids', []))
     except requests.RequestException as e:
         print(f"[Airflow] Backend check failed, processing all: {e}")
-        existing_ids = []
+        return set()
+
+
+def filter_new_papers(**context):
+    """Filter out papers that are already indexed"""
+    ti = context['ti']
+    papers = ti.xcom_pull(key='fetched_papers', task_ids='fetch_papers')
+    
+    if not papers:
+        print("[Airflow] No papers to filter")
+        return 0
+    
+    existing_ids = None
+    if EXISTING_CHECK_MODE == 'local':
+        try:
+            # In-memory membership test; reconciles with OpenSearch when stale
+            indexed = load_or_reconcile(OPENSEARCH_URL, OPENSEARCH_INDEX)
+            existing_ids = {p['arxiv_id'] for p in papers if p['arxiv_id'] in indexed}
+        except Exception as e:
+            print(f"[Airflow] Local indexed-ID set unavailable, asking backend: {e}")
+    
+    if existing_ids is None:
+        existing_ids = _check_existing_backend(papers)
     
     new_papers = [p for p in papers if p['arxiv_id'] not in existing_ids]
     
@@ -96,6 +482,258 @@ def filter_new_papers(**context):
     return len(new_papers)
 
 
+def _get_pdf_cache():
+    """Process-wide PdfCache, created on first use"""
+    global _pdf_cache
+    with _pdf_cache_lock:
+        if _pdf_cache is None:
+            _pdf_cache = PdfCache()
+        return _pdf_cache
+
+
+def _request_parse(paper):
+    """POST the parse request, uploading the cached PDF when available"""
+    parse_url = f'{KILIG_BACKEND_URL}/api/papers/parse'
+    
+    # Once the backend has refused an upload, skip the cache: pre-fetching would
+    # only download every PDF twice (here and again in the backend)
+    if PDF_CACHE_ENABLED and not _pdf_upload_unsupported.is_set():
+        try:
+            path = _get_pdf_cache().get_path(paper['arxiv_id'], paper['pdf_url'])
+            with open(path, 'rb') as f:
+                pdf_bytes = f.read()
+            
+            response = http_client.post(
+                parse_url,
+                data={'arxiv_id': paper['arxiv_id'], 'pdf_url': paper['pdf_url']},
+                files={'pdf': (f"{paper['arxiv_id']}.pdf", pdf_bytes, 'application/pdf')},
+                timeout=120,
+                limiter=PARSE_LIMITER
+            )
+            if response.status_code != 415:
+                return response
+            if not _pdf_upload_unsupported.is_set():
+                _pdf_upload_unsupported.set()
+                print("[Airflow] Backend does not accept PDF uploads, sending pdf_url from now on")
+            
+        except (requests.RequestException, OSError) as e:
+            print(f"[Airflow] PDF cache unavailable for {paper['arxiv_id']}, sending pdf_url: {e}")
+    
+    return http_client.post(
+        parse_url,
+        json={'arxiv_id': paper['arxiv_id'], 'pdf_url': paper['pdf_url']},
+        timeout=120,
+        limiter=PARSE_LIMITER
+    )
+
+
+def _parse_paper(paper):
+    """Parse a single paper via the backend; returns the enriched paper or None"""
+    try:
+        # Call backend parsing endpoint (uses Docling MCP)
+        response = _request_parse(paper)
+        
+        if response.status_code == 200:
+            parsed = response.json()
+            paper['full_text'] = parsed.get('full_text', '')
+            paper['sections'] = parsed.get('sections', [])
+            print(f"[Airflow] Parsed: {paper['arxiv_id']}")
+            return paper
+        
+        print(f"[Airflow] Failed to parse {paper['arxiv_id']}: {response.status_code}")
+        
+    except requests.RequestException as e:
+        print(f"[Airflow] Parse error for {paper['arxiv_id']}: {e}")
+    
+    return None
+
+
+def _reusable_parses(papers, ledger):
+    """
+    Parsed payloads already checkpointed in this run, keyed by arxiv_id.
+    
+    Keyed on the stored payload rather than the state: a paper whose index
+    attempt failed is FAILED but keeps its payload, and must not be re-parsed.
+    """
+    if ledger is None:
+        return {}
+    
+    reuse = ledger.load_payloads(p['arxiv_id'] for p in papers)
+    if reuse:
+        print(f"[Airflow] Reusing {len(reuse)} papers already parsed in this run")
+    return reuse
+
+
+def _checkpoint_parse(ledger, paper, parsed):
+    if ledger is not None:
+        if parsed is not None:
+            ledger.mark(paper['arxiv_id'], PARSED, payload=parsed)
+        else:
+            ledger.mark(paper['arxiv_id'], FAILED, error='parse')
+
+
+def _parse_papers(papers, ledger=None):
+    """Parse papers with PARSE_LIMITER bounding in-flight requests, preserving order"""
+    reuse = _reusable_parses(papers, ledger)
+    results = [reuse.get(paper['arxiv_id']) for paper in papers]
+    pending = [i for i, result in enumerate(results) if result is None]
+    
+    # A slow PDF only occupies one worker, so it does not hold up the rest of the batch.
+    # Workers beyond the limiter's current limit wait for a slot.
+    workers = max(1, min(PARSE_LIMITER.max_limit, len(pending)))
+    
+    if workers == 1:
+        for i in pending:
+            results[i] = _parse_paper(papers[i])
+            _checkpoint_parse(ledger, papers[i], results[i])
+    else:
+        print(f"[Airflow] Parsing {len(pending)} papers with {workers} workers, limit {PARSE_LIMITER.limit}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_parse_paper, papers[i]): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                _checkpoint_parse(ledger, papers[i], results[i])
+    
+    return [paper for paper in results if paper is not None]
+
+
+def _index_paper(paper):
+    """Index a single parsed paper via the backend; returns True on success"""
+    try:
+        response = http_client.post(
+            f'{KILIG_BACKEND_URL}/api/papers/index',
+            json=paper,
+            timeout=180,
+            limiter=INDEX_LIMITER
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            print(f"[Airflow] Indexed {paper['arxiv_id']}: {result.get('chunks_indexed', 0)} chunks")
+            return True
+        
+        print(f"[Airflow] Index failed for {paper['arxiv_id']}: {response.status_code}")
+        
+    except requests.RequestException as e:
+        print(f"[Airflow] Index error for {paper['arxiv_id']}: {e}")
+    
+    return False
+
+
+def _iter_gzip_ndjson(papers):
+    """Yield a gzip-compressed NDJSON body, one paper per line, without buffering it all"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for paper in papers:
+        chunk = compressor.compress((json.dumps(paper) + '\n').encode('utf-8'))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _index_batch(papers):
+    """
+    Submit a batch of papers as one streamed NDJSON request.
+    
+    Returns the set of successfully indexed IDs, or None if the backend does not
+    support batch submission (caller falls back to per-paper requests).
+    """
+    # The slot covers the whole streamed response, not just its headers
+    with INDEX_LIMITER.slot() as slot:
+        try:
+            response = http_client.post(
+                f'{KILIG_BACKEND_URL}/api/papers/index-batch',
+                data=_iter_gzip_ndjson(papers),
+                headers={
+                    'Content-Type': 'application/x-ndjson',
+                    'Content-Encoding': 'gzip',
+                    'Accept': 'application/x-ndjson',
+                },
+                timeout=(10, 180),  # Read timeout applies between per-paper status lines
+                stream=True
+            )
+            
+            if response.status_code in (404, 405, 501):
+                return None
+            
+            if response.status_code != 200:
+                if response.status_code in http_client.OVERLOAD_STATUSES:
+                    slot.overload()
+                print(f"[Airflow] Batch index failed for {len(papers)} papers: {response.status_code}")
+                return set()
+            
+            # One status line per paper, streamed as the backend finishes each one
+            indexed = set()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                status = json.loads(line)
+                if status.get('success'):
+                    indexed.add(status['arxiv_id'])
+                    print(f"[Airflow] Indexed {status['arxiv_id']}: {status.get('chunks_indexed', 0)} chunks")
+                else:
+                    print(f"[Airflow] Index failed for {status.get('arxiv_id')}: {status.get('error')}")
+            
+            return indexed
+            
+        except (requests.RequestException, ValueError) as e:
+            if isinstance(e, requests.Timeout):
+                slot.overload()
+            print(f"[Airflow] Batch index error for {len(papers)} papers: {e}")
+            return set()
+
+
+def _index_papers(papers, ledger=None):
+    """Index parsed papers using the configured submission mode; returns indexed IDs in order"""
+    done = set()
+    if ledger is not None:
+        states = ledger.states(p['arxiv_id'] for p in papers)
+        done = {arxiv_id for arxiv_id, state in states.items() if state == INDEXED}
+        if done:
+            print(f"[Airflow] Skipping {len(done)} papers already indexed in this run")
+    
+    pending = [paper for paper in papers if paper['arxiv_id'] not in done]
+    indexed = set()
+    
+    if INDEX_SUBMIT_MODE != 'batch':
+        units = [[paper] for paper in pending]
+    else:
+        batch_size = max(1, INDEX_BATCH_SIZE)
+        units = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    
+    def submit(unit):
+        if INDEX_SUBMIT_MODE != 'batch' or _batch_index_unsupported.is_set():
+            return {paper['arxiv_id'] for paper in unit if _index_paper(paper)}
+        
+        batch_indexed = _index_batch(unit)
+        if batch_indexed is None:
+            # Remembered for the rest of the process so later units skip the probe
+            if not _batch_index_unsupported.is_set():
+                _batch_index_unsupported.set()
+                print("[Airflow] Batch index endpoint unavailable, falling back to per-paper requests")
+            return {paper['arxiv_id'] for paper in unit if _index_paper(paper)}
+        return batch_indexed
+    
+    # Requests go out concurrently, up to INDEX_LIMITER's current limit
+    workers = max(1, min(INDEX_LIMITER.max_limit, len(units)))
+    if workers == 1:
+        for unit in units:
+            indexed.update(submit(unit))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for unit_indexed in executor.map(submit, units):
+                indexed.update(unit_indexed)
+    
+    if ledger is not None:
+        for paper in pending:
+            if paper['arxiv_id'] in indexed:
+                ledger.mark(paper['arxiv_id'], INDEXED)
+            else:
+                ledger.mark(paper['arxiv_id'], FAILED, error='index')
+    
+    return [paper['arxiv_id'] for paper in papers if paper['arxiv_id'] in indexed or paper['arxiv_id'] in done]
+
+
 def download_and_parse_papers(**context):
     """Download PDFs and extract full text"""
     ti = context['ti']
@@ -105,27 +743,7 @@ def download_and_parse_papers(**context):
         print("[Airflow] No papers to parse")
         return 0
     
-    parsed_papers = []
-    for paper in papers:
-        try:
-            # Call backend parsing endpoint (uses Docling MCP)
-            response = requests.post(
-                f'{KILIG_BACKEND_URL}/api/papers/parse',
-                json={'arxiv_id': paper['arxiv_id'], 'pdf_url': paper['pdf_url']},
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                parsed = response.json()
-                paper['full_text'] = parsed.get('full_text', '')
-                paper['sections'] = parsed.get('sections', [])
-                parsed_papers.append(paper)
-                print(f"[Airflow] Parsed: {paper['arxiv_id']}")
-            else:
-                print(f"[Airflow] Failed to parse {paper['arxiv_id']}: {response.status_code}")
-                
-        except requests.RequestException as e:
-            print(f"[Airflow] Parse error for {paper['arxiv_id']}: {e}")
+    parsed_papers = _parse_papers(papers, PaperLedger.for_context(context))
     
     ti.xcom_push(key='parsed_papers', value=parsed_papers)
     return len(parsed_papers)
@@ -140,66 +758,290 @@ def index_papers(**context):
         print("[Airflow] No papers to index")
         return {'success': 0, 'failed': 0}
     
-    success_count = 0
-    failed_count = 0
+    indexed_ids = _index_papers(papers, PaperLedger.for_context(context))
+    record_indexed(indexed_ids)
     
-    for paper in papers:
-        try:
-            response = requests.post(
-                f'{KILIG_BACKEND_URL}/api/papers/index',
-                json=paper,
-                timeout=180
-            )
+    result = {'success': len(indexed_ids), 'failed': len(papers) - len(indexed_ids)}
+    ti.xcom_push(key='index_result', value=result)
+    return result
+
+
+def _index_jobs(context):
+    """One index job per parsed paper not yet indexed in this run"""
+    papers = context['ti'].xcom_pull(key='parsed_papers', task_ids='parse_papers') or []
+    states = PaperLedger.for_context(context).states(p['arxiv_id'] for p in papers)
+    return [(paper['arxiv_id'], paper) for paper in papers if states.get(paper['arxiv_id']) != INDEXED]
+
+
+def _complete_index_jobs(context, results):
+    """Checkpoint index job outcomes and publish the same result as index_papers"""
+    ti = context['ti']
+    papers = ti.xcom_pull(key='parsed_papers', task_ids='parse_papers') or []
+    ledger = PaperLedger.for_context(context)
+    
+    for arxiv_id, outcome in results.items():
+        if outcome['status'] == SUCCEEDED:
+            ledger.mark(arxiv_id, INDEXED)
+        else:
+            print(f"[Airflow] Index job failed for {arxiv_id}: {outcome['status']} {outcome.get('error') or ''}")
+            ledger.mark(arxiv_id, FAILED, error=f"index job {outcome['status']}")
+    
+    states = ledger.states(p['arxiv_id'] for p in papers)
+    indexed_ids = [p['arxiv_id'] for p in papers if states.get(p['arxiv_id']) == INDEXED]
+    record_indexed(indexed_ids)
+    
+    result = {'success': len(indexed_ids), 'failed': len(papers) - len(indexed_ids)}
+    ti.xcom_push(key='index_result', value=result)
+    return result
+
+
+def _ingest_pipelined(papers, ledger=None):
+    """
+    Parse and index concurrently: parser threads feed a bounded queue that
+    indexer threads drain in micro-batches, so indexing overlaps with parsing.
+    
+    Returns (parsed_count, indexed_ids).
+    """
+    handoff = queue.Queue(maxsize=max(1, INGEST_QUEUE_SIZE))  # Backpressure on parsers
+    indexed_ids = []
+    indexed_lock = threading.Lock()
+    # Thread counts are upper bounds; the limiters decide how many requests are in flight
+    parsers = max(1, min(PARSE_LIMITER.max_limit, len(papers)))
+    indexers = max(1, INDEX_LIMITER.max_limit)
+    reuse = _reusable_parses(papers, ledger)
+    
+    def produce(paper):
+        parsed = reuse.get(paper['arxiv_id'])
+        if parsed is None:
+            parsed = _parse_paper(paper)
+            _checkpoint_parse(ledger, paper, parsed)
+        if parsed is None:
+            return False
+        handoff.put(parsed)
+        return True
+    
+    def consume():
+        done = False
+        while not done:
+            item = handoff.get()
+            if item is _PIPELINE_DONE:
+                break
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[Airflow] Indexed {paper['arxiv_id']}: {result.get('chunks_indexed', 0)} chunks")
-                success_count += 1
-            else:
-                print(f"[Airflow] Index failed for {paper['arxiv_id']}: {response.status_code}")
-                failed_count += 1
-                
-        except requests.RequestException as e:
-            print(f"[Airflow] Index error for {paper['arxiv_id']}: {e}")
-            failed_count += 1
-    
-    result = {'success': success_count, 'failed': failed_count}
+            # Take whatever else is already waiting, up to one index batch
+            batch = [item]
+            while len(batch) < max(1, INDEX_BATCH_SIZE):
+                try:
+                    item = handoff.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _PIPELINE_DONE:
+                    done = True
+                    break
+                batch.append(item)
+            
+            try:
+                ids = _index_papers(batch, ledger)
+            except Exception as e:
+                # Keep draining so parsers never block on a full queue
+                print(f"[Airflow] Indexer error for {len(batch)} papers: {e}")
+                ids = []
+            
+            with indexed_lock:
+                indexed_ids.extend(ids)
+    
+    print(f"[Airflow] Pipelined ingest of {len(papers)} papers: {parsers} parsers, {indexers} indexers")
+    
+    with ThreadPoolExecutor(max_workers=indexers) as index_pool:
+        consumers = [index_pool.submit(consume) for _ in range(indexers)]
+        
+        try:
+            with ThreadPoolExecutor(max_workers=parsers) as parse_pool:
+                parsed_count = sum(parse_pool.map(produce, papers))
+        finally:
+            # Release the indexers even when a parser raised; its exception
+            # propagates once they have drained the queue and exited
+            for _ in consumers:
+                handoff.put(_PIPELINE_DONE)
+            for consumer in consumers:
+                consumer.result()
+    
+    return parsed_count, indexed_ids
+
+
+def ingest_papers(**context):
+    """Parse and index papers as one pipelined task (INGEST_MODE=pipelined)"""
+    ti = context['ti']
+    papers = ti.xcom_pull(key='new_papers', task_ids='filter_papers')
+    
+    if not papers:
+        print("[Airflow] No papers to ingest")
+        return {'parsed': 0, 'success': 0, 'failed': 0}
+    
+    parsed_count, indexed_ids = _ingest_pipelined(papers, PaperLedger.for_context(context))
+    record_indexed(indexed_ids)
+    
+    result = {'parsed': parsed_count, 'success': len(indexed_ids), 'failed': len(papers) - len(indexed_ids)}
     ti.xcom_push(key='index_result', value=result)
     return result
 
 
+def shard_new_papers(**context):
+    """Split new papers into shards for the mapped parse/index tasks"""
+    ti = context['ti']
+    papers = ti.xcom_pull(key='new_papers', task_ids='filter_papers') or []
+    
+    shard_size = max(1, PAPER_SHARD_SIZE)
+    shards = [papers[i:i + shard_size] for i in range(0, len(papers), shard_size)]
+    
+    print(f"[Airflow] Split {len(papers)} papers into {len(shards)} shards of up to {shard_size}")
+    
+    # One op_kwargs dict per mapped task instance
+    return [{'papers': shard} for shard in shards]
+
+
+def ingest_paper_shard(papers, **context):
+    """Parse and index one shard of papers (mapped task)"""
+    ledger = PaperLedger.for_context(context)
+    
+    if INGEST_MODE == 'pipelined':
+        parsed_count, indexed_ids = _ingest_pipelined(papers, ledger)
+    else:
+        parsed_papers = _parse_papers(papers, ledger)
+        parsed_count = len(parsed_papers)
+        indexed_ids = _index_papers(parsed_papers, ledger)
+    
+    record_indexed(indexed_ids)
+    
+    result = {
+        'papers': len(papers),
+        'parsed': parsed_count,
+        'success': len(indexed_ids),
+        'failed': len(papers) - len(indexed_ids),
+    }
+    
+    print(f"[Airflow] Shard complete: {result}")
+    return result
+
+
+def _send_summary(summary):
+    """Log the ingestion summary and optionally forward it to Slack"""
+    print(f"[Airflow] Ingestion complete: {json.dumps(summary, indent=2)}")
+    
+    # Optional: Send to Slack
+    slack_webhook = os.getenv('SLACK_WEBHOOK_URL')
+    if slack_webhook:
+        try:
+            http_client.post(slack_webhook, json={
+                'text': f"📚 Paper Ingestion Complete\n```{json.dumps(summary, indent=2)}```"
+            })
+        except Exception as e:
+            print(f"[Airflow] Slack notification failed: {e}")
+    
+    return summary
+
+
 def send_completion_notification(**context):
     """Send notification on completion"""
     ti = context['ti']
     
     fetched = ti.xcom_pull(task_ids='fetch_papers') or 0
     filtered = ti.xcom_pull(task_ids='filter_papers') or 0
-    parsed = ti.xcom_pull(task_ids='parse_papers') or 0
-    index_result = ti.xcom_pull(key='index_result', task_ids='index_papers') or {}
+    if INGEST_MODE == 'pipelined':
+        index_result = ti.xcom_pull(key='index_result', task_ids='ingest_papers') or {}
+        parsed = index_result.get('parsed', 0)
+    else:
+        index_result = ti.xcom_pull(key='index_result', task_ids='index_papers') or {}
+        parsed = ti.xcom_pull(task_ids='parse_papers') or 0
     
     summary = {
-        'dag_id': 'paper_ingestion_dag',
+        'dag_id': context['dag'].dag_id,
         'execution_date': str(context['execution_date']),
         'papers_fetched': fetched,
         'papers_new': filtered,
         'papers_parsed': parsed,
         'papers_indexed': index_result.get('success', 0),
         'papers_failed': index_result.get('failed', 0),
+        'ledger': PaperLedger.for_context(context).summary(),
     }
     
-    print(f"[Airflow] Ingestion complete: {json.dumps(summary, indent=2)}")
+    window = ti.xcom_pull(key='partition_window', task_ids='fetch_papers')
+    if window:
+        summary['partition'] = window
     
-    # Optional: Send to Slack
-    slack_webhook = os.getenv('SLACK_WEBHOOK_URL')
-    if slack_webhook:
-        try:
-            requests.post(slack_webhook, json={
-                'text': f"📚 Paper Ingestion Complete\n```{json.dumps(summary, indent=2)}```"
-            })
-        except Exception as e:
-            print(f"[Airflow] Slack notification failed: {e}")
+    return _send_summary(summary)
+
+
+def send_mapped_completion_notification(**context):
+    """Send notification on completion, aggregating mapped shard results"""
+    ti = context['ti']
     
-    return summary
+    fetched = ti.xcom_pull(task_ids='fetch_papers') or 0
+    filtered = ti.xcom_pull(task_ids='filter_papers') or 0
+    # Pulling a mapped task returns one value per successful map index
+    shard_results = [r for r in (ti.xcom_pull(task_ids='ingest_shard') or []) if r]
+    
+    summary = {
+        'dag_id': context['dag'].dag_id,
+        'execution_date': str(context['execution_date']),
+        'papers_fetched': fetched,
+        'papers_new': filtered,
+        'shards_completed': len(shard_results),
+        'papers_parsed': sum(r.get('parsed', 0) for r in shard_results),
+        'papers_indexed': sum(r.get('success', 0) for r in shard_results),
+        'papers_failed': sum(r.get('failed', 0) for r in shard_results),
+        'ledger': PaperLedger.for_context(context).summary(),
+    }
+    
+    return _send_summary(summary)
+
+
+# Local mode reconciles against OpenSearch; backend mode asks the backend
+FILTER_POOL_ARGS = pool_args(OPENSEARCH_POOL if EXISTING_CHECK_MODE == 'local' else BACKEND_POOL)
+
+
+def _build_ingest_tasks(pool=BACKEND_POOL):
+    """Parse/index operators for the configured INGEST_MODE, in dependency order"""
+    ingest_pool_args = pool_args(pool, HEAVY_TASK_SLOTS)
+    
+    if INGEST_MODE == 'pipelined':
+        return [
+            PythonOperator(
+                task_id='ingest_papers',
+                python_callable=ingest_papers,
+                provide_context=True,
+                **ingest_pool_args,
+            ),
+        ]
+    
+    if INDEX_EXECUTION_MODE == 'deferred':
+        # Submits index jobs then frees its worker and pool slots while the triggerer polls
+        index_task = BackendJobsOperator(
+            task_id='index_papers',
+            backend_url=KILIG_BACKEND_URL,
+            job_type='index',
+            build_jobs=_index_jobs,
+            on_complete=_complete_index_jobs,
+            fallback=index_papers,
+            poll_interval=INDEX_JOB_POLL_SECONDS,
+            **ingest_pool_args,
+        )
+    else:
+        index_task = PythonOperator(
+            task_id='index_papers',
+            python_callable=index_papers,
+            provide_context=True,
+            **ingest_pool_args,
+        )
+    
+    return [
+        PythonOperator(
+            task_id='parse_papers',
+            python_callable=download_and_parse_papers,
+            provide_context=True,
+            **ingest_pool_args,
+        ),
+        index_task,
+    ]
 
 
 # DAG Definition
@@ -217,24 +1059,22 @@ with DAG(
     fetch_task = PythonOperator(
         task_id='fetch_papers',
         python_callable=fetch_new_papers,
+        **pool_args(ARXIV_POOL),
         provide_context=True,
     )
     
     filter_task = PythonOperator(
         task_id='filter_papers',
         python_callable=filter_new_papers,
+        **FILTER_POOL_ARGS,
         provide_context=True,
     )
     
-    parse_task = PythonOperator(
-        task_id='parse_papers',
-        python_callable=download_and_parse_papers,
-        provide_context=True,
-    )
+    ingest_tasks = _build_ingest_tasks()
     
-    index_task = PythonOperator(
-        task_id='index_papers',
-        python_callable=index_papers,
+    commit_cursor_task = PythonOperator(
+        task_id='commit_cursor',
+        python_callable=commit_fetch_cursor,
         provide_context=True,
     )
     
@@ -246,4 +1086,108 @@ with DAG(
     )
     
     # Task dependencies
-    fetch_task >> filter_task >> parse_task >> index_task >> notify_task
+    chain(fetch_task, filter_task, *ingest_tasks, commit_cursor_task, notify_task)
+
+
+# Mapped variant: parse+index fanned out over shards of papers so indexing of
+# early shards overlaps with parsing of later ones and retries are per shard
+with DAG(
+    dag_id='paper_ingestion_mapped_dag',
+    default_args=default_args,
+    description='Paper ingestion from ArXiv with per-shard parse/index mapping',
+    schedule_interval=None,  # Manual trigger only
+    start_date=days_ago(1),
+    catchup=False,
+    tags=['ingestion', 'arxiv', 'papers', 'mapped'],
+    max_active_runs=1,
+) as mapped_dag:
+    
+    fetch_task = PythonOperator(
+        task_id='fetch_papers',
+        python_callable=fetch_new_papers,
+        **pool_args(ARXIV_POOL),
+        provide_context=True,
+    )
+    
+    filter_task = PythonOperator(
+        task_id='filter_papers',
+        python_callable=filter_new_papers,
+        **FILTER_POOL_ARGS,
+        provide_context=True,
+    )
+    
+    shard_task = PythonOperator(
+        task_id='shard_papers',
+        python_callable=shard_new_papers,
+        provide_context=True,
+    )
+    
+    ingest_shards = PythonOperator.partial(
+        task_id='ingest_shard',
+        python_callable=ingest_paper_shard,
+        max_active_tis_per_dag=MAX_ACTIVE_SHARDS,
+        **pool_args(BACKEND_POOL, HEAVY_TASK_SLOTS),
+    ).expand(op_kwargs=shard_task.output)
+    
+    commit_cursor_task = PythonOperator(
+        task_id='commit_cursor',
+        python_callable=commit_fetch_cursor,
+        provide_context=True,
+    )
+    
+    notify_task = PythonOperator(
+        task_id='send_notification',
+        python_callable=send_mapped_completion_notification,
+        provide_context=True,
+        trigger_rule='all_done',
+    )
+    
+    fetch_task >> filter_task >> shard_task >> ingest_shards >> commit_cursor_task >> notify_task
+
+
+# Backfill variant: each run ingests one [start, end) submission-date partition
+# (the daily data interval, or params.start/params.end on manual triggers).
+# Partitions run concurrently; parse/index share BACKFILL_POOL (the backend pool
+# by default) so backfill and daily ingestion together stay within its slots, and
+# every fetch_papers task shares the one-slot arXiv pool so concurrent partitions
+# never query arXiv at the same time.
+with DAG(
+    dag_id='paper_backfill_dag',
+    default_args=default_args,
+    description='Date-partitioned historical paper ingestion from ArXiv',
+    schedule_interval='@daily',
+    start_date=datetime.fromisoformat(BACKFILL_START_DATE).replace(tzinfo=timezone.utc),
+    catchup=True,
+    is_paused_upon_creation=True,
+    tags=['ingestion', 'arxiv', 'papers', 'backfill'],
+    max_active_runs=BACKFILL_MAX_ACTIVE_PARTITIONS,
+    params={
+        'start': None,  # Optional ISO start overriding the data interval
+        'end': None,  # Optional ISO end (exclusive)
+    },
+) as backfill_dag:
+    
+    fetch_task = PythonOperator(
+        task_id='fetch_papers',
+        python_callable=fetch_partition_papers,
+        **pool_args(ARXIV_POOL),
+        provide_context=True,
+    )
+    
+    filter_task = PythonOperator(
+        task_id='filter_papers',
+        python_callable=filter_new_papers,
+        **FILTER_POOL_ARGS,
+        provide_context=True,
+    )
+    
+    ingest_tasks = _build_ingest_tasks(pool=BACKFILL_POOL)
+    
+    notify_task = PythonOperator(
+        task_id='send_notification',
+        python_callable=send_completion_notification,
+        provide_context=True,
+        trigger_rule='all_done',
+    )
+    
+    chain(fetch_task, filter_task, *ingest_tasks, notify_task)
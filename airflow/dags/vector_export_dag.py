@@ -0,0 +1,117 @@
+"""
+Vector Export DAG
+
+Exports every chunk embedding plus its metadata from the chunk index into a
+local vector archive (float32 memmap + Parquet chunk table, see
+kilig.vector_archive), using parallel sliced scroll. Archives feed offline
+analysis and index rebuilds that must not call the embedding API.
+Schedule: Weekly on Sunday at 5 AM UTC (or manual trigger)
+"""
+from datetime import timedelta
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from airflow.utils.dates import days_ago
+import os
+import json
+
+from kilig import http_client
+from kilig.http_client import log_http_metrics
+from kilig.pools import HEAVY_TASK_SLOTS, OPENSEARCH_POOL, pool_args
+from kilig.vector_archive import VECTOR_ARCHIVE_KEEP, export_index, prune_archives
+
+# Default arguments
+default_args = {
+    'owner': 'kilig',
+    'depends_on_past': False,
+    'email_on_failure': True,
+    'retries': 1,
+    'retry_delay': timedelta(minutes=30),
+    'execution_timeout': timedelta(hours=6),
+    'on_success_callback': log_http_metrics,
+    'on_failure_callback': log_http_metrics,
+}
+
+# Configuration
+OPENSEARCH_URL = os.getenv('OPENSEARCH_URL', 'http://opensearch:9200')
+OPENSEARCH_INDEX = os.getenv('OPENSEARCH_INDEX', 'arxiv-papers-chunks')
+
+
+def export_vectors(**context):
+    """Export the chunk index into a new archive and prune old ones"""
+    params = context['params']
+    index_name = params.get('index') or OPENSEARCH_INDEX
+    
+    manifest = export_index(OPENSEARCH_URL, index_name, max_slices=params.get('slices') or None)
+    manifest['pruned'] = prune_archives(index_name, keep=VECTOR_ARCHIVE_KEEP)
+    
+    if manifest['rows'] < manifest['expected_rows']:
+        print(f"[VectorExport] Warning: exported {manifest['rows']} of {manifest['expected_rows']} chunks "
+              f"({manifest['skipped']} without a usable embedding)")
+    
+    context['ti'].xcom_push(key='export_manifest', value=manifest)
+    return manifest
+
+
+def send_export_report(**context):
+    """Generate and send export summary report"""
+    ti = context['ti']
+    manifest = ti.xcom_pull(key='export_manifest', task_ids='export_vectors') or {}
+    
+    report = {
+        'execution_date': str(context['execution_date']),
+        'index': manifest.get('index'),
+        'path': manifest.get('path'),
+        'rows': manifest.get('rows', 0),
+        'skipped': manifest.get('skipped', 0),
+        'dimension': manifest.get('dimension'),
+        'embedding_models': manifest.get('embedding_models', {}),
+        'pruned': manifest.get('pruned', []),
+    }
+    
+    print(f"[VectorExport] Report:\n{json.dumps(report, indent=2)}")
+    
+    # Optional Slack notification
+    slack_webhook = os.getenv('SLACK_WEBHOOK_URL')
+    if slack_webhook:
+        try:
+            http_client.post(slack_webhook, json={
+                'text': f"📦 *Vector Export Complete*\n• Vectors: {report['rows']}\n• Archive: {report['path']}"
+            })
+        except Exception as e:
+            print(f"[VectorExport] Slack notification failed: {e}")
+    
+    return report
+
+
+# DAG Definition
+with DAG(
+    dag_id='vector_export_dag',
+    default_args=default_args,
+    description='Export chunk embeddings to a local memory-mapped archive',
+    schedule_interval='0 5 * * 0',  # Weekly on Sunday at 5 AM UTC
+    start_date=days_ago(1),
+    catchup=False,
+    tags=['embeddings', 'export', 'maintenance'],
+    max_active_runs=1,
+    params={
+        'index': '',  # Index or alias to export (default OPENSEARCH_INDEX)
+        'slices': 0,  # Parallel scroll slices (0 = VECTOR_EXPORT_SLICES or one per primary shard)
+    },
+) as dag:
+    
+    export = PythonOperator(
+        task_id='export_vectors',
+        **pool_args(OPENSEARCH_POOL, HEAVY_TASK_SLOTS),
+        python_callable=export_vectors,
+        provide_context=True,
+    )
+    
+    send_report = PythonOperator(
+        task_id='send_report',
+        python_callable=send_export_report,
+        provide_context=True,
+        trigger_rule='all_done',
+    )
+    
+    # Task dependencies
+    export >> send_report
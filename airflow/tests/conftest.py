@@ -0,0 +1,16 @@
+"""Shared pytest setup for the Airflow DAG tests"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# DAG modules and the kilig package are imported the way Airflow loads them
+sys.path.insert(0, str(Path(__file__).parent.parent / 'dags'))
+
+# Throwaway metadata DB for tests that need one; set before Airflow is imported
+os.environ.setdefault(
+    'AIRFLOW__DATABASE__SQL_ALCHEMY_CONN',
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kilig-airflow-'), 'airflow.db')}",
+)
+os.environ.setdefault('AIRFLOW__CORE__LOAD_EXAMPLES', 'False')
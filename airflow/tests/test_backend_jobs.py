@@ -0,0 +1,202 @@
+"""Tests for the backend job operator and trigger"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('airflow')
+requests = pytest.importorskip('requests')
+
+from airflow.exceptions import TaskDeferred
+
+from kilig import backend_jobs
+from kilig.backend_jobs import FAILED, SUCCEEDED, TIMED_OUT, BackendJobTrigger, BackendJobsOperator
+
+BACKEND_URL = 'http://backend.test'
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+    
+    def json(self):
+        return self.body
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} error')
+
+
+class FakeTaskInstance:
+    def __init__(self):
+        self.xcoms = {}
+    
+    def xcom_push(self, key, value):
+        self.xcoms[key] = value
+    
+    def xcom_pull(self, key=None, task_ids=None):
+        return self.xcoms.get(key)
+
+
+def _run_trigger(trigger):
+    """First event the trigger yields"""
+    async def first_event():
+        async for event in trigger.run():
+            return event.payload
+    return asyncio.run(first_event())
+
+
+def _deadline(**delta):
+    return (datetime.now(timezone.utc) + timedelta(**delta)).isoformat()
+
+
+class TestBackendJobTrigger:
+    """Test suite for BackendJobTrigger polling"""
+    
+    def test_polls_until_jobs_succeed(self, monkeypatch):
+        """Running jobs are polled again until they reach a terminal status"""
+        statuses = {'job-1': ['running', SUCCEEDED], 'job-2': [SUCCEEDED]}
+        polls = []
+        
+        def get(url, **kwargs):
+            job_id = url.rsplit('/', 1)[-1]
+            polls.append(job_id)
+            status = statuses[job_id].pop(0)
+            return FakeResponse(200, {'job_id': job_id, 'status': status, 'result': {'chunks': 3}})
+        
+        monkeypatch.setattr(backend_jobs.http_client, 'get', get)
+        trigger = BackendJobTrigger(BACKEND_URL, ['job-1', 'job-2'], _deadline(hours=1), poll_interval=0)
+        
+        payload = _run_trigger(trigger)
+        
+        assert payload == {'results': {
+            'job-1': {'status': SUCCEEDED, 'result': {'chunks': 3}, 'error': None},
+            'job-2': {'status': SUCCEEDED, 'result': {'chunks': 3}, 'error': None},
+        }}
+        assert sorted(polls) == ['job-1', 'job-1', 'job-2']
+    
+    def test_reports_failed_and_missing_jobs(self, monkeypatch):
+        """Failed jobs keep their error; a job the backend lost counts as failed"""
+        def get(url, **kwargs):
+            job_id = url.rsplit('/', 1)[-1]
+            if job_id == 'job-gone':
+                return FakeResponse(404)
+            return FakeResponse(200, {'job_id': job_id, 'status': FAILED, 'error': 'parse error'})
+        
+        monkeypatch.setattr(backend_jobs.http_client, 'get', get)
+        trigger = BackendJobTrigger(BACKEND_URL, ['job-1', 'job-gone'], _deadline(hours=1), poll_interval=0)
+        
+        results = _run_trigger(trigger)['results']
+        
+        assert results['job-1'] == {'status': FAILED, 'result': None, 'error': 'parse error'}
+        assert results['job-gone'] == {'status': FAILED, 'result': None, 'error': 'job not found'}
+    
+    def test_times_out_pending_jobs(self, monkeypatch):
+        """Jobs still running at the deadline are reported as timed out"""
+        def get(url, **kwargs):
+            job_id = url.rsplit('/', 1)[-1]
+            if job_id == 'job-slow':
+                raise requests.ConnectionError('backend unreachable')
+            return FakeResponse(200, {'job_id': job_id, 'status': SUCCEEDED})
+        
+        monkeypatch.setattr(backend_jobs.http_client, 'get', get)
+        trigger = BackendJobTrigger(BACKEND_URL, ['job-1', 'job-slow'], _deadline(seconds=-1), poll_interval=0)
+        
+        results = _run_trigger(trigger)['results']
+        
+        assert results['job-1']['status'] == SUCCEEDED
+        assert results['job-slow'] == {'status': TIMED_OUT, 'result': None, 'error': 'deadline exceeded'}
+    
+    def test_serialize_round_trip(self):
+        """The triggerer can rebuild the trigger from its serialized form"""
+        trigger = BackendJobTrigger(BACKEND_URL, ['job-1'], _deadline(hours=1), poll_interval=5)
+        
+        path, kwargs = trigger.serialize()
+        
+        assert path == 'kilig.backend_jobs.BackendJobTrigger'
+        assert BackendJobTrigger(**kwargs).serialize() == (path, kwargs)
+
+
+class TestBackendJobsOperator:
+    """Test suite for BackendJobsOperator"""
+    
+    def _operator(self, completed, fallback_calls):
+        def fallback(**context):
+            fallback_calls.append(context)
+            return 'sync result'
+        
+        def on_complete(context, results):
+            completed.append(results)
+            return len(results)
+        
+        return BackendJobsOperator(
+            task_id='index_papers',
+            backend_url=BACKEND_URL,
+            job_type='index',
+            build_jobs=lambda context: [('2401.00001', {'arxiv_id': '2401.00001'}), ('2401.00002', {'arxiv_id': '2401.00002'})],
+            on_complete=on_complete,
+            fallback=fallback,
+            poll_interval=0,
+        )
+    
+    @pytest.mark.parametrize('status_code', [404, 405, 501])
+    def test_falls_back_when_backend_has_no_job_api(self, monkeypatch, status_code):
+        """A backend without /api/jobs runs the synchronous path instead of deferring"""
+        monkeypatch.setattr(backend_jobs.http_client, 'post', lambda url, **kwargs: FakeResponse(status_code))
+        completed, fallback_calls = [], []
+        context = {'ti': FakeTaskInstance()}
+        
+        result = self._operator(completed, fallback_calls).execute(context)
+        
+        assert result == 'sync result'
+        assert len(fallback_calls) == 1
+        assert completed == []
+    
+    def test_defers_then_maps_results_to_keys(self, monkeypatch):
+        """Submitted jobs defer to the trigger; results come back keyed by item"""
+        job_ids = iter(['job-1', 'job-2'])
+        monkeypatch.setattr(
+            backend_jobs.http_client, 'post',
+            lambda url, **kwargs: FakeResponse(202, {'job_id': next(job_ids)}),
+        )
+        completed, fallback_calls = [], []
+        operator = self._operator(completed, fallback_calls)
+        context = {'ti': FakeTaskInstance()}
+        
+        with pytest.raises(TaskDeferred) as excinfo:
+            operator.execute(context)
+        
+        assert excinfo.value.trigger.job_ids == ['job-1', 'job-2']
+        assert excinfo.value.method_name == 'execute_complete'
+        
+        event = {'results': {
+            'job-1': {'status': SUCCEEDED, 'result': None, 'error': None},
+            'job-2': {'status': TIMED_OUT, 'result': None, 'error': 'deadline exceeded'},
+        }}
+        assert operator.execute_complete(context, event) == 2
+        assert completed == [{
+            '2401.00001': {'status': SUCCEEDED, 'result': None, 'error': None},
+            '2401.00002': {'status': TIMED_OUT, 'result': None, 'error': 'deadline exceeded'},
+        }]
+        assert fallback_calls == []
+    
+    def test_submit_errors_are_reported_as_failed(self, monkeypatch):
+        """Items whose submission failed are completed as failures alongside the jobs"""
+        def post(url, json=None, **kwargs):
+            if json['payload']['arxiv_id'] == '2401.00002':
+                return FakeResponse(500)
+            return FakeResponse(202, {'job_id': 'job-1'})
+        
+        monkeypatch.setattr(backend_jobs.http_client, 'post', post)
+        completed, fallback_calls = [], []
+        operator = self._operator(completed, fallback_calls)
+        context = {'ti': FakeTaskInstance()}
+        
+        with pytest.raises(TaskDeferred):
+            operator.execute(context)
+        operator.execute_complete(context, {'results': {'job-1': {'status': SUCCEEDED, 'result': None, 'error': None}}})
+        
+        assert completed[0]['2401.00001']['status'] == SUCCEEDED
+        assert completed[0]['2401.00002']['status'] == FAILED
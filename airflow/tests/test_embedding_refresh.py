@@ -0,0 +1,118 @@
+"""Tests for embedding refresh paper selection and resume"""
+
+import pytest
+
+pytest.importorskip('airflow')
+
+import embedding_refresh_dag as refresh
+from kilig.ledger import PaperLedger
+
+
+class FakeTaskInstance:
+    def __init__(self):
+        self.xcoms = {}
+    
+    def xcom_push(self, key, value):
+        self.xcoms[key] = value
+    
+    def xcom_pull(self, key=None, task_ids=None):
+        return self.xcoms.get(key)
+
+
+@pytest.fixture
+def ledger_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'ledger.sqlite')
+    monkeypatch.setattr(refresh.PaperLedger, 'for_context', classmethod(lambda cls, context: cls('refresh', context['run_id'], path)))
+    yield path
+    PaperLedger('refresh', 'any', path).close()
+
+
+def _context(run_id, **params):
+    return {'run_id': run_id, 'params': {'new_model': 'model-b', **params}, 'ti': FakeTaskInstance()}
+
+
+def _interrupted_run(path):
+    """run-0: an in-place refresh to model-b that stopped after its first batch"""
+    ledger = PaperLedger('refresh', 'run-0', path)
+    ledger.record_fetched(['2401.00001', '2401.00002', '2401.00003'])
+    ledger.mark('2401.00001', refresh.INDEXED)
+    ledger.save_cursor({
+        'target_model': 'model-b', 'mode': 'in_place', 'source_run': None, 'papers_total': 3,
+        'batch_size': 1, 'batches_done': 1, 'failed_ids': [], 'carried_failures': [],
+    })
+
+
+class TestGetPapersToRefresh:
+    """Test suite for get_papers_to_refresh"""
+    
+    def test_resumes_unfinished_run_by_default(self, ledger_path):
+        """Without a selection the interrupted run's remaining papers are picked up"""
+        _interrupted_run(ledger_path)
+        
+        result = refresh.get_papers_to_refresh(**_context('run-1'))
+        
+        assert result['source_run'] == 'run-0'
+        assert result['papers'] == ['2401.00002', '2401.00003']
+    
+    def test_explicit_selection_is_not_replaced_by_resume(self, ledger_path):
+        """arxiv_ids wins over an unfinished run, which stays resumable"""
+        _interrupted_run(ledger_path)
+        
+        result = refresh.get_papers_to_refresh(**_context('run-1', arxiv_ids=['2402.00002', '2402.00001']))
+        
+        assert result['source_run'] is None
+        assert result['papers'] == ['2402.00001', '2402.00002']
+        assert 'resumed_by' not in PaperLedger('refresh', 'run-0', ledger_path).load_cursor()
+    
+    def test_refresh_all_is_not_replaced_by_resume(self, ledger_path, monkeypatch):
+        """refresh_all selects every indexed paper even with an unfinished run"""
+        _interrupted_run(ledger_path)
+        monkeypatch.setattr(refresh, 'iter_paper_ids', lambda url, index, query=None: iter(['2403.00001']))
+        
+        result = refresh.get_papers_to_refresh(**_context('run-1', refresh_all=True))
+        
+        assert result['papers'] == ['2403.00001']
+    
+    def test_retry_failed_picks_the_last_run_of_the_same_mode(self, ledger_path):
+        """An in-place retry ignores failures of a later rebuild to the same model"""
+        for run_id, mode, failed_id in [('run-0', 'in_place', '2401.00002'), ('run-1', 'blue_green', '2401.00009')]:
+            ledger = PaperLedger('refresh', run_id, ledger_path)
+            ledger.record_fetched(['2401.00001', failed_id])
+            ledger.mark('2401.00001', refresh.INDEXED)
+            ledger.mark(failed_id, refresh.FAILED, error='embedding quota')
+            ledger.save_cursor({
+                'target_model': 'model-b', 'mode': mode, 'source_run': None, 'papers_total': 2,
+                'batch_size': 2, 'batches_done': 1, 'failed_ids': [failed_id], 'carried_failures': [],
+            }, complete=True)
+        
+        result = refresh.get_papers_to_refresh(**_context('run-2', retry_failed=True))
+        
+        assert result['papers'] == ['2401.00002']
+
+
+class TestRunCompletion:
+    """Test suite for marking refresh runs complete"""
+    
+    def test_empty_run_is_not_resumed_later(self, ledger_path, monkeypatch):
+        """A run that found nothing to refresh is complete, not resumable"""
+        monkeypatch.setattr(refresh, 'iter_paper_ids', lambda url, index, query=None: iter([]))
+        context = _context('run-1')
+        refresh.get_papers_to_refresh(**context)
+        
+        assert refresh.process_paper_batch(**context) == {'processed': 0, 'failed': 0}
+        assert PaperLedger('refresh', 'run-2', ledger_path).previous_run(incomplete_only=True) is None
+    
+    def test_deferred_completion_marks_run_complete(self, ledger_path):
+        """Finished reindex jobs complete the cursor, keeping failures for retry_failed"""
+        context = _context('run-1', arxiv_ids=['2401.00001', '2401.00002'])
+        refresh.get_papers_to_refresh(**context)
+        
+        result = refresh._complete_reindex_jobs(context, {
+            '2401.00001': {'status': refresh.SUCCEEDED, 'result': None, 'error': None},
+            '2401.00002': {'status': 'failed', 'result': None, 'error': 'embedding quota'},
+        })
+        
+        ledger = PaperLedger('refresh', 'run-1', ledger_path)
+        assert result == {'processed': 1, 'failed': 1, 'total': 2}
+        assert ledger.load_cursor()['failed_ids'] == ['2401.00002']
+        assert PaperLedger('refresh', 'run-2', ledger_path).previous_run(incomplete_only=True) is None
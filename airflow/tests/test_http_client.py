@@ -0,0 +1,149 @@
+"""Tests for the shared HTTP client"""
+
+from types import SimpleNamespace
+import time
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from kilig import http_client
+from kilig.throttle import AdaptiveLimiter
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """Plays back queued status codes or exceptions, one per request sent"""
+    
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.sent = []
+    
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = b'{}'
+        response.request = request
+        response.url = request.url
+        return response
+    
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Empty session and stats registries; backoff sleeps are recorded, not slept"""
+    sleeps = []
+    monkeypatch.setattr(http_client, '_sessions', {})
+    monkeypatch.setattr(http_client, '_stats', {})
+    monkeypatch.setattr(http_client, 'time', SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append))
+    return sleeps
+
+
+def _serve(url, outcomes):
+    adapter = FakeAdapter(outcomes)
+    http_client.get_session(url).mount('http://', adapter)
+    return adapter
+
+
+class TestSessions:
+    """Test suite for per-base-URL session pooling"""
+    
+    def test_one_session_per_base_url(self):
+        session = http_client.get_session('http://opensearch:9200/arxiv-papers-chunks/_search')
+        
+        assert http_client.get_session('http://opensearch:9200/_bulk?refresh=false') is session
+        assert http_client.get_session('http://opensearch:9201/_bulk') is not session
+        assert http_client.get_session('http://backend:8000/api/v1/health') is not session
+    
+    def test_requests_reuse_the_pooled_session(self):
+        adapter = _serve('http://backend:8000', [200, 200])
+        
+        http_client.get('http://backend:8000/api/v1/health')
+        http_client.post('http://backend:8000/api/v1/papers/index', json={})
+        
+        assert [r.method for r in adapter.sent] == ['GET', 'POST']
+
+
+class TestRetries:
+    """Test suite for retry and backoff"""
+    
+    def test_retries_retryable_statuses_with_backoff(self, fresh_state):
+        adapter = _serve('http://backend:8000', [503, 502, 200])
+        
+        response = http_client.get('http://backend:8000/api/v1/health')
+        
+        assert response.status_code == 200
+        assert len(adapter.sent) == 3
+        assert len(fresh_state) == 2
+        assert fresh_state[0] <= http_client.HTTP_BACKOFF_BASE
+        assert fresh_state[1] <= http_client.HTTP_BACKOFF_BASE * 2
+    
+    def test_honours_retry_after(self, fresh_state):
+        _serve('http://backend:8000', [(429, {'Retry-After': '7'}), 200])
+        
+        assert http_client.get('http://backend:8000/api/v1/health').status_code == 200
+        assert fresh_state == [7.0]
+    
+    def test_returns_last_response_when_retries_run_out(self, fresh_state):
+        adapter = _serve('http://backend:8000', [503] * (http_client.HTTP_MAX_RETRIES + 1))
+        
+        assert http_client.get('http://backend:8000/api/v1/health').status_code == 503
+        assert len(adapter.sent) == http_client.HTTP_MAX_RETRIES + 1
+    
+    def test_connection_errors_are_retried_then_raised(self):
+        adapter = _serve('http://backend:8000', [requests.ConnectionError('refused')] * (http_client.HTTP_MAX_RETRIES + 1))
+        
+        with pytest.raises(requests.ConnectionError):
+            http_client.get('http://backend:8000/api/v1/health')
+        assert len(adapter.sent) == http_client.HTTP_MAX_RETRIES + 1
+    
+    def test_read_timeouts_are_not_retried(self):
+        """The server may already have processed the call"""
+        adapter = _serve('http://backend:8000', [requests.ReadTimeout('slow'), 200])
+        
+        with pytest.raises(requests.ReadTimeout):
+            http_client.post('http://backend:8000/api/v1/papers/index', json={})
+        assert len(adapter.sent) == 1
+    
+    def test_no_retry_when_disabled_or_body_is_a_stream(self):
+        adapter = _serve('http://opensearch:9200', [503, 503, 200])
+        
+        assert http_client.post('http://opensearch:9200/_bulk', data=b'{}', retry=False).status_code == 503
+        assert http_client.post('http://opensearch:9200/_bulk', data=iter([b'{}\n'])).status_code == 503
+        assert len(adapter.sent) == 2
+    
+    def test_backoff_is_capped(self, monkeypatch):
+        monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+        
+        assert http_client._backoff(2) == http_client.HTTP_BACKOFF_BASE * 4
+        assert http_client._backoff(30) == http_client.HTTP_BACKOFF_MAX
+        assert http_client._backoff(0, retry_after='3600') == http_client.HTTP_BACKOFF_MAX
+
+
+class TestInstrumentation:
+    """Test suite for latency stats and limiter signals"""
+    
+    def test_attempts_recorded_under_collapsed_endpoint(self):
+        _serve('http://backend:8000', [503, 200])
+        
+        http_client.get('http://backend:8000/papers/2401.00001/chunks')
+        
+        stats = http_client.latency_snapshot()['GET backend:8000/papers/{id}/chunks']
+        assert stats['count'] == 2
+        assert stats['outcomes'] == {'503': 1, '200': 1}
+    
+    def test_overload_responses_shrink_the_limiter(self):
+        limiter = AdaptiveLimiter('backend-test', initial=4, max_limit=4, decrease=0.5)
+        _serve('http://backend:8000', [503, 200])
+        
+        http_client.get('http://backend:8000/api/v1/health', limiter=limiter)
+        
+        assert limiter.limit == 2
@@ -0,0 +1,81 @@
+"""Tests for the versioned index helpers"""
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from kilig import index_versions
+
+OPENSEARCH_URL = 'http://opensearch.test'
+# 2024-03-01T12:00:00Z
+CREATED_MS = '1709294400000'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body if body is not None else {'acknowledged': True}
+    
+    def json(self):
+        return self.body
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} error')
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    """Fake cluster holding a legacy concrete index named like the alias; records every call"""
+    calls = []
+    state = {'aliases_status': 200}
+    
+    def request(method, url, json=None, params=None, **kwargs):
+        path = url[len(OPENSEARCH_URL):]
+        calls.append((method, path, json))
+        if method == 'GET' and path == '/_alias/chunks':
+            return FakeResponse(404, {})
+        if method == 'HEAD' and path == '/chunks':
+            return FakeResponse(200)
+        if method == 'GET' and path == '/chunks/_settings':
+            return FakeResponse(body={'chunks': {'settings': {'index.creation_date': CREATED_MS}}})
+        if method == 'POST' and path == '/_aliases':
+            return FakeResponse(state['aliases_status'])
+        return FakeResponse()
+    
+    monkeypatch.setattr(index_versions.http_client, 'request', request)
+    monkeypatch.setattr(index_versions.http_client, 'get', lambda url, **kwargs: request('GET', url, **kwargs))
+    monkeypatch.setattr(index_versions.http_client, 'post', lambda url, **kwargs: request('POST', url, **kwargs))
+    return calls, state
+
+
+class TestSwapAlias:
+    """Test suite for swap_alias"""
+    
+    def test_legacy_index_is_cloned_before_removal(self, opensearch):
+        """The concrete index is kept as a versioned clone, not just deleted"""
+        calls, _state = opensearch
+        
+        previous = index_versions.swap_alias(OPENSEARCH_URL, 'chunks', 'chunks-v20240401000000')
+        
+        assert previous == ['chunks-v20240301120000']
+        writes = [(method, path, body) for method, path, body in calls if method in ('PUT', 'POST')]
+        assert writes == [
+            ('PUT', '/chunks/_settings', {'index.blocks.write': True}),
+            ('POST', '/chunks/_clone/chunks-v20240301120000', None),
+            ('PUT', '/chunks-v20240301120000/_settings', {'index.blocks.write': None}),
+            ('POST', '/_aliases', {'actions': [
+                {'add': {'index': 'chunks-v20240401000000', 'alias': 'chunks', 'is_write_index': True}},
+                {'remove_index': {'index': 'chunks'}},
+            ]}),
+        ]
+    
+    def test_failed_swap_unblocks_legacy_index(self, opensearch):
+        """If the alias request fails the legacy index accepts writes again"""
+        calls, state = opensearch
+        state['aliases_status'] = 500
+        
+        with pytest.raises(requests.HTTPError):
+            index_versions.swap_alias(OPENSEARCH_URL, 'chunks', 'chunks-v20240401000000')
+        
+        assert calls[-1] == ('PUT', '/chunks/_settings', {'index.blocks.write': None})
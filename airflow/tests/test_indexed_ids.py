@@ -0,0 +1,161 @@
+"""Tests for the local indexed arXiv ID set"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('requests')
+
+from kilig import indexed_ids
+from kilig.indexed_ids import BloomFilter, IndexedIdSet, load_or_reconcile, record_indexed
+
+
+@pytest.fixture(autouse=True)
+def small_bloom(monkeypatch):
+    monkeypatch.setattr(indexed_ids, 'BLOOM_CAPACITY', 1000)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'data' / 'indexed_ids')
+
+
+@pytest.fixture
+def opensearch_ids(monkeypatch):
+    """IDs the fake index returns; each reconcile is logged"""
+    ids = ['2401.00001', '2401.00002']
+    calls = []
+    
+    def iter_paper_ids(opensearch_url, index_name):
+        calls.append(index_name)
+        return iter(ids)
+    
+    monkeypatch.setattr(indexed_ids, 'iter_paper_ids', iter_paper_ids)
+    return calls
+
+
+def _ids(count, prefix='2401'):
+    return [f'{prefix}.{i:05d}' for i in range(count)]
+
+
+class TestBloomFilter:
+    """Test suite for BloomFilter"""
+    
+    def test_no_false_negatives(self):
+        bloom = BloomFilter.for_capacity(1000, 0.001)
+        for arxiv_id in _ids(1000):
+            bloom.add(arxiv_id)
+        
+        assert all(arxiv_id in bloom for arxiv_id in _ids(1000))
+    
+    def test_false_positive_rate_near_target(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        for arxiv_id in _ids(1000):
+            bloom.add(arxiv_id)
+        
+        false_positives = sum(arxiv_id in bloom for arxiv_id in _ids(10000, prefix='2402'))
+        assert false_positives < 300
+    
+    def test_round_trips_through_bytes(self):
+        bloom = BloomFilter.for_capacity(100, 0.01)
+        bloom.add('2401.00001')
+        
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        
+        assert (restored.num_bits, restored.num_hashes) == (bloom.num_bits, bloom.num_hashes)
+        assert '2401.00001' in restored
+
+
+class TestIndexedIdSet:
+    """Test suite for IndexedIdSet membership and persistence"""
+    
+    def test_membership_is_exact_despite_bloom_false_positives(self):
+        """A Bloom hit is confirmed against the sorted list"""
+        id_set = IndexedIdSet(['2401.00002', '2401.00001'])
+        id_set.bloom.bits = bytearray(b'\xff' * len(id_set.bloom.bits))
+        
+        assert '2401.00001' in id_set
+        assert '2401.00003' not in id_set
+        assert '2401.00000' not in id_set
+    
+    def test_add_many_keeps_ids_sorted_and_counts_new_ones(self):
+        id_set = IndexedIdSet(['2401.00003'])
+        
+        assert id_set.add_many(['2401.00001', '2401.00003', '2401.00002']) == 2
+        assert id_set.ids == ['2401.00001', '2401.00002', '2401.00003']
+        assert '2401.00002' in id_set
+    
+    def test_save_and_load(self, path):
+        IndexedIdSet(['2401.00002', '2401.00001'], reconciled_at='2024-01-02T00:00:00').save(path)
+        
+        loaded = IndexedIdSet.load(path)
+        
+        assert loaded.ids == ['2401.00001', '2401.00002']
+        assert loaded.reconciled_at == '2024-01-02T00:00:00'
+        assert '2401.00001' in loaded and '2401.00003' not in loaded
+    
+    def test_lost_bloom_is_rebuilt_from_ids(self, path):
+        IndexedIdSet(['2401.00001']).save(path)
+        os.remove(f'{path}.bloom')
+        
+        assert '2401.00001' in IndexedIdSet.load(path)
+    
+    def test_load_missing_returns_none(self, path):
+        assert IndexedIdSet.load(path) is None
+
+
+class TestReconcile:
+    """Test suite for refreshing the persisted set"""
+    
+    def test_missing_set_is_reconciled(self, path, opensearch_ids):
+        id_set = load_or_reconcile('http://opensearch', 'chunks', path)
+        
+        assert opensearch_ids == ['chunks']
+        assert id_set.ids == ['2401.00001', '2401.00002']
+        assert IndexedIdSet.load(path).ids == id_set.ids
+    
+    def test_fresh_set_is_reused(self, path, opensearch_ids):
+        IndexedIdSet(['2401.00009'], reconciled_at=datetime.utcnow().isoformat()).save(path)
+        
+        assert load_or_reconcile('http://opensearch', 'chunks', path).ids == ['2401.00009']
+        assert opensearch_ids == []
+    
+    def test_stale_set_is_reconciled(self, path, opensearch_ids):
+        stale = datetime.utcnow() - timedelta(hours=indexed_ids.INDEXED_IDS_RECONCILE_HOURS + 1)
+        IndexedIdSet(['2401.00009'], reconciled_at=stale.isoformat()).save(path)
+        
+        assert load_or_reconcile('http://opensearch', 'chunks', path).ids == ['2401.00001', '2401.00002']
+        assert opensearch_ids == ['chunks']
+
+
+class TestRecordIndexed:
+    """Test suite for record_indexed under the file lock"""
+    
+    def test_waits_for_the_lock(self, path):
+        """An update started while another task holds the lock lands after it"""
+        with indexed_ids._locked(path):
+            writer = threading.Thread(target=record_indexed, args=(['2401.00001'],), kwargs={'path': path})
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()
+            assert IndexedIdSet.load(path) is None
+        
+        writer.join(5)
+        assert IndexedIdSet.load(path).ids == ['2401.00001']
+    
+    def test_concurrent_updates_are_not_lost(self, path):
+        batches = [_ids(20, prefix=f'24{i:02d}') for i in range(8)]
+        threads = [threading.Thread(target=record_indexed, args=(batch,), kwargs={'path': path}) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        
+        assert IndexedIdSet.load(path).ids == sorted(arxiv_id for batch in batches for arxiv_id in batch)
+    
+    def test_reports_only_new_ids(self, path):
+        assert record_indexed(['2401.00001', '2401.00002'], path=path) == 2
+        assert record_indexed(['2401.00002', '2401.00003'], path=path) == 1
+        assert record_indexed([], path=path) == 0
@@ -0,0 +1,36 @@
+"""Tests for the paper state ledger"""
+
+from kilig.ledger import FAILED, INDEXED, PARSED, PaperLedger
+
+
+class TestPaperLedger:
+    """Test suite for PaperLedger"""
+    
+    def test_ledgers_share_one_connection_per_file(self, tmp_path):
+        """Constructing a ledger per task call does not open a new connection"""
+        path = str(tmp_path / 'ledger.sqlite')
+        first = PaperLedger('dag', 'run-1', path)
+        second = PaperLedger('dag', 'run-2', path)
+        
+        assert first._conn is second._conn
+        first.close()
+    
+    def test_close_reopens_on_next_use(self, tmp_path):
+        """A closed connection is replaced instead of reused"""
+        path = str(tmp_path / 'ledger.sqlite')
+        ledger = PaperLedger('dag', 'run-1', path)
+        ledger.mark('2401.00001', INDEXED)
+        ledger.close()
+        
+        reopened = PaperLedger('dag', 'run-1', path)
+        assert reopened.states(['2401.00001']) == {'2401.00001': INDEXED}
+        reopened.close()
+    
+    def test_failure_keeps_stored_payload(self, tmp_path):
+        """Marking a parsed paper failed leaves its payload loadable"""
+        ledger = PaperLedger('dag', 'run-1', str(tmp_path / 'ledger.sqlite'))
+        ledger.mark('2401.00001', PARSED, payload={'full_text': 'text'})
+        ledger.mark('2401.00001', FAILED, error='index')
+        
+        assert ledger.load_payloads(['2401.00001']) == {'2401.00001': {'full_text': 'text'}}
+        ledger.close()
@@ -0,0 +1,165 @@
+"""Tests for the OAI-PMH harvester"""
+
+import io
+
+import pytest
+
+pytest.importorskip('requests')
+
+from kilig import oai_harvester
+from kilig.oai_harvester import OaiError, OaiHarvester
+
+
+def _record(arxiv_id, datestamp, categories='cs.AI', deleted=False):
+    if deleted:
+        return (f'<record><header status="deleted"><identifier>oai:arXiv.org:{arxiv_id}</identifier>'
+                f'<datestamp>{datestamp}</datestamp></header></record>')
+    return f'''<record>
+      <header><identifier>oai:arXiv.org:{arxiv_id}</identifier><datestamp>{datestamp}</datestamp></header>
+      <metadata>
+        <arXiv xmlns="http://arxiv.org/OAI/arXiv/">
+          <id>{arxiv_id}</id>
+          <created>2024-01-02</created>
+          <authors>
+            <author><keyname>Lovelace</keyname><forenames>Ada</forenames></author>
+            <author><keyname>Turing</keyname></author>
+          </authors>
+          <title>Paper
+            {arxiv_id}</title>
+          <categories>{categories}</categories>
+          <abstract>  An abstract.  </abstract>
+        </arXiv>
+      </metadata>
+    </record>'''
+
+
+def _page(records, token=None):
+    token_xml = '' if token is None else f'<resumptionToken cursor="0">{token}</resumptionToken>'
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <responseDate>2024-01-03T00:00:00Z</responseDate>
+  <ListRecords>{''.join(records)}{token_xml}</ListRecords>
+</OAI-PMH>'''.encode('utf-8')
+
+
+def _error(code):
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <error code="{code}">details</error>
+</OAI-PMH>'''.encode('utf-8')
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+        self.closed = False
+    
+    def raise_for_status(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+
+
+# Two pages: three records (one deleted) then two, the last page with an empty token
+PAGES = {
+    None: _page([
+        _record('2401.00001', '2024-01-02'),
+        _record('2401.00002', '2024-01-02', deleted=True),
+        _record('2401.00003', '2024-01-03', categories='cs.CL cs.AI'),
+    ], token='page-2'),
+    'page-2': _page([
+        _record('2401.00004', '2024-01-04'),
+        _record('2401.00005', '2024-01-05'),
+    ], token=''),
+}
+
+
+@pytest.fixture
+def requests_made(monkeypatch):
+    """Serve PAGES by resumption token and record every request's params"""
+    made = []
+    
+    def get(url, params=None, **kwargs):
+        made.append(params)
+        return FakeResponse(PAGES[params.get('resumptionToken')])
+    
+    monkeypatch.setattr(oai_harvester.http_client, 'get', get)
+    return made
+
+
+class TestOaiHarvester:
+    """Test suite for OaiHarvester"""
+    
+    def test_pages_through_resumption_tokens(self, requests_made):
+        """Records from every page are parsed and the list is marked complete"""
+        harvester = OaiHarvester('https://oai.example/oai', set_spec='cs')
+        
+        records = list(harvester.iter_records(from_date='2024-01-01'))
+        
+        assert [r['arxiv_id'] for r in records] == ['2401.00001', '2401.00003', '2401.00004', '2401.00005']
+        assert harvester.complete
+        assert requests_made == [
+            {'verb': 'ListRecords', 'metadataPrefix': 'arXiv', 'set': 'cs', 'from': '2024-01-01'},
+            {'verb': 'ListRecords', 'resumptionToken': 'page-2'},
+        ]
+    
+    def test_parses_record_fields(self, requests_made):
+        """Whitespace is normalised and author names are joined"""
+        record = next(OaiHarvester('https://oai.example/oai').iter_records())
+        
+        assert record == {
+            'arxiv_id': '2401.00001',
+            'title': 'Paper 2401.00001',
+            'abstract': 'An abstract.',
+            'authors': ['Ada Lovelace', 'Turing'],
+            'categories': ['cs.AI'],
+            'created': '2024-01-02',
+            'datestamp': '2024-01-02',
+        }
+    
+    def test_position_tracks_last_yielded_record(self, requests_made):
+        """page_token/page_offset point at the record last yielded, counting deleted ones"""
+        harvester = OaiHarvester('https://oai.example/oai')
+        records = harvester.iter_records()
+        
+        next(records)
+        assert (harvester.page_token, harvester.page_offset) == (None, 1)
+        next(records)
+        assert (harvester.page_token, harvester.page_offset) == (None, 3)
+        next(records)
+        assert (harvester.page_token, harvester.page_offset) == ('page-2', 1)
+        assert not harvester.complete
+    
+    def test_resumes_from_token_and_offset(self, requests_made):
+        """A saved position resumes with the token and skips records already yielded"""
+        harvester = OaiHarvester('https://oai.example/oai')
+        
+        records = list(harvester.iter_records(from_date='2024-01-01', resumption_token='page-2', skip=1))
+        
+        assert [r['arxiv_id'] for r in records] == ['2401.00005']
+        assert requests_made == [{'verb': 'ListRecords', 'resumptionToken': 'page-2'}]
+    
+    def test_skip_applies_to_first_page_only(self, requests_made):
+        """page_offset skips within the resumed page, not on later pages"""
+        harvester = OaiHarvester('https://oai.example/oai')
+        
+        records = list(harvester.iter_records(skip=2))
+        
+        assert [r['arxiv_id'] for r in records] == ['2401.00003', '2401.00004', '2401.00005']
+    
+    def test_no_records_match_is_empty(self, monkeypatch):
+        """noRecordsMatch ends the harvest without an error"""
+        monkeypatch.setattr(oai_harvester.http_client, 'get', lambda url, **kwargs: FakeResponse(_error('noRecordsMatch')))
+        harvester = OaiHarvester('https://oai.example/oai')
+        
+        assert list(harvester.iter_records(from_date='2030-01-01')) == []
+        assert harvester.complete
+    
+    def test_protocol_error_raises(self, monkeypatch):
+        """Other OAI errors surface with their code"""
+        monkeypatch.setattr(oai_harvester.http_client, 'get', lambda url, **kwargs: FakeResponse(_error('badResumptionToken')))
+        
+        with pytest.raises(OaiError) as excinfo:
+            list(OaiHarvester('https://oai.example/oai').iter_records(resumption_token='expired'))
+        assert excinfo.value.code == 'badResumptionToken'
@@ -0,0 +1,241 @@
+"""Tests for the paper ingestion DAG helpers"""
+
+import threading
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('airflow')
+pytest.importorskip('arxiv')
+
+import requests
+
+import paper_ingestion_dag as ingestion
+from kilig.ledger import PaperLedger
+from kilig.paper_ids import normalize_arxiv_id
+
+
+def _papers(count):
+    return [{'arxiv_id': f'2401.{i:05d}', 'pdf_url': f'https://arxiv.org/pdf/2401.{i:05d}'} for i in range(count)]
+
+
+def _run_with_timeout(target, timeout=10):
+    """Run target in a thread; returns (finished, result, exception)"""
+    outcome = {}
+    
+    def run():
+        try:
+            outcome['result'] = target()
+        except BaseException as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get('result'), outcome.get('error')
+
+
+class TestIngestPipelined:
+    """Test suite for the parse/index pipeline"""
+    
+    @pytest.fixture(autouse=True)
+    def no_backend(self, monkeypatch):
+        monkeypatch.setattr(ingestion, 'INGEST_QUEUE_SIZE', 2)
+        monkeypatch.setattr(ingestion, '_reusable_parses', lambda papers, ledger: {})
+        monkeypatch.setattr(ingestion, '_checkpoint_parse', lambda ledger, paper, parsed: None)
+        monkeypatch.setattr(ingestion, '_index_papers', lambda batch, ledger=None: [p['arxiv_id'] for p in batch])
+    
+    def test_indexes_every_parsed_paper(self, monkeypatch):
+        """Every parsed paper reaches the indexers"""
+        monkeypatch.setattr(ingestion, '_parse_paper', lambda paper: dict(paper, full_text='text'))
+        papers = _papers(12)
+        
+        finished, result, error = _run_with_timeout(lambda: ingestion._ingest_pipelined(papers))
+        
+        assert finished and error is None
+        parsed_count, indexed_ids = result
+        assert parsed_count == 12
+        assert sorted(indexed_ids) == [p['arxiv_id'] for p in papers]
+    
+    def test_producer_error_releases_consumers_and_reraises(self, monkeypatch):
+        """A raising parser must not leave the indexers blocked on the queue"""
+        def parse(paper):
+            if paper['arxiv_id'] == '2401.00003':
+                raise RuntimeError('parser crashed')
+            return dict(paper, full_text='text')
+        
+        monkeypatch.setattr(ingestion, '_parse_paper', parse)
+        
+        finished, _result, error = _run_with_timeout(lambda: ingestion._ingest_pipelined(_papers(12)))
+        
+        assert finished, 'pipeline hung after a producer error'
+        assert isinstance(error, RuntimeError)
+        assert str(error) == 'parser crashed'
+
+
+class TestReusableParses:
+    """Test suite for parse checkpoint reuse"""
+    
+    def test_reuses_payload_after_index_failure(self, tmp_path):
+        """A paper that parsed but failed to index is not parsed again"""
+        ledger = PaperLedger('dag', 'run-1', str(tmp_path / 'ledger.sqlite'))
+        ledger.mark('2401.00001', ingestion.PARSED, payload={'arxiv_id': '2401.00001', 'full_text': 'text'})
+        ledger.mark('2401.00001', ingestion.FAILED, error='index')
+        ledger.mark('2401.00002', ingestion.FAILED, error='parse')
+        
+        reuse = ingestion._reusable_parses(_papers(3), ledger)
+        
+        assert list(reuse) == ['2401.00001']
+        ledger.close()
+
+
+def _feed(ids, total):
+    entries = ''.join(
+        f'''<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id>
+          <updated>2024-01-02T00:00:00Z</updated><published>2024-01-02T00:00:00Z</published>
+          <title>Paper {arxiv_id}</title><summary>An abstract.</summary><author><name>Ada Lovelace</name></author>
+          <arxiv:primary_category term="cs.AI"/><category term="cs.AI"/></entry>'''
+        for arxiv_id in ids
+    )
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/"
+      xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <opensearch:totalResults>{total}</opensearch:totalResults>{entries}
+</feed>'''.encode('utf-8')
+
+
+class FakeArxivAdapter(requests.adapters.BaseAdapter):
+    """Serves queued feed pages by start offset and logs every request it receives"""
+    
+    def __init__(self, pages, events):
+        super().__init__()
+        self.pages = pages
+        self.events = events
+    
+    def send(self, request, **kwargs):
+        start = int(parse_qs(urlparse(request.url).query)['start'][0])
+        self.events.append(f'request {start}')
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.pages[start].pop(0)
+        response.request = request
+        response.url = request.url
+        return response
+    
+    def close(self):
+        pass
+
+
+class TestRateLimitedArxivClient:
+    """Test suite for the shared-bucket arXiv client wrapper"""
+    
+    def test_takes_one_token_per_request(self):
+        """Every page request and retry takes a token first; nothing is charged after the last page"""
+        events = []
+        
+        class CountingBucket:
+            def acquire(self):
+                events.append('token')
+        
+        # Three results in pages of two; the second page comes back empty once and is retried
+        pages = {
+            0: [_feed(['2401.00001', '2401.00002'], total=3)],
+            2: [_feed([], total=3), _feed(['2401.00003'], total=3)],
+        }
+        client = ingestion.RateLimitedArxivClient(CountingBucket(), page_size=2)
+        client.client._session.mount('https://', FakeArxivAdapter(pages, events))
+        
+        results = list(client.results(ingestion.arxiv.Search(query='cat:cs.AI')))
+        
+        assert [ingestion._result_to_paper(r)['arxiv_id'] for r in results] == ['2401.00001', '2401.00002', '2401.00003']
+        assert events == ['token', 'request 0', 'token', 'request 2', 'token', 'request 2']
+
+
+class FakeTaskInstance:
+    def __init__(self, xcoms):
+        self.xcoms = xcoms
+    
+    def xcom_pull(self, key=None, task_ids=None):
+        return self.xcoms.get(key)
+
+
+class TestFetchRetries:
+    """Test suite for carrying failed papers across fetch cursors"""
+    
+    @pytest.fixture
+    def ledger(self, tmp_path, monkeypatch):
+        ledger = PaperLedger('dag', 'run-1', str(tmp_path / 'ledger.sqlite'))
+        monkeypatch.setattr(ingestion.PaperLedger, 'for_context', classmethod(lambda cls, context: ledger))
+        yield ledger
+        ledger.close()
+    
+    def test_failed_papers_held_in_oai_state(self, ledger, monkeypatch):
+        """Papers that did not index stay in the state's retry list until they give up"""
+        monkeypatch.setattr(ingestion, 'FETCH_RETRY_MAX_ATTEMPTS', 3)
+        papers = _papers(3)
+        ledger.mark('2401.00000', ingestion.INDEXED)
+        ledger.mark('2401.00001', ingestion.FAILED, error='index')
+        ledger.mark('2401.00002', ingestion.FAILED, error='parse')
+        context = {'ti': FakeTaskInstance({'new_papers': papers})}
+        state = {'from': '2024-01-01', 'resumption_token': 'page-9', 'skip': 4, 'last_datestamp': '2024-01-05',
+                 'retry_attempts': {'2401.00002': 2}}
+        
+        held = ingestion._hold_failed(context, state)
+        
+        assert held['resumption_token'] == 'page-9'
+        assert [p['arxiv_id'] for p in held['retry']] == ['2401.00001']
+        assert held['retry_attempts'] == {'2401.00001': 1}
+    
+    def test_retries_drained_first_without_duplicates(self):
+        """The next fetch starts with the held papers, skipping ones fetched again"""
+        papers = _papers(3)
+        state = {'retry': [papers[0], papers[2]]}
+        
+        drained = ingestion._drain_retries(papers[1:], state)
+        
+        assert [p['arxiv_id'] for p in drained] == ['2401.00000', '2401.00001', '2401.00002']
+
+
+class TestArxivIds:
+    """Test suite for keying papers the same way in both fetch modes"""
+    
+    @pytest.mark.parametrize('raw, expected', [
+        ('2401.01234v2', '2401.01234'),
+        ('2401.01234', '2401.01234'),
+        ('hep-th/9901001v1', 'hep-th/9901001'),
+    ])
+    def test_normalize_strips_version(self, raw, expected):
+        assert normalize_arxiv_id(raw) == expected
+    
+    @pytest.mark.parametrize('entry_id, oai_id', [
+        ('http://arxiv.org/abs/2401.01234v2', '2401.01234'),
+        ('http://arxiv.org/abs/hep-th/9901001v1', 'hep-th/9901001'),
+    ])
+    def test_api_and_oai_fetches_agree(self, monkeypatch, entry_id, oai_id):
+        """A paper fetched from the search API and from OAI-PMH gets one arxiv_id"""
+        result = ingestion.arxiv.Result(
+            entry_id=entry_id,
+            published=datetime(2024, 1, 2, tzinfo=timezone.utc),
+            title='Paper',
+            authors=[ingestion.arxiv.Result.Author('Ada Lovelace')],
+            categories=['cs.AI'],
+            primary_category='cs.AI',
+        )
+        
+        class FakeHarvester:
+            complete = True
+            
+            def __init__(self, base_url, set_spec=None):
+                pass
+            
+            def iter_records(self, **kwargs):
+                yield {'arxiv_id': oai_id, 'datestamp': '2024-01-03', 'title': 'Paper', 'abstract': '',
+                       'authors': ['Ada Lovelace'], 'categories': ['cs.AI'], 'created': '2024-01-02'}
+        
+        monkeypatch.setattr(ingestion, 'OaiHarvester', FakeHarvester)
+        monkeypatch.setattr(ingestion.Variable, 'get', lambda *args, **kwargs: None)
+        oai_papers, _state = ingestion._fetch_oai()
+        
+        api_paper = ingestion._result_to_paper(result)
+        assert api_paper['arxiv_id'] == oai_papers[0]['arxiv_id'] == oai_id
@@ -0,0 +1,151 @@
+"""Tests for the PDF download cache"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from kilig import pdf_cache
+from kilig.pdf_cache import PdfCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.closed = False
+    
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} error')
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    """Answers PDF downloads from `pdfs` by URL and logs every request"""
+    
+    def __init__(self):
+        self.pdfs = {}
+        self.requests = []
+    
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.requests.append((url, dict(headers or {})))
+        if url not in self.pdfs:
+            return FakeResponse(404)
+        content, etag = self.pdfs[url]
+        if headers and headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, content, {'ETag': etag})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(pdf_cache.http_client, 'get', server.get)
+    return server
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Strictly increasing access times so LRU order never ties"""
+    start = datetime(2024, 1, 1)
+    ticks = iter(range(10 ** 6))
+    
+    class FakeDatetime:
+        @staticmethod
+        def utcnow():
+            return start + timedelta(seconds=next(ticks))
+    
+    monkeypatch.setattr(pdf_cache, 'datetime', FakeDatetime)
+
+
+def _serve(server, arxiv_id, content, etag=None):
+    url = f'https://arxiv.org/pdf/{arxiv_id}'
+    server.pdfs[url] = (content, etag or f'"{arxiv_id}"')
+    return url
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class TestPdfCache:
+    """Test suite for PdfCache hits, misses and eviction"""
+    
+    def test_miss_downloads_and_stores(self, tmp_path, server):
+        cache = PdfCache(str(tmp_path))
+        url = _serve(server, '2401.00001', b'%PDF-one')
+        
+        path = cache.get_path('2401.00001', url)
+        
+        assert _read(path) == b'%PDF-one'
+        assert cache.stats()['entries'] == 1
+        assert server.requests == [(url, {})]
+    
+    def test_versioned_hit_skips_the_network(self, tmp_path, server):
+        cache = PdfCache(str(tmp_path))
+        url = _serve(server, '2401.00001v2', b'%PDF-one')
+        first = cache.get_path('2401.00001v2', url)
+        
+        assert cache.get_path('2401.00001v2', url) == first
+        assert len(server.requests) == 1
+    
+    def test_unversioned_hit_revalidates(self, tmp_path, server):
+        """An unchanged PDF is answered with 304 and served from disk"""
+        cache = PdfCache(str(tmp_path))
+        url = _serve(server, '2401.00001', b'%PDF-one', etag='"v1"')
+        first = cache.get_path('2401.00001', url)
+        
+        assert cache.get_path('2401.00001', url) == first
+        assert server.requests[-1] == (url, {'If-None-Match': '"v1"'})
+    
+    def test_changed_pdf_is_downloaded_again(self, tmp_path, server):
+        cache = PdfCache(str(tmp_path))
+        url = _serve(server, '2401.00001', b'%PDF-one', etag='"v1"')
+        cache.get_path('2401.00001', url)
+        _serve(server, '2401.00001', b'%PDF-two', etag='"v2"')
+        
+        assert _read(cache.get_path('2401.00001', url)) == b'%PDF-two'
+    
+    def test_failed_download_leaves_no_entry(self, tmp_path, server):
+        cache = PdfCache(str(tmp_path))
+        
+        with pytest.raises(requests.HTTPError):
+            cache.get_path('2401.00404', 'https://arxiv.org/pdf/2401.00404')
+        
+        assert cache.stats()['entries'] == 0
+        assert not [name for name in os.listdir(tmp_path / 'objects') if name.endswith('.tmp')]
+    
+    def test_evicts_least_recently_used(self, tmp_path, server):
+        """Over budget, the entry accessed longest ago goes first"""
+        cache = PdfCache(str(tmp_path), max_bytes=10)
+        urls = {arxiv_id: _serve(server, arxiv_id, arxiv_id.encode()[-4:]) for arxiv_id in
+                ['2401.00001v1', '2401.00002v1', '2401.00003v1']}
+        paths = {arxiv_id: cache.get_path(arxiv_id, urls[arxiv_id]) for arxiv_id in ['2401.00001v1', '2401.00002v1']}
+        cache.get_path('2401.00001v1', urls['2401.00001v1'])
+        
+        cache.get_path('2401.00003v1', urls['2401.00003v1'])
+        
+        assert os.path.exists(paths['2401.00001v1'])
+        assert not os.path.exists(paths['2401.00002v1'])
+        assert cache.stats() == {'entries': 2, 'bytes': 8, 'max_bytes': 10}
+    
+    def test_shared_blob_counts_once(self, tmp_path, server):
+        """Keys with identical content share one blob and one share of the budget"""
+        cache = PdfCache(str(tmp_path), max_bytes=6)
+        first = cache.get_path('2401.00001', _serve(server, '2401.00001', b'%PDF-x'))
+        second = cache.get_path('2401.00002', _serve(server, '2401.00002', b'%PDF-x'))
+        
+        assert first == second
+        assert cache.evict() == 0
+        assert len(os.listdir(tmp_path / 'objects')) == 1
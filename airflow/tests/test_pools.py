@@ -0,0 +1,29 @@
+"""Tests for pool assignments that keep heavy OpenSearch work apart"""
+
+import pytest
+
+pytest.importorskip('airflow')
+
+import cleanup_dag
+import embedding_refresh_dag
+from kilig.pools import OPENSEARCH_POOL, POOLS
+
+# Refresh tasks that bulk-write the chunk index
+INDEX_WRITE_TASKS = ['process_batches', 'backfill_shadow_index', 'finalize_shadow_index']
+
+
+def test_force_merge_holds_the_whole_opensearch_pool():
+    """optimize_opensearch can only start when no other OpenSearch task holds a slot"""
+    task = cleanup_dag.dag.get_task('optimize_opensearch')
+    
+    assert task.pool == OPENSEARCH_POOL
+    assert task.pool_slots == POOLS[OPENSEARCH_POOL][0]
+
+
+@pytest.mark.parametrize('task_id', INDEX_WRITE_TASKS)
+def test_refresh_index_writes_share_the_opensearch_pool(task_id):
+    """Index-writing refresh tasks wait for (and block) the force merge"""
+    task = embedding_refresh_dag.dag.get_task(task_id)
+    
+    assert task.pool == OPENSEARCH_POOL
+    assert 1 <= task.pool_slots <= POOLS[OPENSEARCH_POOL][0]
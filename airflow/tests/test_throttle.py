@@ -0,0 +1,142 @@
+"""Tests for the token bucket and the AIMD concurrency limiter"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from kilig import throttle
+from kilig.throttle import AdaptiveLimiter, TokenBucket, get_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time for the throttle module: sleep advances the clock instead of blocking"""
+    state = SimpleNamespace(now=1000.0, sleeps=[])
+    
+    def sleep(seconds):
+        state.sleeps.append(seconds)
+        state.now += seconds
+    
+    monkeypatch.setattr(throttle, 'time', SimpleNamespace(
+        monotonic=lambda: state.now,
+        time=lambda: state.now,
+        sleep=sleep,
+    ))
+    return state
+
+
+def _request(limiter, clock, elapsed_ms, overload=False):
+    with limiter.slot() as slot:
+        clock.now += elapsed_ms / 1000
+        if overload:
+            slot.overload()
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket"""
+    
+    def test_starts_full(self, clock):
+        bucket = TokenBucket(rate=1, capacity=2)
+        
+        bucket.acquire()
+        bucket.acquire()
+        
+        assert clock.sleeps == []
+    
+    def test_waits_for_the_next_token(self, clock):
+        """An empty bucket sleeps exactly until enough tokens have refilled"""
+        bucket = TokenBucket(rate=0.5, capacity=1)
+        bucket.acquire()
+        
+        bucket.acquire()
+        
+        assert clock.sleeps == [pytest.approx(2.0)]
+    
+    def test_refill_is_capped_at_capacity(self, clock):
+        """An idle bucket never banks more than `capacity` tokens"""
+        bucket = TokenBucket(rate=1, capacity=2)
+        bucket.acquire(2)
+        clock.now += 60
+        
+        bucket.acquire(2)
+        assert clock.sleeps == []
+        bucket.acquire()
+        assert clock.sleeps == [pytest.approx(1.0)]
+
+
+class TestAdaptiveLimiter:
+    """Test suite for AdaptiveLimiter"""
+    
+    def test_grows_after_a_fast_saturated_window(self, clock):
+        limiter = AdaptiveLimiter('test', initial=1, max_limit=3, target_p95_ms=100, window=2)
+        
+        for _ in range(2):
+            _request(limiter, clock, elapsed_ms=10)
+        
+        assert limiter.limit == 2
+    
+    def test_does_not_grow_when_under_used(self, clock):
+        """Fast requests that never reached the limit are no evidence for a higher one"""
+        limiter = AdaptiveLimiter('test', initial=2, max_limit=3, target_p95_ms=100, window=2)
+        
+        for _ in range(4):
+            _request(limiter, clock, elapsed_ms=10)
+        
+        assert limiter.limit == 2
+    
+    def test_shrinks_when_p95_is_over_target(self, clock):
+        limiter = AdaptiveLimiter('test', initial=3, max_limit=3, target_p95_ms=100, window=2)
+        
+        for _ in range(2):
+            _request(limiter, clock, elapsed_ms=500)
+        
+        assert limiter.limit == 2
+        assert limiter.history[-1][2] == 'p95 500ms > 100ms'
+    
+    def test_overload_burst_cuts_the_limit_once(self, clock):
+        """Requests started under the same limit all overloading halve it once"""
+        limiter = AdaptiveLimiter('test', initial=4, max_limit=4, decrease=0.5)
+        slots = [limiter.slot() for _ in range(4)]
+        for slot in slots:
+            slot.__enter__()
+        
+        for slot in slots:
+            slot.overload()
+            slot.__exit__(None, None, None)
+        
+        assert limiter.limit == 2
+        assert limiter.snapshot() == {'limit': 2, 'in_flight': 0, 'min': 2, 'max': 4, 'changes': 1}
+    
+    def test_limit_stays_within_bounds(self, clock):
+        limiter = AdaptiveLimiter('test', initial=2, max_limit=2, min_limit=1, decrease=0.1)
+        
+        _request(limiter, clock, elapsed_ms=10, overload=True)
+        _request(limiter, clock, elapsed_ms=10, overload=True)
+        
+        assert limiter.limit == 1
+    
+    def test_blocks_past_the_limit(self):
+        limiter = AdaptiveLimiter('test', initial=1, max_limit=1)
+        entered = threading.Event()
+        
+        def worker():
+            with limiter.slot():
+                entered.set()
+        
+        with limiter.slot():
+            thread = threading.Thread(target=worker)
+            thread.start()
+            assert not entered.wait(0.1)
+        
+        assert entered.wait(5)
+        thread.join(5)
+
+
+def test_get_limiter_shares_one_instance_per_name(monkeypatch):
+    monkeypatch.setattr(throttle, '_limiters', {})
+    
+    first = get_limiter('backend-test', initial=2, max_limit=4)
+    
+    assert get_limiter('backend-test', initial=8, max_limit=8) is first
+    assert first.limit == 2
@@ -0,0 +1,119 @@
+"""Tests for the offloaded XCom store and its retention"""
+
+import os
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip('airflow')
+
+from airflow import settings
+from airflow.models import import_all_models
+from airflow.models.base import Base
+from airflow.models.dag import DAG
+from airflow.models.dagrun import DagRun
+from airflow.models.taskinstance import TaskInstance
+from airflow.models.xcom import BaseXCom
+from airflow.operators.empty import EmptyOperator
+from airflow.utils import timezone
+from airflow.utils.session import create_session
+from airflow.utils.state import DagRunState
+from airflow.utils.types import DagRunType
+
+from kilig import xcom_backend
+from kilig.xcom_backend import OffloadedXComBackend, expire_xcom_rows, purge_offloaded_xcoms
+
+DAG_ID = 'paper_ingestion'
+TASK = EmptyOperator(task_id='parse_papers', dag=DAG(DAG_ID, schedule=None))
+
+
+@pytest.fixture(scope='module', autouse=True)
+def metadata_db():
+    # Core tables only; the webserver's tables are not needed here
+    import_all_models()
+    tables = ['log_template', 'dag', 'dag_run', 'trigger', 'task_instance', 'xcom']
+    Base.metadata.create_all(settings.engine, tables=[Base.metadata.tables[name] for name in tables])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(xcom_backend, 'XCOM_STORAGE_PATH', str(tmp_path))
+    monkeypatch.setattr(xcom_backend, 'XCOM_OFFLOAD_THRESHOLD_BYTES', 16)
+    yield tmp_path
+    with create_session() as session:
+        session.query(BaseXCom).delete()
+        session.query(TaskInstance).delete()
+        session.query(DagRun).delete()
+
+
+def _run_with_payload(run_id, ended_days_ago, payload):
+    """Finished DAG run with one offloaded XCom; returns the payload's stored path"""
+    ended = timezone.utcnow() - timedelta(days=ended_days_ago)
+    value = OffloadedXComBackend.serialize_value(payload)
+    with create_session() as session:
+        run = DagRun(
+            dag_id=DAG_ID,
+            run_id=run_id,
+            run_type=DagRunType.MANUAL,
+            execution_date=ended - timedelta(hours=1),
+            start_date=ended - timedelta(hours=1),
+            state=DagRunState.SUCCESS,
+        )
+        run.end_date = ended
+        session.add(run)
+        session.flush()
+        session.add(TaskInstance(TASK, run_id=run_id))
+        session.flush()
+        session.add(BaseXCom(
+            dag_run_id=run.id,
+            task_id=TASK.task_id,
+            map_index=-1,
+            key='return_value',
+            dag_id=DAG_ID,
+            run_id=run_id,
+            value=value,
+            timestamp=ended,
+        ))
+    digest = value.decode('utf-8').strip('"')[len(xcom_backend.REF_PREFIX):]
+    path = xcom_backend._object_path(digest)
+    # Payloads are written while the run is going
+    os.utime(path, (ended.timestamp(), ended.timestamp()))
+    return path
+
+
+def test_payload_round_trips_through_the_store(store):
+    payload = {'arxiv_id': '2401.01234', 'full_text': 'x' * 100}
+    value = OffloadedXComBackend.serialize_value(payload)
+    assert value.decode('utf-8').strip('"').startswith(xcom_backend.REF_PREFIX)
+    
+    class Row:
+        pass
+    
+    row = Row()
+    row.value = value
+    assert OffloadedXComBackend.deserialize_value(row) == payload
+
+
+def test_payloads_of_expired_runs_are_removed(store):
+    old_path = _run_with_payload('old', 30, {'arxiv_id': '2301.00001', 'full_text': 'a' * 100})
+    recent_path = _run_with_payload('recent', 1, {'arxiv_id': '2401.00002', 'full_text': 'b' * 100})
+    
+    assert expire_xcom_rows(retention_days=7) == 1
+    result = purge_offloaded_xcoms(retention_days=7)
+    
+    assert not os.path.exists(old_path)
+    assert os.path.exists(recent_path)
+    assert result['files_removed'] == 1
+    with create_session() as session:
+        assert [run_id for (run_id,) in session.query(BaseXCom.run_id)] == ['recent']
+
+
+def test_unfinished_runs_keep_their_payloads(store):
+    path = _run_with_payload('running', 30, {'arxiv_id': '2301.00003', 'full_text': 'c' * 100})
+    with create_session() as session:
+        session.query(DagRun).update({DagRun.end_date: None, DagRun.state: DagRunState.RUNNING})
+    
+    assert expire_xcom_rows(retention_days=7) == 0
+    purge_offloaded_xcoms(retention_days=7)
+    
+    assert os.path.exists(path)
@@ -40,6 +40,7 @@ describe('Embeddings Service', () => {
         mockCacheGet.mockReset();
         mockCacheSet.mockReset();
         mockEmbedContent.mockReset();
+        mockGenerateKey.mockReturnValue('test-cache-key');
     });
 
     describe('generateEmbedding', () => {
@@ -69,7 +70,7 @@ describe('Embeddings Service', () => {
                 model: 'text-embedding-004',
                 contents: [{ parts: [{ text: 'new text' }] }]
             });
-            expect(mockCacheSet).toHaveBeenCalledWith('test-cache-key', apiEmbedding);
+            expect(mockCacheSet).toHaveBeenCalledWith('test-cache-key', apiEmbedding, 30 * 86400);
         });
 
         it('should generate cache key with model and text', async () => {
@@ -156,6 +157,36 @@ describe('Embeddings Service', () => {
             expect(mockEmbedContent).toHaveBeenCalledTimes(1); // Only for non-cached
         });
 
+        it('should look each text up once and cache only new embeddings', async () => {
+            const cachedEmbedding = [0.7, 0.8, 0.9];
+            const apiEmbedding = [0.1, 0.2, 0.3];
+
+            mockGenerateKey.mockImplementation((input: { text: string }) => `key:${input.text}`);
+            mockCacheGet.mockImplementation(async (key: string) =>
+                key === 'key:license boilerplate' ? cachedEmbedding : null
+            );
+            mockEmbedContent.mockResolvedValue({ embeddings: [{ values: apiEmbedding }] });
+
+            const result = await generateEmbeddingsBatch(['license boilerplate', 'novel text']);
+
+            expect(result).toEqual([cachedEmbedding, apiEmbedding]);
+            expect(mockCacheGet).toHaveBeenCalledTimes(2);
+            expect(mockEmbedContent).toHaveBeenCalledTimes(1);
+            expect(mockCacheSet).toHaveBeenCalledTimes(1);
+            expect(mockCacheSet).toHaveBeenCalledWith('key:novel text', apiEmbedding, 30 * 86400);
+        });
+
+        it('should embed duplicate texts once', async () => {
+            mockCacheGet.mockResolvedValue(null);
+            mockEmbedContent.mockResolvedValue({ embeddings: [{ values: [0.5] }] });
+
+            const result = await generateEmbeddingsBatch(['same', 'other', 'same']);
+
+            expect(result).toEqual([[0.5], [0.5], [0.5]]);
+            expect(mockCacheGet).toHaveBeenCalledTimes(2);
+            expect(mockEmbedContent).toHaveBeenCalledTimes(2);
+        });
+
         it('should handle empty texts array', async () => {
             const result = await generateEmbeddingsBatch([]);
 
@@ -4,6 +4,14 @@ import { getLogger } from '../utils/logger.js';
 import { AppError } from '../utils/app-error.js';
 
 const MODEL_NAME = 'text-embedding-004';
+// Embeddings of a given text never change for a model, so they outlive the default cache TTL
+const EMBEDDING_CACHE_TTL_SECONDS = parseInt(process.env.EMBEDDING_CACHE_TTL_DAYS || '30', 10) * 86400;
+
+/**
+ * Model/version recorded on every indexed chunk (`embedding_model`), so stale
+ * embeddings can be found and refreshed after a model change.
+ */
+export const EMBEDDING_MODEL = MODEL_NAME;
 const log = getLogger('Embeddings');
 
 function getClient() {
@@ -71,12 +79,16 @@ function isRetryableError(error: unknown): boolean {
   return false;
 }
 
+function embeddingCacheKey(text: string): string {
+  return CacheManager.generateKey({ model: MODEL_NAME, text }, 'embeddings');
+}
+
 /**
  * Generates a vector embedding for the given text using Gemini 'text-embedding-004'.
  * Returns a 768-dimensional vector.
  */
 export async function generateEmbedding(text: string): Promise<number[]> {
-  const cacheKey = CacheManager.generateKey({ model: MODEL_NAME, text }, 'embeddings');
+  const cacheKey = embeddingCacheKey(text);
 
   // Check Cache
   const cached = await CacheManager.get<number[]>(cacheKey);
@@ -84,6 +96,10 @@ export async function generateEmbedding(text: string): Promise<number[]> {
     return cached;
   }
 
+  return embedAndCache(text, cacheKey);
+}
+
+async function embedAndCache(text: string, cacheKey: string): Promise<number[]> {
   return withRetry(async () => {
     const client = getClient();
     const result = await client.models.embedContent({
@@ -98,7 +114,7 @@ export async function generateEmbedding(text: string): Promise<number[]> {
     }
 
     // Save to Cache
-    await CacheManager.set(cacheKey, values);
+    await CacheManager.set(cacheKey, values, EMBEDDING_CACHE_TTL_SECONDS);
 
     return values;
   });
@@ -106,16 +122,40 @@ export async function generateEmbedding(text: string): Promise<number[]> {
 
 /**
  * Generates embeddings for an array of texts with concurrency limiting and retry.
+ * Identical texts are embedded once, and texts already in the embedding cache
+ * are reused, so only genuinely new text costs an API call.
  */
 export async function generateEmbeddingsBatch(texts: string[]): Promise<number[][]> {
   const BATCH_SIZE = 10;
-  const results: number[][] = [];
+  const unique = [...new Set(texts)];
+  const keys = unique.map(embeddingCacheKey);
+  const cached = await Promise.all(keys.map(key => CacheManager.get<number[]>(key)));
+
+  const vectors = new Map<string, number[]>();
+  const missing: number[] = [];
+  unique.forEach((text, i) => {
+    const vector = cached[i];
+    if (vector) {
+      vectors.set(text, vector);
+    } else {
+      missing.push(i);
+    }
+  });
+
+  for (let i = 0; i < missing.length; i += BATCH_SIZE) {
+    const batch = missing.slice(i, i + BATCH_SIZE);
+    const batchResults = await Promise.all(batch.map(j => embedAndCache(unique[j], keys[j])));
+    batch.forEach((j, k) => vectors.set(unique[j], batchResults[k]));
+  }
 
-  for (let i = 0; i < texts.length; i += BATCH_SIZE) {
-    const batch = texts.slice(i, i + BATCH_SIZE);
-    const batchResults = await Promise.all(batch.map(t => generateEmbedding(t)));
-    results.push(...batchResults);
+  if (texts.length > 0) {
+    log.info('Embedding batch', {
+      texts: texts.length,
+      unique: unique.length,
+      reused: unique.length - missing.length,
+      embedded: missing.length
+    });
   }
 
-  return results;
-}
\ No newline at end of file
+  return texts.map(text => vectors.get(text)!);
+}
@@ -27,7 +27,8 @@ vi.mock('../opensearch/index.js', () => ({
 }));
 
 vi.mock('../embeddings.js', () => ({
-    generateEmbeddingsBatch: (...args: any[]) => mockGenerateEmbeddingsBatch(...args)
+    generateEmbeddingsBatch: (...args: any[]) => mockGenerateEmbeddingsBatch(...args),
+    EMBEDDING_MODEL: 'test-embedding-model'
 }));
 
 import { HybridIndexer, createHybridIndexer, PaperInput } from './hybrid-indexer.js';
@@ -129,7 +130,8 @@ describe('HybridIndexer', () => {
                     expect.objectContaining({
                         chunkData: expect.objectContaining({
                             arxivId: '1706.03762',
-                            title: testPaper.title
+                            title: testPaper.title,
+                            embeddingModel: 'test-embedding-model'
                         }),
                         embedding: [0.1, 0.2, 0.3]
                     })
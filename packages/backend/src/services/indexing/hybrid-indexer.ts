@@ -6,7 +6,7 @@
 
 import { TextChunker, createTextChunker, TextChunk, Section } from './text-chunker.js';
 import { OpenSearchClient, createOpenSearchClient, ChunkData } from '../opensearch/index.js';
-import { generateEmbeddingsBatch } from '../embeddings.js';
+import { generateEmbeddingsBatch, EMBEDDING_MODEL } from '../embeddings.js';
 import { getLogger } from '../../utils/logger.js';
 
 const log = getLogger('HybridIndexer');
@@ -98,6 +98,7 @@ export class HybridIndexer {
                 categories: paper.categories,
                 publishedDate: paper.publishedDate,
                 wordCount: chunk.metadata.wordCount,
+                embeddingModel: EMBEDDING_MODEL,
                 metadata: {
                     ...paper.metadata,
                     startChar: chunk.metadata.startChar,
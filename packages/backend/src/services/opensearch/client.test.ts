@@ -15,6 +15,7 @@ const mockIndicesExists = vi.fn();
 const mockIndicesCreate = vi.fn();
 const mockIndicesDelete = vi.fn();
 const mockIndicesStats = vi.fn();
+const mockIndicesPutMapping = vi.fn();
 const mockTransportRequest = vi.fn();
 
 vi.mock('@opensearch-project/opensearch', () => {
@@ -30,7 +31,8 @@ vi.mock('@opensearch-project/opensearch', () => {
                 exists: mockIndicesExists,
                 create: mockIndicesCreate,
                 delete: mockIndicesDelete,
-                stats: mockIndicesStats
+                stats: mockIndicesStats,
+                putMapping: mockIndicesPutMapping
             };
             transport = { request: mockTransportRequest };
             constructor(_config: any) { }
@@ -176,6 +178,19 @@ describe('OpenSearchClient', () => {
             expect(mockIndicesCreate).not.toHaveBeenCalled();
         });
 
+        it('should add embedding_model mapping to an existing index', async () => {
+            mockIndicesExists.mockResolvedValue({ body: true });
+            mockIndicesPutMapping.mockResolvedValue({ body: { acknowledged: true } });
+            mockTransportRequest.mockResolvedValue({ body: {} });
+
+            await client.setupIndices(false);
+
+            expect(mockIndicesPutMapping).toHaveBeenCalledWith({
+                index: 'kilig-papers-chunks',
+                body: { properties: { embedding_model: { type: 'keyword' } } }
+            });
+        });
+
         it('should recreate index with force=true', async () => {
             mockIndicesExists.mockResolvedValue({ body: true });
             mockIndicesDelete.mockResolvedValue({ body: {} });
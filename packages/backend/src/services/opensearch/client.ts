@@ -44,6 +44,7 @@ export interface ChunkData {
     categories?: string[];
     publishedDate?: string;
     wordCount: number;
+    embeddingModel?: string;
     metadata?: Record<string, any>;
 }
 
@@ -140,6 +141,16 @@ export class OpenSearchClient {
                 return true;
             }
 
+            // Additive fields introduced after the index was created
+            await this.client.indices.putMapping({
+                index: this.indexName,
+                body: {
+                    properties: {
+                        embedding_model: ARXIV_PAPERS_CHUNKS_MAPPING.mappings.properties.embedding_model,
+                    },
+                },
+            });
+
             log.debug('Hybrid index already exists', { index: this.indexName });
             return false;
         } catch (error) {
@@ -401,6 +412,7 @@ export class OpenSearchClient {
                 published_date: chunkData.publishedDate,
                 word_count: chunkData.wordCount,
                 embedding,
+                embedding_model: chunkData.embeddingModel,
                 metadata: chunkData.metadata,
             };
 
@@ -438,6 +450,7 @@ export class OpenSearchClient {
                     published_date: chunkData.publishedDate,
                     word_count: chunkData.wordCount,
                     embedding,
+                    embedding_model: chunkData.embeddingModel,
                     metadata: chunkData.metadata,
                 },
             ]);
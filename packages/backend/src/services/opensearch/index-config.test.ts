@@ -51,6 +51,10 @@ describe('OpenSearch Index Configuration', () => {
             expect(ARXIV_PAPERS_CHUNKS_MAPPING.mappings.properties.published_date.type).toBe('date');
         });
 
+        it('should have keyword type for embedding_model', () => {
+            expect(ARXIV_PAPERS_CHUNKS_MAPPING.mappings.properties.embedding_model.type).toBe('keyword');
+        });
+
         it('should configure embedding as knn_vector', () => {
             const embedding = ARXIV_PAPERS_CHUNKS_MAPPING.mappings.properties.embedding;
             expect(embedding.type).toBe('knn_vector');
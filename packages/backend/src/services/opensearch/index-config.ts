@@ -78,6 +78,10 @@ export const ARXIV_PAPERS_CHUNKS_MAPPING = {
                 type: 'date',
                 format: 'yyyy-MM-dd||yyyy-MM-dd\'T\'HH:mm:ss||epoch_millis',
             },
+            // Model/version that produced the chunk's embedding
+            embedding_model: {
+                type: 'keyword',
+            },
 
             // Vector field for k-NN search
             embedding: {